@@ -0,0 +1,61 @@
+# Biplot rendering benchmark: one annotation per label versus figures.py.
+#
+# Random 6 variable data of 100, 1,000 and 10,000 samples in 3 clusters
+# is drawn as pca.py's biplot and saved with the Agg renderer, once with
+# a plt.annotate()/plt.arrow()/plt.text() call per sample and variable as
+# pca.py did, and once with figures.DrawBiplot(), which draws all the
+# labels as one collection.  The seconds are per biplot, saved as PNG.
+#
+# usage: python benchmarkBiplot.py [dpi]
+
+import io, os, sys, time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import figures
+
+
+def AnnotatedBiplot(ax, scores, sample_labels, clusters, centroids, loadings, variables):
+    for i, cluster in enumerate(sorted(set(clusters))):
+        mask = clusters == cluster
+        ax.scatter(scores[mask, 0], scores[mask, 1], c=figures.biplotColors[i], label=cluster, alpha=.75)
+        ax.scatter(centroids[cluster, 0], centroids[cluster, 1], c='black', s=100, marker='x')
+    for i, sample in enumerate(sample_labels):
+        ax.annotate(sample, (scores[i, 0], scores[i, 1]), size=8)
+    ax.axhline(y=0, linestyle='dotted', lw=1, color='grey')
+    ax.axvline(x=0, linestyle='dotted', lw=1, color='grey')
+    for i, feature in enumerate(variables):
+        ax.arrow(0, 0, loadings[i, 0]*2, loadings[i, 1]*2, color='r', alpha=.5, linewidth=2, head_width=.02, head_length=.02)
+        ax.text(loadings[i, 0]*2, loadings[i, 1]*2, feature, color='r', alpha=.7)
+
+
+def TimeBiplot(Draw, dpi):
+    startTime = time.perf_counter()
+    figure = figures.NewFigure()
+    Draw(figure.add_subplot())
+    figure.savefig(io.BytesIO(), format='png', dpi=dpi)
+    return time.perf_counter() - startTime
+
+
+def main():
+    dpi = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+    rng = np.random.default_rng(0)
+    loadings = rng.normal(0, 0.4, (6, 2))
+    variables = ['var' + str(i + 1) for i in range(6)]
+    centroids = rng.normal(0, 2, (3, 2))
+
+    print('%10s %18s %18s %10s' % ('samples', 'annotate seconds', 'figures seconds', 'speedup'))
+    for sampleCount in [100, 1000, 10000]:
+        clusters = rng.integers(0, 3, sampleCount)
+        scores = centroids[clusters] + rng.normal(0, 1, (sampleCount, 2))
+        sample_labels = ['%.2f' % value for value in rng.uniform(0, 4, sampleCount)]
+
+        annotateSeconds = TimeBiplot(lambda ax: AnnotatedBiplot(ax, scores, sample_labels, clusters, centroids, loadings, variables), dpi)
+        figuresSeconds = TimeBiplot(lambda ax: figures.DrawBiplot(ax, scores, [0.5, 0.3], sample_labels, clusters, centroids, loadings, variables), dpi)
+        print('%10d %18.3f %18.3f %10.1f' % (sampleCount, annotateSeconds, figuresSeconds, annotateSeconds / figuresSeconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import os, sys, csv, time, hashlib, argparse
+import concurrent.futures
+import numpy as np
+
+# allow "python clusterSelection.py" from any directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import decomposition
+
+
+# Choosing the number of KMeans clusters for the PCA scores, in place of a
+# fixed n_clusters.  Every k in a range is fitted with several seeds, the
+# candidates shared between worker processes, and each fit is scored by
+#
+#   inertia         within-cluster sum of squares, lower is better
+#   silhouette      on a random subsample of the samples, higher is better
+#   Davies-Bouldin  lower is better
+#
+# The best run (lowest inertia) of each k represents it and the best k
+# has the highest silhouette.  The PCA projection is computed once per
+# data file and PCA setting and cached on disk, later sweeps read it.
+
+
+defaultCacheDirectory = os.path.join(os.path.expanduser('~'), '.cache', 'pca')
+
+# samples used for the silhouette, which otherwise costs samples squared
+silhouetteSampleSize = 5000
+
+resultColumns = ['k', 'seed', 'inertia', 'silhouette', 'daviesBouldin', 'seconds']
+
+# each worker process receives the scores once, not once per candidate
+workerScores = None
+
+
+def InitializeWorker(scores, limitThreads):
+    global workerScores
+    workerScores = scores
+    if limitThreads:
+        # one thread per worker process, as the processes already use every core
+        import threadpoolctl
+        threadpoolctl.threadpool_limits(1)
+
+
+def FitCandidate(k, seed):
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_score, davies_bouldin_score
+
+    startTime = time.perf_counter()
+    kmeans = KMeans(n_clusters=k, n_init=1, random_state=seed).fit(workerScores)
+    labels = kmeans.labels_
+    sampleSize = min(silhouetteSampleSize, len(workerScores))
+    return {'k':k,
+            'seed':seed,
+            'inertia':float(kmeans.inertia_),
+            'silhouette':float(silhouette_score(workerScores, labels, sample_size=sampleSize, random_state=seed)),
+            'daviesBouldin':float(davies_bouldin_score(workerScores, labels)),
+            'seconds':time.perf_counter() - startTime,
+            }
+
+
+# every k in clusterCounts with each of the seeds, in workerCount
+# processes (default: one per core).  Returns one result per candidate
+def SweepClusterCounts(scores, clusterCounts, seeds=range(5), workerCount=None):
+    scores = np.ascontiguousarray(scores)
+    candidates = [(k, seed) for k in clusterCounts for seed in seeds if 1 < k < len(scores)]
+    if workerCount == 1:
+        InitializeWorker(scores, False)
+        return [FitCandidate(k, seed) for k, seed in candidates]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workerCount, initializer=InitializeWorker,
+                                                initargs=(scores, True)) as executor:
+        return list(executor.map(FitCandidate, *zip(*candidates)))
+
+
+# the lowest inertia run of each k, by k
+def BestRuns(results):
+    bestRuns = {}
+    for result in results:
+        if result['k'] not in bestRuns or result['inertia'] < bestRuns[result['k']]['inertia']:
+            bestRuns[result['k']] = result
+    return dict(sorted(bestRuns.items()))
+
+
+# the best run of the k with the highest silhouette, a lower Davies-Bouldin index breaks ties
+def BestCandidate(results):
+    return max(BestRuns(results).values(), key=lambda result: (result['silhouette'], -result['daviesBouldin']))
+
+
+# the PCA of a CSV file as pca.py computes it, cached by the file's
+# content and the PCA settings.  Returns the scores and explained variance ratios
+def CachedProjection(fileName, varianceThreshold=0.95, maximumComponents=None, cacheDirectory=defaultCacheDirectory):
+    digest = hashlib.sha256()
+    with open(fileName, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(repr((varianceThreshold, maximumComponents, decomposition.minimumComponentCount)).encode())
+    cacheFileName = os.path.join(cacheDirectory, digest.hexdigest() + '.npz')
+    try:
+        with np.load(cacheFileName) as cached:
+            return cached['scores'], cached['explained_variance_ratio']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler
+    data_std = StandardScaler().fit_transform(pd.read_csv(fileName, index_col=0))
+    pca = decomposition.Decompose(data_std, varianceThreshold, maximumComponents)
+
+    # written to a temporary name and renamed, so other processes never read a partly written cache file
+    os.makedirs(cacheDirectory, exist_ok=True)
+    temporaryFileName = cacheFileName + '.tmp.npz'
+    np.savez(temporaryFileName, scores=pca.scores, explained_variance_ratio=pca.explained_variance_ratio)
+    os.replace(temporaryFileName, cacheFileName)
+    return pca.scores, pca.explained_variance_ratio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fit KMeans for a range of cluster counts and seeds to the PCA scores of a CSV file and report the best number of clusters.')
+    parser.add_argument('dataFile', help='CSV file, first column the sample label and the other columns the variables, as PCA.csv')
+    parser.add_argument('--k', nargs=2, type=int, default=[2, 10], metavar=('FIRST', 'LAST'), help='range of cluster counts (default: 2 10)')
+    parser.add_argument('--seeds', type=int, default=5, help='KMeans seeds per cluster count (default: %(default)s)')
+    parser.add_argument('--variance-threshold', type=float, default=0.95, help='explained variance of the principal components kept (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: one per core)')
+    parser.add_argument('--cache', default=defaultCacheDirectory, help='PCA projection cache directory (default: %(default)s)')
+    parser.add_argument('--output', default='-', help='output CSV file of every candidate (default: standard output)')
+    args = parser.parse_args(argv)
+
+    startTime = time.perf_counter()
+    scores, explained_variance_ratio = CachedProjection(args.dataFile, args.variance_threshold, cacheDirectory=args.cache)
+    projectionSeconds = time.perf_counter() - startTime
+    results = SweepClusterCounts(scores, range(args.k[0], args.k[1] + 1), range(args.seeds), args.workers)
+    if not results:
+        parser.error('no cluster counts between 2 and the number of samples')
+
+    outputFile = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    try:
+        writer = csv.DictWriter(outputFile, fieldnames=resultColumns)
+        writer.writeheader()
+        writer.writerows(results)
+    finally:
+        if outputFile is not sys.stdout:
+            outputFile.close()
+
+    best = BestCandidate(results)
+    print('PCA projection: %d samples x %d components in %.3f s' % (scores.shape[0], scores.shape[1], projectionSeconds), file=sys.stderr)
+    print('Best number of clusters: %d (seed %d, silhouette %.4f, Davies-Bouldin %.4f)' % (best['k'], best['seed'], best['silhouette'], best['daviesBouldin']),
+          file=sys.stderr)
+    print('Sweep: %d candidates in %.3f s' % (len(results), time.perf_counter() - startTime), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import numpy as np
+from sklearn.utils.extmath import randomized_svd, svd_flip
+
+
+# PCA of a standardized table keeping the fewest components that explain
+# a given fraction of the variance, in place of a fixed n_components,
+# and at least the two the figures plot.
+# Small tables use the full SVD.  Wide tables (thousands of columns) use
+# a randomized truncated SVD: the number of components computed starts
+# small and is doubled until the threshold is reached, so only the
+# leading components are ever computed.  Scores and loadings are
+# float32, the explained variance ratios float64.
+
+
+# the full SVD is used when the smaller dimension of the table is at most this
+randomizedMinimumSize = 500
+
+# components computed in the first randomized SVD
+initialComponentCount = 32
+
+# past this fraction of the smaller dimension a randomized SVD is no faster
+randomizedMaximumFraction = 0.5
+
+# the figures plot PC1 against PC2
+minimumComponentCount = 2
+
+
+class Decomposition:
+    def __init__(self, scores, loadings, explained_variance_ratio, method):
+        self.scores = scores # samples x components
+        self.loadings = loadings # variables x components, as pca.components_.T
+        self.explained_variance_ratio = explained_variance_ratio
+        self.n_components = len(explained_variance_ratio)
+        self.method = method
+        self.pcnumber = ['PC' + str(i + 1) for i in range(self.n_components)]
+
+
+# the fewest leading components whose explained variance ratios add up to
+# the threshold, but no fewer than minimumComponentCount if there are as many
+def ComponentCount(explained_variance_ratio, varianceThreshold):
+    cumulative = np.cumsum(explained_variance_ratio)
+    count = int(np.searchsorted(cumulative, varianceThreshold * (1.0 - 1.0E-12))) + 1
+    return min(max(count, minimumComponentCount), len(cumulative))
+
+
+# data is samples x variables, usually standardized.  method is 'full',
+# 'randomized' or 'auto' (randomized for wide tables).  maximumComponents
+# limits the number of components whatever the threshold, though at
+# least minimumComponentCount are kept if the table has as many
+def Decompose(data, varianceThreshold=0.95, maximumComponents=None, method='auto', seed=0):
+    data = np.asarray(data, dtype=np.float32)
+    centered = data - data.mean(axis=0, dtype=np.float64).astype(np.float32)
+    smallerSize = min(centered.shape)
+    limit = smallerSize if maximumComponents is None else min(max(maximumComponents, minimumComponentCount), smallerSize)
+    if method == 'auto':
+        method = 'randomized' if smallerSize > randomizedMinimumSize else 'full'
+
+    totalVariance = np.einsum('ij,ij->', centered, centered, dtype=np.float64)
+    if method == 'randomized':
+        componentCount = min(initialComponentCount, limit)
+        while True:
+            u, s, vt = randomized_svd(centered, componentCount, n_iter=4, flip_sign=False, random_state=seed)
+            ratios = s.astype(np.float64) ** 2 / totalVariance
+            if ratios.sum() >= varianceThreshold or componentCount == limit:
+                break
+            if 2 * componentCount > randomizedMaximumFraction * smallerSize:
+                method = 'full'
+                break
+            componentCount = min(2 * componentCount, limit)
+
+    if method == 'full':
+        u, s, vt = np.linalg.svd(centered, full_matrices=False)
+        ratios = s.astype(np.float64) ** 2 / totalVariance
+
+    # the same signs as sklearn's PCA
+    u, vt = svd_flip(u, vt, u_based_decision=False)
+    count = min(ComponentCount(ratios, varianceThreshold), limit)
+    scores = (u[:, :count] * s[:count]).astype(np.float32)
+    loadings = np.ascontiguousarray(vt[:count].T, dtype=np.float32)
+    return Decomposition(scores, loadings, ratios[:count], method)
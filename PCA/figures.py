@@ -0,0 +1,179 @@
+import os, sys, time, argparse
+import concurrent.futures
+import numpy as np
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PathCollection, PolyCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.patches import FancyArrow
+from matplotlib.textpath import TextPath
+from matplotlib.transforms import Affine2D
+
+# allow "python figures.py" from any directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+# The figures of pca.py, drawn onto given axes so pca.py can show them
+# and headless code can save them without a display.  Sample and variable
+# labels are drawn as one collection of text outlines, one artist for all
+# the labels, in place of one annotation per label, and the loading
+# vectors of the biplot are one collection of arrow polygons.
+#
+# RenderFigures() saves the scatter, scree, loading and biplot figures of
+# one data set in one pass with the Agg renderer, RenderDatasets() does
+# this for many data sets in worker processes.
+
+
+figureSize = (8, 6)
+biplotColors = ['#40A599', '#C9505E', '#000000'] + ['C{}'.format(i) for i in range(10)] # list of colors for each cluster
+
+# output files of RenderFigures(), in the output directory
+figureFileNames = {'scatter':'scatter.png', 'scree':'scree.png', 'loading':'loading.png', 'biplot':'biplot.tif'}
+
+
+# the labels at (x, y) in data coordinates, placed as plt.annotate()
+# places them with the text baseline starting at the point.  Each label's
+# outline is made once however often it occurs
+def AddLabels(ax, x, y, labels, size=None, color='black', alpha=None):
+    properties = FontProperties(size=size if size is not None else matplotlib.rcParams['font.size'])
+    toInches = Affine2D().scale(1.0 / 72.0) # the outlines are in points
+    outlines = {}
+    paths = []
+    for label in labels:
+        label = str(label)
+        if label not in outlines:
+            outlines[label] = TextPath((0, 0), label, prop=properties).transformed(toInches)
+        paths.append(outlines[label])
+
+    collection = PathCollection(paths, offsets=np.column_stack([x, y]), offset_transform=ax.transData,
+                                transform=ax.figure.dpi_scale_trans, facecolors=color, edgecolors='none', alpha=alpha)
+    ax.add_collection(collection, autolim=False)
+    return collection
+
+
+def ExplainedVarianceLabel(name, explained_variance_ratio, index):
+    return '{} ({:.2f}%)'.format(name, explained_variance_ratio[index] * 100)
+
+
+def DrawScatter(ax, scores, explained_variance_ratio, sample_labels):
+    ax.scatter(scores[:, 0], scores[:, 1])
+    ax.set_xlabel(ExplainedVarianceLabel('PC1', explained_variance_ratio, 0))
+    ax.set_ylabel(ExplainedVarianceLabel('PC2', explained_variance_ratio, 1))
+    ax.set_title('PCA of Sofia Samples')
+    AddLabels(ax, scores[:, 0], scores[:, 1], sample_labels)
+
+
+def DrawScree(ax, explained_variance_ratio):
+    ax.plot(np.arange(1, len(explained_variance_ratio)+1), explained_variance_ratio, 'o-')
+    ax.set_xlabel('Number of Principal Components')
+    ax.set_ylabel('Explained Variance Ratio')
+    ax.set_title('Scree Plot')
+
+
+# loadings is variables x components
+def DrawLoadings(ax, loadings, variables):
+    ax.scatter(loadings[:, 0], loadings[:, 1])
+    ax.set_xlabel('PC1 Loading')
+    ax.set_ylabel('PC2 Loading')
+    ax.set_title('Loading Plot')
+    AddLabels(ax, loadings[:, 0], loadings[:, 1], variables)
+
+
+# scores by cluster with the cluster centroids, sample labels and the loading vectors
+def DrawBiplot(ax, scores, explained_variance_ratio, sample_labels, clusters, centroids, loadings, variables):
+    for i, cluster in enumerate(sorted(set(clusters))):
+        mask = clusters == cluster
+        ax.scatter(scores[mask, 0], scores[mask, 1], c=biplotColors[i % len(biplotColors)], label=cluster, alpha=.75)
+        ax.scatter(centroids[cluster, 0], centroids[cluster, 1], c='black', s=100, marker='x')
+    AddLabels(ax, scores[:, 0], scores[:, 1], sample_labels, size=8)
+
+    # Add dashed lines where x=0 and y=0
+    ax.axhline(y=0, linestyle='dotted', lw=1, color='grey')
+    ax.axvline(x=0, linestyle='dotted', lw=1, color='grey')
+
+    # Add loading vectors, as plt.arrow() draws them
+    arrows = [FancyArrow(0, 0, dx, dy, width=.001, head_width=.02, head_length=.02).get_xy() for dx, dy in loadings[:, :2] * 2]
+    ax.add_collection(PolyCollection(arrows, facecolors='r', edgecolors='r', alpha=.5, linewidths=2))
+    AddLabels(ax, loadings[:, 0] * 2, loadings[:, 1] * 2, variables, color='r', alpha=.7)
+
+    # Set axis labels
+    ax.set_xlabel(ExplainedVarianceLabel('PC1', explained_variance_ratio, 0))
+    ax.set_ylabel(ExplainedVarianceLabel('PC2', explained_variance_ratio, 1))
+
+
+# a figure for the Agg renderer, with no pyplot or display
+def NewFigure():
+    figure = Figure(figsize=figureSize)
+    FigureCanvasAgg(figure)
+    return figure
+
+
+# the four figures of one data set saved to the output directory, returns the file names
+def RenderFigures(outputDirectory, scores, explained_variance_ratio, sample_labels, clusters, centroids, loadings, variables, dpi=600):
+    os.makedirs(outputDirectory, exist_ok=True)
+    draw = {'scatter':lambda ax: DrawScatter(ax, scores, explained_variance_ratio, sample_labels),
+            'scree':lambda ax: DrawScree(ax, explained_variance_ratio),
+            'loading':lambda ax: DrawLoadings(ax, loadings, variables),
+            'biplot':lambda ax: DrawBiplot(ax, scores, explained_variance_ratio, sample_labels, clusters, centroids, loadings, variables),
+            }
+    fileNames = []
+    for name, Draw in draw.items():
+        figure = NewFigure()
+        Draw(figure.add_subplot())
+        fileName = os.path.join(outputDirectory, figureFileNames[name])
+        figure.savefig(fileName, dpi=dpi)
+        fileNames.append(fileName)
+    return fileNames
+
+
+# the PCA and clusters of one CSV file as pca.py computes them, then its figures
+def RenderDataset(fileName, outputDirectory, varianceThreshold=0.95, n_clusters=None, dpi=600):
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.cluster import KMeans
+    import decomposition
+    import clusterSelection
+
+    startTime = time.perf_counter()
+    data = pd.read_csv(fileName, index_col=0)
+    pca = decomposition.Decompose(StandardScaler().fit_transform(data), varianceThreshold)
+    cluster_seed = 0
+    if n_clusters is None:
+        best = clusterSelection.BestCandidate(clusterSelection.SweepClusterCounts(pca.scores, range(2, 7), range(5), workerCount=1))
+        n_clusters, cluster_seed = best['k'], best['seed']
+    kmeans = KMeans(n_clusters=n_clusters, n_init=1, random_state=cluster_seed).fit(pca.scores)
+    RenderFigures(outputDirectory, pca.scores, pca.explained_variance_ratio, data.index, kmeans.labels_,
+                  kmeans.cluster_centers_, pca.loadings, data.columns, dpi)
+    return time.perf_counter() - startTime
+
+
+# each data file's figures in a directory of the output directory named
+# after the file, in workerCount processes (default: one per core).
+# Returns the seconds taken by each data file
+def RenderDatasets(fileNames, outputDirectory, varianceThreshold=0.95, n_clusters=None, dpi=600, workerCount=None):
+    outputDirectories = [os.path.join(outputDirectory, os.path.splitext(os.path.basename(fileName))[0]) for fileName in fileNames]
+    count = len(fileNames)
+    if workerCount == 1:
+        return list(map(RenderDataset, fileNames, outputDirectories, [varianceThreshold] * count, [n_clusters] * count, [dpi] * count))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workerCount) as executor:
+        return list(executor.map(RenderDataset, fileNames, outputDirectories, [varianceThreshold] * count, [n_clusters] * count, [dpi] * count))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Save the scatter, scree, loading and biplot figures of pca.py for one or more CSV files, without a display.')
+    parser.add_argument('outputDirectory', help='the figures of each data file are saved in a directory here named after the file')
+    parser.add_argument('dataFiles', nargs='+', help='CSV files, first column the sample label and the other columns the variables, as PCA.csv')
+    parser.add_argument('--variance-threshold', type=float, default=0.95, help='explained variance of the principal components kept (default: %(default)s)')
+    parser.add_argument('--clusters', type=int, default=None, help='number of KMeans clusters (default: chosen by silhouette)')
+    parser.add_argument('--dpi', type=int, default=600, help='resolution of the figures (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: one per core)')
+    args = parser.parse_args(argv)
+
+    seconds = RenderDatasets(args.dataFiles, args.outputDirectory, args.variance_threshold, args.clusters, args.dpi, args.workers)
+    for fileName, fileSeconds in zip(args.dataFiles, seconds):
+        print('%s: %.3f s' % (fileName, fileSeconds))
+
+
+if __name__ == "__main__":
+    main()
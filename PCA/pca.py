@@ -2,99 +2,105 @@
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
 import matplotlib.pyplot as plt
-
-# Input raw data
-data = pd.read_csv('PCA.csv', index_col=0)
-
-# Standardize the data
-scaler = StandardScaler()
-data_std = scaler.fit_transform(data)
-
-# Perform PCA
-pca = PCA(n_components=6)
-principal_components: object = pca.fit_transform(data_std)
-explained_variance_ratio = pca.explained_variance_ratio_
-pcnumber = ['PC1', 'PC2', 'PC3', 'PC4','PC5', 'PC6']
+import decomposition
+
+# The fewest principal components that explain this fraction of the
+# variance are kept, tables of thousands of variables use a randomized
+# truncated SVD (decomposition.py).  maximum_components = None for no limit
+variance_threshold = 0.95
+maximum_components = None
+
+# For tables too large for memory set streaming = True, the CSV file is
+# then read chunkSize rows at a time and the scores are written to scores.npy
+streaming = False
+chunkSize = 100000
+
+if streaming:
+    import streamingPCA
+    variables = pd.read_csv('PCA.csv', index_col=0, nrows=0).columns
+    scaler, pca, scores = streamingPCA.StreamingPCA('PCA.csv', maximum_components or len(variables), 'scores.npy', chunkSize)
+    n_components = decomposition.ComponentCount(pca.explained_variance_ratio_, variance_threshold)
+    principal_components = scores[:, :n_components]
+    component_loadings = pca.components_[:n_components].T
+    explained_variance_ratio = pca.explained_variance_ratio_[:n_components]
+    sample_labels = streamingPCA.ReadSampleLabels('PCA.csv')
+else:
+    # Input raw data
+    data = pd.read_csv('PCA.csv', index_col=0)
+    variables = data.columns
+    sample_labels = data.index
+
+    # Standardize the data
+    scaler = StandardScaler()
+    data_std = scaler.fit_transform(data)
+
+    # Perform PCA
+    pca = decomposition.Decompose(data_std, variance_threshold, maximum_components)
+    principal_components = pca.scores
+    component_loadings = pca.loadings
+    explained_variance_ratio = pca.explained_variance_ratio
+pcnumber = ['PC' + str(i + 1) for i in range(len(explained_variance_ratio))]
 
 # Create a dataframe to store the results
 results = pd.DataFrame(data=principal_components, columns=pcnumber)
-results['Sample'] = data.index
+results['Sample'] = sample_labels
 print(explained_variance_ratio) #prints the variance for each PCx
 
 
 
-# Visualize the results
-plt.figure(figsize=(8, 6))
-plt.scatter(results['PC1'], results['PC2'])
-plt.xlabel('PC1 ({:.2f}%)'.format(explained_variance_ratio[0]*100))
-plt.ylabel('PC2 ({:.2f}%)'.format(explained_variance_ratio[1]*100))
-plt.title('PCA of Sofia Samples')
-for i, sample in enumerate(results['Sample']):
-    plt.annotate(sample, (results['PC1'][i], results['PC2'][i]))
-plt.show()
-
-# Create a scree plot
-plt.figure(figsize=(8, 6))
-plt.plot(np.arange(1, len(explained_variance_ratio)+1), explained_variance_ratio, 'o-')
-plt.xlabel('Number of Principal Components')
-plt.ylabel('Explained Variance Ratio')
-plt.title('Scree Plot')
-plt.show()
-
-# Loading plot
-loadings = pd.DataFrame(pca.components_.T, columns=pcnumber, index=data.columns)
-plt.figure(figsize=(8, 6))
-plt.scatter(loadings['PC1'], loadings['PC2'])
-plt.xlabel('PC1 Loading')
-plt.ylabel('PC2 Loading')
-plt.title('Loading Plot')
-for i, feature in enumerate(loadings.index):
-    plt.annotate(feature, (loadings['PC1'][i], loadings['PC2'][i]))
-plt.show()
-
 # Cluster the samples
+# n_clusters = None chooses the number of clusters in cluster_counts with
+# the best silhouette, fitting each with several seeds (clusterSelection.py).
+# This script has no main guard so the sweep runs in this process, for
+# large tables run clusterSelection.py which uses every core
 from sklearn.cluster import KMeans
-kmeans = KMeans(n_clusters=3)
+import clusterSelection
+n_clusters = None
+cluster_counts = range(2, 7)
+cluster_seed = 0
+if n_clusters is None:
+    sweep = clusterSelection.SweepClusterCounts(principal_components, cluster_counts, range(5), workerCount=1)
+    best = clusterSelection.BestCandidate(sweep)
+    n_clusters, cluster_seed = best['k'], best['seed']
+    print('Number of clusters: {} (silhouette {:.3f})'.format(n_clusters, best['silhouette']))
+kmeans = KMeans(n_clusters=n_clusters, n_init=1, random_state=cluster_seed)
 kmeans.fit(principal_components)
 results['Cluster'] = kmeans.predict(principal_components)
 
 # Get centroids
-centroids = pd.DataFrame(kmeans.cluster_centers_, columns=pcnumber)
-centroids['Cluster'] = ['Cluster {}'.format(i+1) for i in range(len(centroids))]
-
-# Plot the results
-fig, ax = plt.subplots(figsize=(8, 6))
-colors = ['#40A599', '#C9505E', '#000000'] # list of colors for each cluster
-for i, cluster in enumerate(set(results['Cluster'])):
-    mask = results['Cluster'] == cluster
-    ax.scatter(results.loc[mask, 'PC1'], results.loc[mask, 'PC2'], c=colors[i], label=cluster, alpha=.75)
-    centroid = centroids.loc[centroids['Cluster'] == cluster]
-    ax.scatter(centroid['PC1'], centroid['PC2'], c='black', s=100, marker='x', facecolors='black')
-for i, sample in enumerate(results['Sample']):
-    plt.annotate(sample, (results['PC1'][i], results['PC2'][i]), size=8)
-ax.legend()
-
-# Add dashed lines where x=0 and y=0
-ax.axhline(y=0, linestyle='dotted', lw=1, color='grey')
-ax.axvline(x=0, linestyle='dotted', lw=1, color='grey')
-
-# Add loading vectors
-loadings = pd.DataFrame(pca.components_.T, columns=pcnumber, index=data.columns)
-for i, feature in enumerate(loadings.index):
-    plt.arrow(0, 0, loadings['PC1'][i]*2, loadings['PC2'][i]*2, color='r', alpha=.5, linewidth=2, head_width=.02, head_length=.02)
-    plt.text(loadings['PC1'][i]*2, loadings['PC2'][i]*2, feature, color='r', alpha=.7)
-
-# Set axis labels and title
-plt.xlabel('PC1 ({:.2f}%)'.format(explained_variance_ratio[0]*100))
-plt.ylabel('PC2 ({:.2f}%)'.format(explained_variance_ratio[1]*100))
-#plt.title('PCA Biplot with Clusters and Centroids')
-ax.legend().remove()
-
-# Show the plot
-plt.style.use('fivethirtyeight')
-plt.savefig('biplot.tif', dpi=600, format='tif')
-plt.show()
-
-
+centroids = kmeans.cluster_centers_
+
+# For figures without a display set headless = True, the scatter, scree,
+# loading and biplot figures are then saved as files (figures.py) and not shown
+import figures
+headless = False
+
+if headless:
+    figures.RenderFigures('.', principal_components, explained_variance_ratio, sample_labels, results['Cluster'].to_numpy(),
+                          centroids, component_loadings, variables, dpi=600)
+else:
+    # Visualize the results
+    plt.figure(figsize=(8, 6))
+    figures.DrawScatter(plt.gca(), principal_components, explained_variance_ratio, sample_labels)
+    plt.show()
+
+    # Create a scree plot
+    plt.figure(figsize=(8, 6))
+    figures.DrawScree(plt.gca(), explained_variance_ratio)
+    plt.show()
+
+    # Loading plot
+    plt.figure(figsize=(8, 6))
+    figures.DrawLoadings(plt.gca(), component_loadings, variables)
+    plt.show()
+
+    # Plot the results
+    fig, ax = plt.subplots(figsize=(8, 6))
+    figures.DrawBiplot(ax, principal_components, explained_variance_ratio, sample_labels, results['Cluster'].to_numpy(),
+                       centroids, component_loadings, variables)
+
+    # Show the plot
+    plt.style.use('fivethirtyeight')
+    plt.savefig('biplot.tif', dpi=600, format='tif')
+    plt.show()
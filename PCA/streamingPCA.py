@@ -0,0 +1,107 @@
+import argparse
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from sklearn.decomposition import IncrementalPCA
+
+
+# Out-of-core PCA for descriptor tables larger than memory, the same
+# standardization and PCA as pca.py but reading the CSV file in chunks:
+#
+#   pass 1  running mean and variance of each column (StandardScaler.partial_fit)
+#   pass 2  incremental PCA of the standardized chunks (IncrementalPCA.partial_fit)
+#   pass 3  scores of each chunk written to a memory-mapped .npy file
+#
+# so memory use is bounded by the chunk size, not the number of rows.
+# As in pca.py the first column is the index (sample label) and every
+# other column is a variable.  When every component is kept the result
+# is the same as pca.py's dense PCA, with fewer components it is an
+# approximation which improves with larger chunks.
+
+
+defaultChunkSize = 100000
+
+
+def ReadChunks(fileName, chunkSize=defaultChunkSize):
+    for chunk in pd.read_csv(fileName, index_col=0, chunksize=chunkSize):
+        yield chunk.to_numpy(dtype=float)
+
+
+# IncrementalPCA needs at least as many rows as components in each
+# batch, a short last chunk is joined to the chunk before it
+def Batches(chunks, minimumRows):
+    pending = None
+    for chunk in chunks:
+        if pending is not None and (len(chunk) < minimumRows or len(pending) < minimumRows):
+            pending = np.concatenate([pending, chunk])
+            continue
+        if pending is not None:
+            yield pending
+        pending = chunk
+    if pending is not None:
+        yield pending
+
+
+def FitScaler(fileName, chunkSize=defaultChunkSize):
+    scaler = StandardScaler()
+    for chunk in ReadChunks(fileName, chunkSize):
+        scaler.partial_fit(chunk)
+    return scaler
+
+
+def FitIncrementalPCA(fileName, scaler, nComponents, chunkSize=defaultChunkSize):
+    pca = IncrementalPCA(n_components=nComponents)
+    for batch in Batches(ReadChunks(fileName, chunkSize), nComponents):
+        pca.partial_fit(scaler.transform(batch))
+    return pca
+
+
+# the scores of every row written to a .npy file, returned memory-mapped
+def ProjectScores(fileName, scaler, pca, scoresFileName, chunkSize=defaultChunkSize):
+    scores = np.lib.format.open_memmap(scoresFileName, mode='w+', dtype=float, shape=(int(scaler.n_samples_seen_), pca.n_components_))
+    row = 0
+    for chunk in ReadChunks(fileName, chunkSize):
+        scores[row:row + len(chunk)] = pca.transform(scaler.transform(chunk))
+        row += len(chunk)
+    scores.flush()
+    return scores
+
+
+# the three passes, returns the fitted scaler and PCA and the memory-mapped
+# scores.  nComponents is reduced to the number of rows or variables if
+# either is smaller, as a PCA has no more components than that
+def StreamingPCA(fileName, nComponents, scoresFileName, chunkSize=defaultChunkSize):
+    scaler = FitScaler(fileName, chunkSize)
+    nComponents = min(nComponents, int(np.min(scaler.n_samples_seen_)), scaler.n_features_in_)
+    pca = FitIncrementalPCA(fileName, scaler, nComponents, chunkSize)
+    scores = ProjectScores(fileName, scaler, pca, scoresFileName, chunkSize)
+    return scaler, pca, scores
+
+
+# the sample labels (first column) only, for annotating the plots
+def ReadSampleLabels(fileName):
+    return pd.read_csv(fileName, usecols=[0]).iloc[:, 0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='PCA of a CSV file too large for memory, reading it in chunks and writing the scores to a .npy file.')
+    parser.add_argument('dataFile', help='CSV file, first column the sample label and the other columns the variables, as PCA.csv')
+    parser.add_argument('scoresFile', help='output .npy file of the scores, one row per sample')
+    parser.add_argument('--components', type=int, default=6, help='number of principal components (default: %(default)s)')
+    parser.add_argument('--chunk-size', type=int, default=defaultChunkSize, help='rows read at a time (default: %(default)s)')
+    parser.add_argument('--loadings', help='output CSV file of the loadings and explained variance ratios')
+    args = parser.parse_args(argv)
+
+    scaler, pca, scores = StreamingPCA(args.dataFile, args.components, args.scoresFile, max(args.chunk_size, args.components))
+    pcnumber = ['PC' + str(i + 1) for i in range(pca.n_components_)]
+    print(pca.explained_variance_ratio_) #prints the variance for each PCx
+
+    if args.loadings:
+        columns = pd.read_csv(args.dataFile, index_col=0, nrows=0).columns
+        loadings = pd.DataFrame(pca.components_.T, columns=pcnumber, index=columns)
+        loadings.loc['explained_variance_ratio'] = pca.explained_variance_ratio_
+        loadings.to_csv(args.loadings)
+
+
+if __name__ == "__main__":
+    main()
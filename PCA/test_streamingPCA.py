@@ -0,0 +1,47 @@
+import os, sys
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import decomposition
+import streamingPCA
+
+
+# Streaming and dense PCA of PCA.csv.  With every component kept the
+# incremental PCA is exact, so its loadings and explained variance ratios
+# match decomposition.Decompose() up to the sign of each component
+
+dataFileName = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'PCA.csv')
+
+
+def DensePCA(fileName):
+    data = pd.read_csv(fileName, index_col=0)
+    return decomposition.Decompose(StandardScaler().fit_transform(data), 1.0, method='full')
+
+
+def AssertSameComponents(loadings, expectedLoadings):
+    signs = np.sign(np.sum(loadings * expectedLoadings, axis=0))
+    np.testing.assert_allclose(loadings * signs, expectedLoadings, atol=1.0E-4)
+
+
+def test_streaming_matches_dense(tmp_path):
+    dense = DensePCA(dataFileName)
+    variableCount = dense.loadings.shape[0]
+    # chunks of 5 rows leave a short last chunk of 1 row
+    scaler, pca, scores = streamingPCA.StreamingPCA(dataFileName, variableCount, str(tmp_path / 'scores.npy'), chunkSize=5)
+
+    count = dense.n_components
+    np.testing.assert_allclose(pca.explained_variance_ratio_[:count], dense.explained_variance_ratio, atol=1.0E-6)
+    AssertSameComponents(pca.components_[:count].T, dense.loadings)
+    AssertSameComponents(scores[:, :count], dense.scores)
+
+
+def test_fewer_rows_than_components(tmp_path):
+    fileName = str(tmp_path / 'short.csv')
+    pd.read_csv(dataFileName, index_col=0).iloc[:4].to_csv(fileName)
+    scaler, pca, scores = streamingPCA.StreamingPCA(fileName, 6, str(tmp_path / 'scores.npy'), chunkSize=2)
+
+    assert pca.n_components_ == 4
+    assert scores.shape == (4, 4)
@@ -0,0 +1,197 @@
+import sys, pickle, argparse
+import numpy as np
+
+# 2D maps of the composition database for vector-embedding.py, with a
+# choice of backend:
+#
+#   barnes-hut  sklearn's Barnes-Hut t-SNE, multithreaded
+#   fft         FFT-accelerated t-SNE of openTSNE, for large databases
+#   umap        UMAP of umap-learn
+#   pca         the first two principal components, linear and fast
+#
+# The columns are first reduced to preReduction principal components,
+# which makes the neighbour search of t-SNE and UMAP much faster for wide
+# tables, and the t-SNE and UMAP maps start from the PCA layout (init='pca')
+# so repeated runs give similar maps.  A fitted map is saved with
+# SaveEmbedding() and new compositions are placed onto it with
+# Embedding.Transform() without fitting the map again.  openTSNE and
+# umap-learn are optional, only needed for their backends.
+
+try:
+    import openTSNE
+except ImportError:
+    openTSNE = None
+
+try:
+    import umap
+except ImportError:
+    umap = None
+
+
+backendNames = ['barnes-hut', 'fft', 'umap', 'pca']
+
+# principal components kept before t-SNE or UMAP, None for no pre-reduction
+defaultPreReduction = 50
+
+# neighbours of a new point in the fitted data that place it on a
+# Barnes-Hut t-SNE map, which has no transform of its own
+placementNeighbours = 10
+
+
+def CheckBackend(backend):
+    if backend not in backendNames:
+        raise ValueError('Unknown embedding backend ' + repr(backend) + ', use one of ' + ', '.join(backendNames))
+    if backend == 'fft' and openTSNE is None:
+        raise ImportError("Could not import openTSNE, which is needed for the fft backend.  Please install using the command 'pip3 install openTSNE'")
+    if backend == 'umap' and umap is None:
+        raise ImportError("Could not import umap, which is needed for the umap backend.  Please install using the command 'pip3 install umap-learn'")
+
+
+# the fastest installed t-SNE backend
+def DefaultBackend():
+    return 'barnes-hut' if openTSNE is None else 'fft'
+
+
+class Embedding:
+    def __init__(self, backend='barnes-hut', preReduction=defaultPreReduction, init='pca', learningRate=100, perplexity=30.0,
+                 seed=42, workerCount=-1):
+        CheckBackend(backend)
+        self.backend = backend
+        self.preReduction = preReduction
+        self.init = init
+        self.learningRate = learningRate
+        self.perplexity = perplexity
+        self.seed = seed
+        self.workerCount = workerCount
+        self.reduction = None
+        self.model = None
+        self.reducedData = None # kept for placing new points on a Barnes-Hut map
+        self.coordinates = None
+
+
+    def Reduce(self, data):
+        return data if self.reduction is None else self.reduction.transform(data)
+
+
+    # data is samples x variables, returns the samples x 2 map coordinates
+    def Fit(self, data):
+        from sklearn.decomposition import PCA
+        data = np.asarray(data, dtype=float)
+        if self.preReduction and self.backend != 'pca' and data.shape[1] > self.preReduction:
+            self.reduction = PCA(n_components=min(self.preReduction, data.shape[0]), random_state=self.seed).fit(data)
+        reduced = self.Reduce(data)
+
+        if self.backend == 'pca':
+            self.model = PCA(n_components=2, random_state=self.seed).fit(reduced)
+            self.coordinates = self.model.transform(reduced)
+
+        elif self.backend == 'barnes-hut':
+            from sklearn.manifold import TSNE
+            self.model = TSNE(learning_rate=self.learningRate, perplexity=self.perplexity, init=self.init, method='barnes_hut',
+                              random_state=self.seed, n_jobs=self.workerCount)
+            self.coordinates = self.model.fit_transform(reduced)
+            self.reducedData = reduced
+
+        elif self.backend == 'fft':
+            self.model = openTSNE.TSNE(learning_rate=self.learningRate, perplexity=self.perplexity, initialization=self.init,
+                                       negative_gradient_method='fft', random_state=self.seed, n_jobs=self.workerCount).fit(reduced)
+            self.coordinates = np.asarray(self.model)
+
+        elif self.backend == 'umap':
+            init = 'pca' if self.init == 'pca' else 'random'
+            self.model = umap.UMAP(init=init, random_state=self.seed, n_jobs=self.workerCount).fit(reduced)
+            self.coordinates = self.model.embedding_
+
+        return self.coordinates
+
+
+    # map coordinates of new samples on the fitted map, the map itself is not changed
+    def Transform(self, data):
+        reduced = self.Reduce(np.asarray(data, dtype=float))
+        if self.backend == 'pca':
+            return self.model.transform(reduced)
+        if self.backend == 'fft':
+            return np.asarray(self.model.transform(reduced))
+        if self.backend == 'umap':
+            return self.model.transform(reduced)
+        return self.PlaceByNeighbours(reduced)
+
+
+    # each new point at the inverse distance weighted mean of the map
+    # coordinates of its nearest fitted points, as openTSNE places new
+    # points before optimizing them
+    def PlaceByNeighbours(self, reduced):
+        from sklearn.neighbors import NearestNeighbors
+        neighbours = NearestNeighbors(n_neighbors=min(placementNeighbours, len(self.reducedData))).fit(self.reducedData)
+        distances, indices = neighbours.kneighbors(reduced)
+        weights = 1.0 / np.maximum(distances, 1.0E-12)
+        weights /= weights.sum(axis=1, keepdims=True)
+        return np.einsum('ij,ijk->ik', weights, self.coordinates[indices])
+
+
+def SaveEmbedding(embedding, fileName):
+    with open(fileName, 'wb') as f:
+        pickle.dump(embedding, f)
+
+
+def LoadEmbedding(fileName):
+    with open(fileName, 'rb') as f:
+        return pickle.load(f)
+
+
+# the composition table as vector-embedding.py reads it, rows with missing
+# values are dropped.  Returns the table and its variables without the outcome column
+def ReadCompositions(fileName, outcomeColumn='Outcome'):
+    import pandas as pd
+    df = pd.read_csv(fileName)
+    df = df.dropna()
+    return df, df.drop(outcomeColumn, axis=1, errors='ignore')
+
+
+def WriteCoordinates(fileName, coordinates, outcome=None):
+    import pandas as pd
+    table = pd.DataFrame({'TSNE1': coordinates[:, 0], 'TSNE2': coordinates[:, 1]})
+    if outcome is not None:
+        table['Outcome'] = np.asarray(outcome)
+    table.to_csv(fileName, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fit a 2D map of a composition table, or place new compositions on a saved map without fitting it again.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    fitParser = subparsers.add_parser('fit', help='fit a map and save it')
+    fitParser.add_argument('dataFile', help='CSV file of compositions with an Outcome column, as db-composition_classes.csv')
+    fitParser.add_argument('mapFile', help='output file of the fitted map')
+    fitParser.add_argument('--backend', default=DefaultBackend(), choices=backendNames, help='embedding backend (default: %(default)s)')
+    fitParser.add_argument('--pre-reduction', type=int, default=defaultPreReduction, help='principal components kept before embedding, 0 for none (default: %(default)s)')
+    fitParser.add_argument('--init', default='pca', choices=['pca', 'random'], help='initial layout of t-SNE and UMAP (default: %(default)s)')
+    fitParser.add_argument('--perplexity', type=float, default=30.0, help='t-SNE perplexity (default: %(default)s)')
+    fitParser.add_argument('--seed', type=int, default=42, help='random seed (default: %(default)s)')
+    fitParser.add_argument('--workers', type=int, default=-1, help='threads, -1 for one per core (default: %(default)s)')
+    fitParser.add_argument('--output', help='output CSV file of the map coordinates and outcome')
+    transformParser = subparsers.add_parser('transform', help='place new compositions on a saved map')
+    transformParser.add_argument('mapFile', help='map file saved by the fit command')
+    transformParser.add_argument('dataFile', help='CSV file of new compositions with the same columns as the fitted data')
+    transformParser.add_argument('--output', default='-', help='output CSV file of the map coordinates (default: standard output)')
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'fit':
+            df, variables = ReadCompositions(args.dataFile)
+            embedding = Embedding(args.backend, args.pre_reduction or None, args.init, perplexity=args.perplexity, seed=args.seed,
+                                  workerCount=args.workers)
+            coordinates = embedding.Fit(variables)
+            SaveEmbedding(embedding, args.mapFile)
+            if args.output:
+                WriteCoordinates(args.output, coordinates, df['Outcome'] if 'Outcome' in df else None)
+        else:
+            embedding = LoadEmbedding(args.mapFile)
+            df, variables = ReadCompositions(args.dataFile)
+            coordinates = embedding.Transform(variables)
+            WriteCoordinates(sys.stdout if args.output == '-' else args.output, coordinates, df['Outcome'] if 'Outcome' in df else None)
+    except ImportError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import os, argparse
+
+
+# On-disk store of nucleation cycles, replacing the notebooks' %store
+# hand-off between stage 1 and stage 2 and their CSV side files.
+#
+# Each run of each sample is one Parquet file in a directory per sample,
+#   <root>/sample=<sample>/run=<run>/cycles.parquet
+# the partitioning used by pyarrow datasets, so any subset of samples and
+# runs can be opened lazily and read memory-mapped, without reading the
+# other runs.
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    import pyarrow.dataset
+    import pyarrow.compute
+    import pyarrow.fs
+except ImportError:
+    pyarrow = None
+
+
+cycleFileName = 'cycles.parquet'
+
+# columns of the nucleation events of nucleation.py with liveTail.py's
+# Outlier flag, so a run with no cycles still has its columns
+cycleColumns = [('Cycle', 'int64'), ('Index', 'int64'), ('Time', 'float64'), ('Tnuc', 'float64'), ('Strain', 'float64'), ('Outlier', 'bool')]
+
+
+def CheckPyarrow():
+    if pyarrow is None:
+        raise ImportError("Could not import pyarrow, which is needed for the cycle store.  Please install using the command 'pip3 install pyarrow'")
+
+
+def CheckPartitionName(kind, name):
+    name = str(name)
+    if not name or name in ['.', '..'] or '/' in name or '\\' in name or '=' in name:
+        raise ValueError('Invalid ' + kind + ' name for the cycle store: ' + repr(name))
+    return name
+
+
+# cycles is a pyarrow Table, a pandas DataFrame, a dictionary of columns
+# or a list of row dictionaries such as nucleation events
+def CycleTable(cycles):
+    CheckPyarrow()
+    if isinstance(cycles, pyarrow.Table):
+        return cycles
+    if isinstance(cycles, list):
+        # the columns of the first cycle, or all of them if there are none
+        names = list(cycles[0]) if cycles else [name for name, type in cycleColumns]
+        types = dict(cycleColumns)
+        if all(name in types for name in names):
+            return pyarrow.Table.from_pylist(cycles, schema=pyarrow.schema([(name, types[name]) for name in names]))
+        return pyarrow.Table.from_pylist(cycles)
+    if isinstance(cycles, dict):
+        return pyarrow.table(cycles)
+    return pyarrow.Table.from_pandas(cycles, preserve_index=False)
+
+
+class CycleStore:
+    def __init__(self, root):
+        CheckPyarrow()
+        self.root = root
+
+
+    def RunDirectory(self, sample, run):
+        return os.path.join(self.root, 'sample=' + CheckPartitionName('sample', sample), 'run=' + CheckPartitionName('run', run))
+
+
+    # write one run of a sample, an existing run is only replaced if replace is True
+    def AppendRun(self, sample, run, cycles, replace=False):
+        directory = self.RunDirectory(sample, run)
+        fileName = os.path.join(directory, cycleFileName)
+        if os.path.exists(fileName) and not replace:
+            raise ValueError('Run ' + str(run) + ' of sample ' + str(sample) + ' is already in the cycle store')
+
+        # written to a temporary name and renamed, so readers never see a partly written run
+        os.makedirs(directory, exist_ok=True)
+        temporaryFileName = fileName + '.tmp'
+        pyarrow.parquet.write_table(CycleTable(cycles), temporaryFileName)
+        os.replace(temporaryFileName, fileName)
+        return fileName
+
+
+    def Samples(self):
+        return self.PartitionValues(self.root, 'sample=')
+
+
+    def Runs(self, sample):
+        return self.PartitionValues(os.path.join(self.root, 'sample=' + CheckPartitionName('sample', sample)), 'run=')
+
+
+    @staticmethod
+    def PartitionValues(directory, prefix):
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[len(prefix):] for name in os.listdir(directory) if name.startswith(prefix))
+
+
+    # a lazy pyarrow dataset of the chosen samples and runs (default:
+    # all), no cycles are read until it is scanned.  The sample and run
+    # partition values are columns of the dataset
+    def Dataset(self, samples=None, runs=None):
+        fileNames = []
+        for sample in (self.Samples() if samples is None else samples):
+            for run in (self.Runs(sample) if runs is None else runs):
+                fileName = os.path.join(self.RunDirectory(sample, run), cycleFileName)
+                if os.path.exists(fileName):
+                    fileNames.append(fileName)
+        partitioning = pyarrow.dataset.partitioning(pyarrow.schema([('sample', pyarrow.string()), ('run', pyarrow.string())]), flavor='hive')
+        return pyarrow.dataset.dataset(fileNames, format='parquet', partitioning=partitioning, partition_base_dir=self.root,
+                                       filesystem=pyarrow.fs.LocalFileSystem(use_mmap=True))
+
+
+    # the cycles of the chosen samples and runs as a pyarrow Table, read
+    # memory-mapped.  columns limits the columns read, filter is a
+    # pyarrow.dataset expression such as pyarrow.dataset.field('Outlier') == False
+    def LoadCycles(self, samples=None, runs=None, columns=None, filter=None):
+        return self.Dataset(samples, runs).to_table(columns=columns, filter=filter)
+
+
+    # one run's cycles, read memory-mapped without copying where possible
+    def LoadRun(self, sample, run, columns=None):
+        fileName = os.path.join(self.RunDirectory(sample, run), cycleFileName)
+        return pyarrow.parquet.read_table(fileName, columns=columns, memory_map=True)
+
+
+    # the Tnuc of each sample, all runs together, as the stage 2
+    # notebook's water['Tnuc'], fp025['Tnuc'] and fp05['Tnuc']
+    def NucleationTemperatures(self, samples=None, outliers=False):
+        nucleationTemperatures = {}
+        for sample in (self.Samples() if samples is None else samples):
+            table = self.LoadCycles([sample])
+            if not outliers and 'Outlier' in table.column_names:
+                table = table.filter(pyarrow.compute.invert(table['Outlier']))
+            nucleationTemperatures[sample] = table['Tnuc'].to_numpy()
+        return nucleationTemperatures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Add runs to a nucleation cycle store, or list its samples and runs.')
+    parser.add_argument('storeDirectory', help='root directory of the cycle store')
+    parser.add_argument('--add', nargs=3, action='append', default=[], metavar=('SAMPLE', 'RUN', 'CSVFILE'),
+                        help='add a CSV file of cycles (e.g. liveTail _cycles.csv) as a run of a sample, may be repeated')
+    parser.add_argument('--replace', action='store_true', help='replace runs that are already in the store')
+    args = parser.parse_args(argv)
+
+    import pandas
+    store = CycleStore(args.storeDirectory)
+    for sample, run, fileName in args.add:
+        store.AppendRun(sample, run, pandas.read_csv(fileName), args.replace)
+
+    for sample in store.Samples():
+        runs = store.Runs(sample)
+        print(sample + ': ' + str(len(runs)) + ' runs, ' + str(store.Dataset([sample]).count_rows()) + ' cycles')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import os, sys, io, csv, json, time, argparse
+import numpy
+
+# allow both "python liveTail.py" from this directory and
+# "python -m isochoric.liveTail" from the directory above
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import nucleation
+import survival
+import cycleStore
+
+
+# Live-tail mode of INDe_stage1_ImportProcessing_public.ipynb for a log
+# that is still being written.  New rows are read as they are appended
+# and passed to the streaming nucleation detector, so the work per new
+# sample is constant, and whenever a nucleation event is found the
+# outlier-filtered cycles, survival curve and summary files are rewritten.
+# The run can be stopped once the mean nucleation temperature is known
+# well enough, rather than after a fixed number of cycles.
+#
+# The log is polled for new data, which works on any file system
+# including network shares where inotify events are not delivered.
+
+
+# cycles further than this many standard deviations from the mean
+# nucleation temperature are removed, as max_deviations in the notebook
+defaultMaximumDeviations = 1.0
+
+# seconds between checks of the log for new rows
+defaultPollInterval = 1.0
+
+# the 95% confidence interval of the mean uses this many standard errors
+confidenceStandardErrors = 1.96
+
+
+class NucleationTracker:
+    def __init__(self, order=nucleation.defaultOrder, maximumDeviations=defaultMaximumDeviations):
+        self.detector = nucleation.NucleationDetector(order)
+        self.maximumDeviations = maximumDeviations
+        self.Reset()
+
+
+    # start again at the first row of a new log
+    def Reset(self):
+        self.detector.Reset()
+        self.events = []
+        # Tnuc of the events, grown by doubling so adding an event does
+        # not copy the earlier ones
+        self.temperatures = numpy.empty(16)
+
+
+    def AddEvents(self, newEvents):
+        count = len(self.events)
+        if count + len(newEvents) > len(self.temperatures):
+            grown = numpy.empty(max(2 * len(self.temperatures), count + len(newEvents)))
+            grown[:count] = self.temperatures[:count]
+            self.temperatures = grown
+        self.temperatures[count:count + len(newEvents)] = [event['Tnuc'] for event in newEvents]
+        self.events.extend(newEvents)
+        return len(newEvents)
+
+
+    # returns the number of new nucleation events
+    def AddSamples(self, time, strain, temperature):
+        return self.AddEvents(self.detector.Update(time, strain, temperature))
+
+
+    # the end of the log, the last samples can now be decided
+    def Finish(self):
+        return self.AddEvents(self.detector.Finish())
+
+
+    # Tnuc of every event
+    def NucleationTemperatures(self):
+        return self.temperatures[:len(self.events)]
+
+
+    # the cycles kept by the notebook's outlier filter, renumbered from 1
+    # as the notebook's df_adj.  Recalculated from all events since the
+    # mean and standard deviation change with each event, the work is
+    # per event and not per sample
+    def FilteredCycles(self):
+        return self.NucleationTemperatures()[~self.Outliers()]
+
+
+    # True for each event removed by the outlier filter
+    def Outliers(self):
+        if not self.events:
+            return numpy.zeros(0, dtype=bool)
+        nucleationTemperatures = self.NucleationTemperatures()
+        mean = numpy.mean(nucleationTemperatures)
+        standardDeviation = numpy.std(nucleationTemperatures)
+        return ~(numpy.abs(nucleationTemperatures - mean) < self.maximumDeviations * standardDeviation)
+
+
+    # every event with its Outlier flag, for the cycle store
+    def Cycles(self):
+        return [dict(event, Outlier=bool(outlier)) for event, outlier in zip(self.events, self.Outliers())]
+
+
+    def Summary(self):
+        filtered = self.FilteredCycles()
+        summary = {'samples':self.detector.sampleCount,
+                   'cycles':len(self.events),
+                   'filteredCycles':len(filtered),
+                   'meanTnuc':None,
+                   'stdTnuc':None,
+                   'confidenceHalfWidth':None}
+        if len(filtered) > 1:
+            summary['meanTnuc'] = float(numpy.mean(filtered))
+            summary['stdTnuc'] = float(numpy.std(filtered, ddof=1))
+            summary['confidenceHalfWidth'] = float(confidenceStandardErrors * summary['stdTnuc'] / numpy.sqrt(len(filtered)))
+        return summary
+
+
+# reads the rows appended to a CSV log since the last call,
+# only complete lines are read
+class LogTail:
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.Reset()
+
+
+    # read the log again from its start
+    def Reset(self):
+        self.position = 0
+        self.header = None
+        self.partialLine = ''
+
+
+    # returns True if the log was truncated or replaced, when reading starts again
+    def Restarted(self):
+        try:
+            return os.path.getsize(self.fileName) < self.position
+        except OSError:
+            return False
+
+
+    # the time, strain and temperature columns of the new rows, or None
+    def ReadNewRows(self):
+        if self.Restarted():
+            self.Reset()
+        try:
+            with open(self.fileName, 'r', newline='') as f:
+                f.seek(self.position)
+                text = f.read()
+                self.position = f.tell()
+        except FileNotFoundError: # not yet created
+            return None
+
+        lines = (self.partialLine + text).split('\n')
+        self.partialLine = lines.pop() # not yet terminated
+        if self.header is None:
+            if not lines:
+                return None
+            self.header = lines.pop(0)
+        if not lines:
+            return None
+
+        import pandas
+        columns = [nucleation.timeColumn, nucleation.strainColumn, nucleation.temperatureColumn]
+        rows = pandas.read_csv(io.StringIO(self.header + '\n' + '\n'.join(lines)), usecols=columns)
+        return rows[nucleation.timeColumn].to_numpy(), rows[nucleation.strainColumn].to_numpy(), rows[nucleation.temperatureColumn].to_numpy()
+
+
+# each file is written to a temporary name and renamed, so readers
+# never see a partly written file
+def ReplaceFile(fileName, writeFunction):
+    temporaryFileName = fileName + '.tmp'
+    with open(temporaryFileName, 'w', newline='') as f:
+        writeFunction(f)
+    os.replace(temporaryFileName, fileName)
+
+
+# <prefix>_cycles.csv   every detected event
+# <prefix>_filtered.csv outlier-filtered cycles, as the notebook's df_adj
+# <prefix>_survival.csv sorted Tnuc and unfrozen fraction of the filtered cycles
+# <prefix>_summary.json counts, mean Tnuc and its confidence interval
+def WriteSummaryFiles(tracker, outputPrefix, summary):
+    def WriteCycles(f):
+        writer = csv.DictWriter(f, fieldnames=nucleation.eventFields)
+        writer.writeheader()
+        writer.writerows(tracker.events)
+
+    filtered = tracker.FilteredCycles()
+
+    def WriteFiltered(f):
+        writer = csv.writer(f)
+        writer.writerow(['Cycle', 'Tnuc'])
+        writer.writerows(zip(range(1, len(filtered) + 1), filtered.tolist()))
+
+    def WriteSurvival(f):
+        ordered, fractions = survival.SurvivalCurve(filtered)
+        writer = csv.writer(f)
+        writer.writerow(['Tnuc', 'UnfrozenFraction'])
+        writer.writerows(zip(ordered.tolist(), fractions.tolist()))
+
+    ReplaceFile(outputPrefix + '_cycles.csv', WriteCycles)
+    ReplaceFile(outputPrefix + '_filtered.csv', WriteFiltered)
+    ReplaceFile(outputPrefix + '_survival.csv', WriteSurvival)
+    ReplaceFile(outputPrefix + '_summary.json', lambda f: json.dump(summary, f, indent=1))
+
+
+# True once the 95% confidence interval of the mean filtered Tnuc is
+# narrower than +/- confidenceHalfWidth with at least minimumCycles cycles
+def ConfidenceReached(summary, confidenceHalfWidth, minimumCycles):
+    if confidenceHalfWidth is None or summary['confidenceHalfWidth'] is None:
+        return False
+    return summary['filteredCycles'] >= minimumCycles and summary['confidenceHalfWidth'] <= confidenceHalfWidth
+
+
+# follow the log until it stops growing for idleTimeout seconds (never if
+# None), the run is interrupted, or confidence is reached.  The cycles
+# are found by tracker, a NucleationTracker.  Returns the summary
+def TailLog(logFile, outputPrefix, tracker, pollInterval=defaultPollInterval, idleTimeout=None,
+            confidenceHalfWidth=None, minimumCycles=10):
+    tail = LogTail(logFile)
+    summary = tracker.Summary()
+    summary['finished'] = False
+    summary['confidenceReached'] = False
+    WriteSummaryFiles(tracker, outputPrefix, summary)
+
+    lastDataTime = time.monotonic()
+    try:
+        while True:
+            if tail.Restarted():
+                tracker.Reset()
+            rows = tail.ReadNewRows()
+            if rows is not None:
+                lastDataTime = time.monotonic()
+                if tracker.AddSamples(*rows):
+                    summary = tracker.Summary()
+                    summary['finished'] = False
+                    summary['confidenceReached'] = ConfidenceReached(summary, confidenceHalfWidth, minimumCycles)
+                    WriteSummaryFiles(tracker, outputPrefix, summary)
+                    if summary['confidenceReached']:
+                        break
+            elif idleTimeout is not None and time.monotonic() - lastDataTime >= idleTimeout:
+                break
+            else:
+                time.sleep(pollInterval)
+    except KeyboardInterrupt:
+        pass
+
+    if not summary['confidenceReached']:
+        tracker.Finish() # the log has ended, events near its end can be decided
+    summary = tracker.Summary()
+    summary['finished'] = True
+    summary['confidenceReached'] = ConfidenceReached(summary, confidenceHalfWidth, minimumCycles)
+    WriteSummaryFiles(tracker, outputPrefix, summary)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Follow a growing INDe isochoric log, updating the nucleation cycles, outlier-filtered Tnuc, survival curve and summary files as the experiment runs.')
+    parser.add_argument('logFile', help='CSV log with Time (s), Strain and T (C) columns, may not exist yet')
+    parser.add_argument('outputPrefix', help='prefix of the _cycles.csv, _filtered.csv, _survival.csv and _summary.json files')
+    parser.add_argument('--order', type=int, default=nucleation.defaultOrder, help='samples either side of an event, as argrelextrema order (default: %(default)s)')
+    parser.add_argument('--max-deviations', type=float, default=defaultMaximumDeviations, help='outlier filter in standard deviations from the mean Tnuc (default: %(default)s)')
+    parser.add_argument('--poll', type=float, default=defaultPollInterval, help='seconds between checks for new rows (default: %(default)s)')
+    parser.add_argument('--idle-timeout', type=float, default=None, help='finish when the log has not grown for this many seconds (default: follow until interrupted)')
+    parser.add_argument('--confidence', type=float, default=None, help='finish when the 95%% confidence interval of the mean Tnuc is within +/- this many degrees C')
+    parser.add_argument('--store', help='cycle store directory, the finished run is added to it')
+    parser.add_argument('--sample', help='sample name in the cycle store (default: log file name)')
+    parser.add_argument('--run', help='run name in the cycle store (default: start time of this command)')
+    parser.add_argument('--min-cycles', type=int, default=10, help='filtered cycles needed before --confidence can finish the run (default: %(default)s)')
+    args = parser.parse_args(argv)
+    sample = args.sample or os.path.splitext(os.path.basename(args.logFile))[0]
+    run = args.run or time.strftime('%Y%m%d-%H%M%S')
+
+    tracker = NucleationTracker(args.order, args.max_deviations)
+    summary = TailLog(args.logFile, args.outputPrefix, tracker, args.poll, args.idle_timeout, args.confidence, args.min_cycles)
+    if args.store:
+        cycleStore.CycleStore(args.store).AppendRun(sample, run, tracker.Cycles())
+    print(json.dumps(summary))
+    if summary['confidenceReached']:
+        print('Confidence reached, the experiment can be stopped.')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import sys, csv, argparse
+import numpy
+import scipy.ndimage
+
+
+# Nucleation event detection for INDe isochoric logs in a single streaming
+# pass, for logs too large for INDe_stage1_ImportProcessing_public.ipynb.
+#
+# The notebook finds nucleation temperatures as the local maxima of -T,
+#   argrelextrema(-T, np.greater_equal, order=300)
+# which is a sample whose value is greater than or equal to every value
+# within order samples either side of it, the window being cut short at
+# the start and end of the log.  That is the same as the sample equalling
+# the maximum of its window, which maximum_filter1d() finds in linear
+# time.  Chunks of the log are processed as they are read, keeping only
+# the last 2 * order samples between chunks, so memory use is bounded by
+# the chunk size and the results are identical to the notebook's.
+
+
+# samples either side of a nucleation event, as in the notebook
+defaultOrder = 300
+
+# rows of the log read at a time
+defaultChunkSize = 1000000
+
+# columns of the INDe log, time is in seconds
+timeColumn = 'Time'
+strainColumn = 'Strain'
+temperatureColumn = 'T'
+
+# fields of each detected event, Time is in minutes and Strain is x 10^4
+# as in the notebook, Index is the row of the log
+eventFields = ['Cycle', 'Index', 'Time', 'Tnuc', 'Strain']
+
+
+class NucleationDetector:
+    def __init__(self, order=defaultOrder):
+        if order < 1:
+            raise ValueError('order must be at least 1')
+        self.order = order
+        self.Reset()
+
+
+    # start again at the first row of a new log
+    def Reset(self):
+        self.sampleCount = 0 # samples received so far
+        self.cycleCount = 0 # events found so far
+
+        # samples kept from earlier chunks, the last order samples are
+        # not yet decided and the order samples before them are context
+        self.startIndex = 0 # log row of the first kept sample
+        self.firstUndecided = 0 # position in the kept samples
+        self.time = numpy.empty(0)
+        self.strain = numpy.empty(0)
+        self.temperature = numpy.empty(0)
+
+
+    # add the next samples of the log, returning the events that can now
+    # be decided, each a dictionary of eventFields
+    def Update(self, time, strain, temperature):
+        self.time = numpy.concatenate([self.time, numpy.asarray(time, dtype=float)])
+        self.strain = numpy.concatenate([self.strain, numpy.asarray(strain, dtype=float)])
+        self.temperature = numpy.concatenate([self.temperature, numpy.asarray(temperature, dtype=float)])
+        self.sampleCount += len(temperature)
+        return self.Detect(len(self.temperature) - self.order)
+
+
+    # the end of the log, returning the events among the last samples
+    def Finish(self):
+        return self.Detect(len(self.temperature))
+
+
+    # decide the kept samples before position stop
+    def Detect(self, stop):
+        events = []
+        if stop > self.firstUndecided:
+            # a window holding NaN has no maximum, any comparison with NaN
+            # is False in the notebook, so NaN is replaced for the filter
+            # and the windows holding it are excluded separately
+            values = -self.temperature
+            missing = numpy.isnan(values)
+            size = 2 * self.order + 1
+            maxima = scipy.ndimage.maximum_filter1d(numpy.where(missing, numpy.inf, values), size, mode='nearest')
+            peaks = values == maxima
+            if missing.any():
+                peaks &= scipy.ndimage.maximum_filter1d(missing.view(numpy.uint8), size, mode='nearest') == 0
+
+            for position in numpy.flatnonzero(peaks[self.firstUndecided:stop]) + self.firstUndecided:
+                self.cycleCount += 1
+                events.append({'Cycle':self.cycleCount,
+                               'Index':self.startIndex + int(position),
+                               'Time':self.time[position] / 60,
+                               'Tnuc':-values[position],
+                               'Strain':self.strain[position] * numpy.power(10, 4)})
+            self.firstUndecided = stop
+
+        # keep the undecided samples and the context before them
+        discard = max(self.firstUndecided - self.order, 0)
+        if discard > 0:
+            self.time = self.time[discard:]
+            self.strain = self.strain[discard:]
+            self.temperature = self.temperature[discard:]
+            self.startIndex += discard
+            self.firstUndecided -= discard
+        return events
+
+
+# the time, strain and temperature columns of the log, chunkSize rows at a time
+def ReadLogChunks(fileName, chunkSize=defaultChunkSize):
+    import pandas
+    columns = [timeColumn, strainColumn, temperatureColumn]
+    for chunk in pandas.read_csv(fileName, usecols=columns, chunksize=chunkSize):
+        yield chunk[timeColumn].to_numpy(), chunk[strainColumn].to_numpy(), chunk[temperatureColumn].to_numpy()
+
+
+# yields each nucleation event of the log as soon as it is found
+def DetectNucleation(fileName, order=defaultOrder, chunkSize=defaultChunkSize):
+    detector = NucleationDetector(order)
+    for time, strain, temperature in ReadLogChunks(fileName, chunkSize):
+        yield from detector.Update(time, strain, temperature)
+    yield from detector.Finish()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Detect the nucleation events of an INDe isochoric log in one streaming pass, writing one CSV row per event.')
+    parser.add_argument('logFile', help='CSV log with Time (s), Strain and T (C) columns')
+    parser.add_argument('--order', type=int, default=defaultOrder, help='samples either side of an event, as argrelextrema order (default: %(default)s)')
+    parser.add_argument('--chunk-size', type=int, default=defaultChunkSize, help='log rows read at a time (default: %(default)s)')
+    parser.add_argument('--output', default='-', help='output CSV file of events (default: standard output)')
+    args = parser.parse_args(argv)
+
+    outputFile = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    try:
+        writer = csv.DictWriter(outputFile, fieldnames=eventFields)
+        writer.writeheader()
+        for event in DetectNucleation(args.logFile, args.order, args.chunk_size):
+            writer.writerow(event)
+            outputFile.flush() # events are available while a long log is read
+    finally:
+        if outputFile is not sys.stdout:
+            outputFile.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+import os, sys, argparse
+import numpy
+import scipy.stats
+
+# allow both "python nucleationFit.py" from this directory and
+# "python -m isochoric.nucleationFit" from the directory above
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import survival
+
+
+# Nucleation rate models fitted to the nucleation temperatures of many
+# samples at once, for the "POISSON FIT HERE" survival curve placeholder
+# of INDe_stage1_ImportProcessing_public.ipynb.
+#
+# Cooled at a constant rate, nucleation is a Poisson process in the
+# supercooling dT = Tm - T with a hazard h(dT) per degree, A J(T) / beta
+# for a nucleation rate J(T), volume A and cooling rate beta.  The
+# unfrozen fraction is chi = exp(-H(dT)), H being the integral of h, and
+# each nucleation temperature has likelihood h(dT) exp(-H(dT)).
+#
+# The log-likelihoods of all samples are evaluated together on a padded
+# matrix of observations and maximized together by damped Newton steps.
+# Since the samples are independent, each finite difference step of a
+# parameter gives its derivatives for every sample at once.  The fitted
+# models have the statistics attributes of a fitted pyeq3 equation, so
+# they can be shown with IndividualReports.CoefficientAndFitStatisticsText(),
+# and give the (concentration, temperature, log induction time) data of
+# the 3D time stability map fit.
+
+
+# Celsius to Kelvin
+zeroCelsius = 273.15
+
+# Gauss-Legendre nodes for the cumulative hazard of models without a closed form
+quadratureNodes, quadratureWeights = numpy.polynomial.legendre.leggauss(32)
+quadratureNodes = (quadratureNodes + 1.0) / 2.0 # on [0, 1]
+quadratureWeights = quadratureWeights / 2.0
+
+
+# h(dT) = K dT^n, the power law of the notebook's
+# chi(T) = exp(-(A/beta) gamma (T - Tm)^(1+n) / (1+n))
+# which is a Weibull distribution of dT, chi = exp(-(dT / L)^m) with
+# m = n + 1 and K = m L^-m.  The parameters are log(L) and log(m), which
+# unlike log(K) are not strongly correlated with the exponent
+class PoissonModel:
+    name = 'Poisson'
+    displayName = 'Poisson survival, power law nucleation rate h = K dT^n'
+    coefficientDesignators = ['K', 'n']
+
+    @staticmethod
+    def LogHazard(parameters, supercooling, meltingTemperature):
+        logScale = parameters[..., 0:1]
+        exponent = numpy.exp(parameters[..., 1:2])
+        return parameters[..., 1:2] - logScale + (exponent - 1.0) * (numpy.log(supercooling) - logScale)
+
+    @staticmethod
+    def CumulativeHazard(parameters, supercooling, meltingTemperature):
+        return numpy.exp(numpy.exp(parameters[..., 1:2]) * (numpy.log(supercooling) - parameters[..., 0:1]))
+
+    # the exponent from the coefficient of variation of dT
+    @staticmethod
+    def InitialParameters(supercooling, mask):
+        mean, deviation = MaskedMeanAndDeviation(supercooling, mask)
+        exponent = numpy.clip(1.2 * mean / numpy.maximum(deviation, 1.0E-6 * mean), 1.01, 1000.0)
+        return numpy.column_stack([numpy.log(mean), numpy.log(exponent)])
+
+    # coefficients and their Jacobians by the parameters
+    @staticmethod
+    def Coefficients(parameters):
+        logScale = parameters[:, 0]
+        exponent = numpy.exp(parameters[:, 1])
+        K = numpy.exp(parameters[:, 1] - exponent * logScale)
+        jacobians = numpy.zeros((len(parameters), 2, 2))
+        jacobians[:, 0, 0] = -exponent * K
+        jacobians[:, 0, 1] = K * (1.0 - exponent * logScale)
+        jacobians[:, 1, 1] = exponent
+        return numpy.column_stack([K, exponent - 1.0]), jacobians
+
+
+# h(dT) = A exp(-B / (T dT^2)) with T in Kelvin, the classical nucleation
+# theory rate with the kinetic prefactor taken as constant over the range.
+# The parameters are log(A) and log(B)
+class CNTModel:
+    name = 'CNT'
+    displayName = 'Classical nucleation theory rate h = A exp(-B / (T dT^2))'
+    coefficientDesignators = ['A', 'B']
+
+    @staticmethod
+    def LogHazard(parameters, supercooling, meltingTemperature):
+        temperature = meltingTemperature + zeroCelsius - supercooling
+        return parameters[..., 0:1] - numpy.exp(parameters[..., 1:2]) / (temperature * supercooling**2)
+
+    # integrated numerically relative to the hazard at the upper limit,
+    # its largest value, as the hazard is very steep.  The log hazard is
+    # concave in dT, so below its tangent at the upper limit, and the
+    # integral starts where the tangent has fallen by integrationRange,
+    # leaving out less than exp(-integrationRange) of it
+    integrationRange = 50.0
+
+    # observations integrated at a time, keeping the quadrature arrays in cache
+    blockSize = 512
+
+    @staticmethod
+    def CumulativeHazard(parameters, supercooling, meltingTemperature):
+        columns = max(1, CNTModel.blockSize * supercooling.shape[-1] // max(supercooling.size, 1))
+        if columns >= supercooling.shape[-1]:
+            return CNTModel.BlockCumulativeHazard(parameters, supercooling, meltingTemperature)
+        return numpy.concatenate([CNTModel.BlockCumulativeHazard(parameters, supercooling[..., i:i + columns], meltingTemperature)
+                                  for i in range(0, supercooling.shape[-1], columns)], axis=-1)
+
+    @staticmethod
+    def BlockCumulativeHazard(parameters, supercooling, meltingTemperature):
+        B = numpy.exp(parameters[..., 1:2])
+        temperature = meltingTemperature + zeroCelsius - supercooling
+        logHazardAtLimit = parameters[..., 0:1] - B / (temperature * supercooling**2)
+        slope = B * (2.0 / (temperature * supercooling**3) - 1.0 / (temperature**2 * supercooling**2))
+        width = numpy.minimum(supercooling, CNTModel.integrationRange / numpy.maximum(slope, 1.0E-300))
+
+        nodes = (supercooling - width)[..., None] + width[..., None] * quadratureNodes
+        temperature = meltingTemperature[..., None] + zeroCelsius - nodes
+        logHazard = parameters[..., 0:1, None] - B[..., None] / (temperature * nodes**2)
+        relativeIntegral = numpy.exp(logHazard - logHazardAtLimit[..., None]) @ quadratureWeights
+        return width * numpy.exp(logHazardAtLimit) * relativeIntegral
+
+    # matches the log hazard and its slope of the initial power law at the mean dT
+    @staticmethod
+    def InitialParameters(supercooling, mask):
+        powerLaw = PoissonModel.InitialParameters(supercooling, mask)
+        mean, deviation = MaskedMeanAndDeviation(supercooling, mask)
+        temperature = zeroCelsius - mean
+        slope = (numpy.exp(powerLaw[:, 1]) - 1.0) / mean
+        B = numpy.maximum(slope, 1.0E-3) * temperature * mean**3 / 2.0
+        logHazard = PoissonModel.LogHazard(powerLaw, mean[:, None], None)[:, 0]
+        return numpy.column_stack([logHazard + B / (temperature * mean**2), numpy.log(B)])
+
+    @staticmethod
+    def Coefficients(parameters):
+        coefficients = numpy.exp(parameters)
+        jacobians = numpy.zeros((len(parameters), 2, 2))
+        jacobians[:, 0, 0] = coefficients[:, 0]
+        jacobians[:, 1, 1] = coefficients[:, 1]
+        return coefficients, jacobians
+
+
+models = {PoissonModel.name:PoissonModel, CNTModel.name:CNTModel}
+
+
+def MaskedMeanAndDeviation(values, mask):
+    counts = numpy.maximum(mask.sum(axis=1), 1)
+    mean = numpy.where(mask, values, 0.0).sum(axis=1) / counts
+    deviation = numpy.sqrt(numpy.where(mask, (values - mean[:, None])**2, 0.0).sum(axis=1) / counts)
+    return mean, deviation
+
+
+# the fit of one sample, with the statistics attributes of a fitted pyeq3 equation
+class NucleationFit:
+    upperCoefficientBounds = []
+    lowerCoefficientBounds = []
+
+    def __init__(self, name, model, parameters, meltingTemperature):
+        self.name = name
+        self.model = model
+        self.parameters = parameters
+        self.meltingTemperature = meltingTemperature
+
+    def GetDisplayName(self):
+        return self.model.displayName
+
+    def GetCoefficientDesignators(self):
+        return self.model.coefficientDesignators
+
+    # nucleation hazard per degree of supercooling at these temperatures (C)
+    def Hazard(self, temperatures):
+        supercooling = self.meltingTemperature - numpy.atleast_1d(numpy.asarray(temperatures, dtype=float))
+        return numpy.exp(self.model.LogHazard(self.parameters, supercooling, numpy.asarray(self.meltingTemperature)))
+
+    # model unfrozen fraction at these temperatures (C), for the survival plot
+    def UnfrozenFraction(self, temperatures):
+        supercooling = self.meltingTemperature - numpy.atleast_1d(numpy.asarray(temperatures, dtype=float))
+        cumulativeHazard = self.model.CumulativeHazard(self.parameters, numpy.maximum(supercooling, 1.0E-12), numpy.asarray(self.meltingTemperature))
+        return numpy.exp(-cumulativeHazard)
+
+    # mean isothermal induction time in minutes at these temperatures (C),
+    # 1 / (beta h) for a cooling rate beta in C per minute
+    def InductionTime(self, temperatures, coolingRate):
+        return 1.0 / (coolingRate * self.Hazard(temperatures))
+
+
+# the log-likelihood of each sample, padding excluded by mask
+def SampleLogLikelihoods(model, parameters, supercooling, mask, meltingTemperatures):
+    logHazard = model.LogHazard(parameters, supercooling, meltingTemperatures[:, None])
+    cumulativeHazard = model.CumulativeHazard(parameters, supercooling, meltingTemperatures[:, None])
+    return numpy.where(mask, logHazard - cumulativeHazard, 0.0).sum(axis=1)
+
+
+# each sample's log-likelihood with its gradient and Hessian by the
+# parameters, from central differences.  A step of one parameter for all
+# samples together gives its derivatives for every sample at once
+def SampleDerivatives(model, parameters, supercooling, mask, meltingTemperatures, step=1.0E-4):
+    def LogLikelihoods(delta):
+        return SampleLogLikelihoods(model, parameters + delta, supercooling, mask, meltingTemperatures)
+
+    parameterCount = parameters.shape[1]
+    steps = numpy.eye(parameterCount) * step
+    logLikelihoods = LogLikelihoods(0.0)
+    gradients = numpy.empty(parameters.shape)
+    hessians = numpy.empty((parameters.shape[0], parameterCount, parameterCount))
+    for j in range(parameterCount):
+        plus = LogLikelihoods(steps[j])
+        minus = LogLikelihoods(-steps[j])
+        gradients[:, j] = (plus - minus) / (2.0 * step)
+        hessians[:, j, j] = (plus - 2.0 * logLikelihoods + minus) / step**2
+        for k in range(j):
+            hessians[:, j, k] = (LogLikelihoods(steps[j] + steps[k]) - LogLikelihoods(steps[j] - steps[k]) -
+                                 LogLikelihoods(steps[k] - steps[j]) + LogLikelihoods(-steps[j] - steps[k])) / (4.0 * step**2)
+            hessians[:, k, j] = hessians[:, j, k]
+    return logLikelihoods, gradients, hessians
+
+
+# maximize every sample's log-likelihood together by damped Newton
+# (Levenberg-Marquardt) steps, each sample with its own damping.  The
+# small Newton systems of all samples are solved in one call, and samples
+# drop out of the iteration as they converge
+def MaximizeLogLikelihoods(model, parameters, supercooling, mask, meltingTemperatures, maximumIterations=500, tolerance=1.0E-10):
+    parameters = parameters.copy()
+    damping = numpy.full(len(parameters), 1.0E-3)
+    active = numpy.arange(len(parameters))
+    for iteration in range(maximumIterations):
+        if len(active) == 0:
+            break
+        rows = (parameters[active], supercooling[active], mask[active], meltingTemperatures[active])
+        logLikelihoods, gradients, hessians = SampleDerivatives(model, *rows)
+
+        curvature = -hessians
+        scale = numpy.maximum(numpy.abs(numpy.diagonal(curvature, axis1=1, axis2=2)), 1.0E-12)
+        system = curvature + damping[active, None, None] * scale[:, :, None] * numpy.eye(parameters.shape[1])
+        try:
+            steps = numpy.linalg.solve(system, gradients[:, :, None])[:, :, 0]
+        except numpy.linalg.LinAlgError:
+            steps = gradients / scale # a gradient step if any system is singular
+        newLogLikelihoods = SampleLogLikelihoods(model, rows[0] + steps, *rows[1:])
+
+        improved = numpy.isfinite(newLogLikelihoods) & (newLogLikelihoods >= logLikelihoods)
+        parameters[active[improved]] += steps[improved]
+        damping[active] = numpy.where(improved, damping[active] / 10.0, damping[active] * 10.0)
+
+        change = numpy.abs(newLogLikelihoods - logLikelihoods)
+        converged = (improved & (change <= tolerance * (1.0 + numpy.abs(logLikelihoods)))) | (damping[active] > 1.0E12)
+        active = active[~converged]
+    return parameters
+
+
+# fit the model to every sample together.  samples is a
+# dictionary of name and Tnuc values (C), as survival.SurvivalCurves(),
+# meltingTemperature is one value or a dictionary by sample name.
+# Nucleation temperatures at or above the melting temperature cannot be
+# fitted and are left out.  Returns a dictionary of name and NucleationFit
+def FitSurvivalCurves(samples, model='Poisson', meltingTemperature=0.0):
+    model = models[model] if isinstance(model, str) else model
+    curves = survival.SurvivalCurves(samples)
+    names = list(curves)
+    meltingTemperatures = numpy.array([meltingTemperature[name] if isinstance(meltingTemperature, dict) else meltingTemperature for name in names], dtype=float)
+
+    width = max([len(ordered) for ordered, fractions in curves.values()] + [1])
+    supercooling = numpy.ones((len(names), width)) # padding, masked out
+    mask = numpy.zeros((len(names), width), dtype=bool)
+    for row, name in enumerate(names):
+        dT = meltingTemperatures[row] - curves[name][0]
+        dT = dT[dT > 0.0]
+        supercooling[row, :len(dT)] = dT
+        mask[row, :len(dT)] = True
+    if (mask.sum(axis=1) <= len(model.coefficientDesignators)).any():
+        raise ValueError('Every sample needs more nucleation temperatures below its melting temperature than model coefficients')
+
+    initialParameters = model.InitialParameters(supercooling, mask)
+
+    with numpy.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        parameters = MaximizeLogLikelihoods(model, initialParameters, supercooling, mask, meltingTemperatures)
+        logLikelihoods, gradients, hessians = SampleDerivatives(model, parameters, supercooling, mask, meltingTemperatures)
+    coefficients, jacobians = model.Coefficients(parameters)
+
+    fits = {}
+    for row, name in enumerate(names):
+        fit = NucleationFit(name, model, parameters[row], meltingTemperatures[row])
+        dT = supercooling[row, mask[row]]
+        SetFitStatistics(fit, dT, logLikelihoods[row], hessians[row], coefficients[row], jacobians[row])
+        fits[name] = fit
+    return fits
+
+
+def FitSurvivalCurve(nucleationTemperatures, model='Poisson', meltingTemperature=0.0):
+    return FitSurvivalCurves({None:nucleationTemperatures}, model, meltingTemperature)[None]
+
+
+# the pyeq3 equation statistics, for the survival curve of the sample
+def SetFitStatistics(fit, supercooling, logLikelihood, hessian, coefficients, jacobian):
+    ordered, fractions = survival.SurvivalCurve(fit.meltingTemperature - supercooling)
+    predicted = fit.UnfrozenFraction(ordered)
+    errors = predicted - fractions
+
+    nobs = len(supercooling)
+    coefficientCount = len(coefficients)
+    fit.nobs = nobs
+    fit.df_e = nobs - coefficientCount
+    fit.df_r = coefficientCount - 1
+    fit.solvedCoefficients = coefficients
+    fit.rmse = float(numpy.sqrt(numpy.mean(errors**2)))
+    totalSumOfSquares = numpy.sum((fractions - numpy.mean(fractions))**2)
+    fit.r2 = float(1.0 - numpy.sum(errors**2) / totalSumOfSquares)
+    fit.r2adj = float(1.0 - (1.0 - fit.r2) * (nobs - 1) / fit.df_e)
+    fit.Fstat = None # the likelihood fit is not a regression
+    fit.Fpv = None
+    fit.ll = float(logLikelihood)
+    fit.aic = 2.0 * coefficientCount - 2.0 * fit.ll
+    fit.bic = coefficientCount * numpy.log(nobs) - 2.0 * fit.ll
+
+    # coefficient covariance from the observed information, by the delta method
+    try:
+        parameterCovariance = numpy.linalg.inv(-hessian)
+    except numpy.linalg.LinAlgError:
+        parameterCovariance = numpy.full(hessian.shape, numpy.nan)
+    fit.cov_beta = jacobian @ parameterCovariance @ jacobian.T
+    fit.sd_beta = numpy.sqrt(numpy.abs(numpy.diag(fit.cov_beta)))
+    fit.tstat_beta = coefficients / fit.sd_beta
+    fit.pstat_beta = 2.0 * scipy.stats.t.sf(numpy.abs(fit.tstat_beta), fit.df_e)
+    halfWidth = scipy.stats.t.ppf(0.975, fit.df_e) * fit.sd_beta
+    fit.ci = numpy.column_stack([coefficients - halfWidth, coefficients + halfWidth])
+
+
+# the coefficient and fit statistics report of IndividualReports
+def ReportText(fit):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'timeStabilityMaps'))
+    import IndividualReports
+    return IndividualReports.CoefficientAndFitStatisticsText(fit)
+
+
+# rows of X concentration, Y temperature (C) and Z natural log of the
+# mean induction time in minutes, the data of the time stability map
+# (IndividualReports.ContourPlot) 3D fit.  concentrations is a dictionary
+# of sample name and concentration, samples without one are left out
+def InductionTimeData(fits, concentrations, temperatures, coolingRate):
+    rows = []
+    for name, fit in fits.items():
+        if name not in concentrations:
+            continue
+        inductionTimes = fit.InductionTime(temperatures, coolingRate)
+        rows.extend([concentrations[name], temperature, numpy.log(inductionTime)] for temperature, inductionTime in zip(temperatures, inductionTimes))
+    return numpy.array(rows).reshape(-1, 3)
+
+
+# as text for the 3D data of the GUI or batch.py
+def InductionTimeText(data):
+    return 'concentration temperature log(induction time, min)\n' + ''.join('%.6g %.6g %.10g\n' % tuple(row) for row in data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fit nucleation rate models to the nucleation temperatures of many samples at once.')
+    parser.add_argument('sampleFiles', nargs='*', help='CSV files of nucleation temperatures, e.g. liveTail _filtered.csv files')
+    parser.add_argument('--store', help='cycle store directory, every sample in it is fitted without its outlier cycles')
+    parser.add_argument('--model', default='Poisson', choices=list(models), help='nucleation rate model (default: %(default)s)')
+    parser.add_argument('--melting-temperature', type=float, default=0.0, help='melting temperature in C (default: %(default)s)')
+    parser.add_argument('--concentration', nargs=2, action='append', default=[], metavar=('SAMPLE', 'CONCENTRATION'),
+                        help='concentration of a sample for the time stability map data, may be repeated')
+    parser.add_argument('--cooling-rate', type=float, default=None, help='cooling rate of the runs in C per minute, needed for the time stability map data')
+    parser.add_argument('--temperatures', nargs=3, type=float, default=[-15.0, -4.0, 0.5], metavar=('START', 'STOP', 'STEP'),
+                        help='temperatures (C) of the time stability map data (default: -15 -4 0.5)')
+    parser.add_argument('--output-3d', help='write the time stability map 3D data to this text file')
+    args = parser.parse_args(argv)
+
+    if not args.sampleFiles and not args.store:
+        parser.error('give sample files or --store')
+    if args.output_3d and (args.cooling_rate is None or not args.concentration):
+        parser.error('--output-3d needs --cooling-rate and --concentration')
+
+    samples = {os.path.splitext(os.path.basename(fileName))[0]:survival.ReadNucleationTemperatures(fileName) for fileName in args.sampleFiles}
+    if args.store:
+        import cycleStore
+        samples.update(cycleStore.CycleStore(args.store).NucleationTemperatures())
+
+    fits = FitSurvivalCurves(samples, args.model, args.melting_temperature)
+    for name, fit in fits.items():
+        print(name + ': ' + fit.GetDisplayName())
+        print(ReportText(fit))
+
+    if args.output_3d:
+        start, stop, step = args.temperatures
+        temperatures = numpy.arange(start, stop + step / 2.0, step)
+        concentrations = {name:float(concentration) for name, concentration in args.concentration}
+        with open(args.output_3d, 'w') as f:
+            f.write(InductionTimeText(InductionTimeData(fits, concentrations, temperatures, args.cooling_rate)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import os, sys, csv, json, glob, pickle, hashlib, argparse
+import numpy
+
+# allow both "python pipeline.py" from this directory and
+# "python -m isochoric.pipeline" from the directory above, the time
+# stability map modules are in the timeStabilityMaps directory
+isochoricDirectory = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, isochoricDirectory)
+sys.path.insert(0, os.path.join(os.path.dirname(isochoricDirectory), 'timeStabilityMaps'))
+
+import nucleation
+import liveTail
+import nucleationFit
+
+
+# From a directory of INDe logs to the time stability map in one command,
+# in place of running the stage 1 notebook per sample and pasting the
+# induction times into the 3D data of the GUI:
+#
+#   detect   nucleation events of each log (nucleation.py)
+#   filter   the notebook's outlier filter per log, runs pooled per sample
+#   rates    nucleation rate model fitted to every sample (nucleationFit.py)
+#   map data (concentration, temperature, ln induction time) rows
+#   surface  the 3D pyeq3 equation fitted to the map data
+#   contour  IndividualReports.ContourPlot() rendered to a PNG file
+#
+# The results of the detect, rates, surface and contour stages are cached
+# by a hash of their inputs' content, so a re-run only repeats the stages
+# whose inputs changed, e.g. adding one log re-detects that log only and
+# refits from there.  Log content hashes are remembered by file size and
+# modification time, so unchanged logs are not read again to hash them.
+
+
+# included in every cache key, change it when a stage's results change
+pipelineVersion = 1
+
+defaultCacheDirectory = os.path.join(os.path.expanduser('~'), '.cache', 'timeStabilityMaps', 'pipeline')
+
+# bytes read at a time when hashing logs
+hashBlockSize = 1 << 20
+
+
+# a hash of any nesting of strings, numbers, lists, dictionaries and numpy arrays
+def ContentHash(*parts):
+    digest = hashlib.sha256()
+
+    def Add(part):
+        if isinstance(part, numpy.ndarray):
+            digest.update(('array' + str(part.dtype) + str(part.shape)).encode())
+            digest.update(numpy.ascontiguousarray(part).tobytes())
+        elif isinstance(part, dict):
+            digest.update(b'dict')
+            for key in sorted(part, key=str):
+                Add(str(key))
+                Add(part[key])
+        elif isinstance(part, (list, tuple)):
+            digest.update(('list' + str(len(part))).encode())
+            for item in part:
+                Add(item)
+        elif isinstance(part, bytes):
+            digest.update(b'bytes' + part)
+        else:
+            digest.update((type(part).__name__ + repr(part)).encode())
+        digest.update(b';')
+
+    Add([pipelineVersion] + list(parts))
+    return digest.hexdigest()
+
+
+# pickled stage results in a directory per stage, named by cache key
+class StageCache:
+    def __init__(self, directory):
+        self.directory = directory
+        self.fileHashIndexName = os.path.join(directory, 'fileHashes.json')
+        try:
+            with open(self.fileHashIndexName, 'r') as f:
+                self.fileHashIndex = json.load(f)
+        except (OSError, ValueError):
+            self.fileHashIndex = {}
+
+
+    def FileName(self, stage, key):
+        return os.path.join(self.directory, stage, key + '.pickle')
+
+
+    # the cached result, or None
+    def Get(self, stage, key):
+        try:
+            with open(self.FileName(stage, key), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+
+    def Put(self, stage, key, value):
+        fileName = self.FileName(stage, key)
+        os.makedirs(os.path.dirname(fileName), exist_ok=True)
+        temporaryFileName = fileName + '.tmp'
+        with open(temporaryFileName, 'wb') as f:
+            pickle.dump(value, f)
+        os.replace(temporaryFileName, fileName)
+        return value
+
+
+    # the content hash of a file, only read again if its size or modification time changed
+    def FileHash(self, fileName):
+        status = os.stat(fileName)
+        indexKey = os.path.abspath(fileName)
+        entry = self.fileHashIndex.get(indexKey)
+        if entry and entry['size'] == status.st_size and entry['mtime'] == status.st_mtime_ns:
+            return entry['hash']
+
+        digest = hashlib.sha256()
+        with open(fileName, 'rb') as f:
+            for block in iter(lambda: f.read(hashBlockSize), b''):
+                digest.update(block)
+        self.fileHashIndex[indexKey] = {'size':status.st_size, 'mtime':status.st_mtime_ns, 'hash':digest.hexdigest()}
+
+        os.makedirs(self.directory, exist_ok=True)
+        temporaryFileName = self.fileHashIndexName + '.tmp'
+        with open(temporaryFileName, 'w') as f:
+            json.dump(self.fileHashIndex, f)
+        os.replace(temporaryFileName, self.fileHashIndexName)
+        return digest.hexdigest()
+
+
+    # the cached result of function(), which is only called if the key is not cached
+    def Cached(self, stage, key, function, report=None):
+        value = self.Get(stage, key)
+        if value is not None:
+            if report:
+                report(stage + ': cached')
+            return value
+        if report:
+            report(stage + ': computing')
+        return self.Put(stage, key, function())
+
+
+# the logs of each sample, a manifest CSV with file, sample and
+# concentration columns, or else each log in the directory is a sample
+# named by its file name and concentrations is a dictionary by sample name.
+# Returns a list of (log file, sample) and a dictionary of concentrations
+def ReadManifest(logDirectory, manifestFileName=None, pattern='*.csv', concentrations=None):
+    concentrations = dict(concentrations or {})
+    logs = []
+    if manifestFileName:
+        with open(manifestFileName, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                logs.append((os.path.join(logDirectory, row['file']), row['sample']))
+                if row.get('concentration', '') != '':
+                    concentrations[row['sample']] = float(row['concentration'])
+    else:
+        for fileName in sorted(glob.glob(os.path.join(logDirectory, pattern))):
+            logs.append((fileName, os.path.splitext(os.path.basename(fileName))[0]))
+
+    missing = sorted(set(sample for fileName, sample in logs) - set(concentrations))
+    if missing:
+        raise ValueError('No concentration for samples: ' + ', '.join(missing))
+    return logs, concentrations
+
+
+def DetectEvents(logFile, order, chunkSize):
+    return list(nucleation.DetectNucleation(logFile, order, chunkSize))
+
+
+# the notebook's outlier filter applied to the events of one log
+def FilteredTnuc(events, maximumDeviations):
+    tracker = liveTail.NucleationTracker(maximumDeviations=maximumDeviations)
+    tracker.AddEvents(events)
+    return tracker.FilteredCycles()
+
+
+def FitSurface(data, moduleName, equationName, fittingTarget):
+    import batch
+    import FittingThread
+    equation = batch.PrepareEquation(data, 3, moduleName, equationName, fittingTarget)
+    return FittingThread.FitEquation(equation)
+
+
+# drawn on the Agg canvas, no display or Tk install is needed
+def RenderContour(equation, dpi):
+    import io
+    import matplotlib
+    import IndividualReports
+    matplotlib.use('Agg')
+    figure = IndividualReports.ContourPlot(None, equation)[1]
+    imageBuffer = io.BytesIO()
+    figure.savefig(imageBuffer, format='png', dpi=dpi)
+    return imageBuffer.getvalue()
+
+
+# run every stage, writing map3d.txt, rates.txt, surface.txt and
+# contour.png to the output directory.  Returns the fitted 3D equation
+def RunPipeline(logDirectory, outputDirectory, coolingRate, concentrations=None, manifestFileName=None, pattern='*.csv',
+                order=nucleation.defaultOrder, chunkSize=nucleation.defaultChunkSize,
+                maximumDeviations=liveTail.defaultMaximumDeviations, model='Poisson', meltingTemperature=0.0,
+                temperatures=None, surface=('Polynomial', 'Full Quadratic', 'SSQABS'), dpi=300,
+                cacheDirectory=defaultCacheDirectory, report=print):
+    import pyeq3
+    cache = StageCache(cacheDirectory)
+    logs, concentrations = ReadManifest(logDirectory, manifestFileName, pattern, concentrations)
+    if temperatures is None:
+        temperatures = numpy.arange(-15.0, -3.75, 0.5)
+    temperatures = numpy.asarray(temperatures, dtype=float)
+
+    # detect and filter, runs of a sample pooled as in the stage 2 notebook
+    samples = {}
+    for logFile, sample in logs:
+        key = ContentHash('detect', cache.FileHash(logFile), order)
+        events = cache.Cached('detect', key, lambda: DetectEvents(logFile, order, chunkSize),
+                              lambda status: report(os.path.basename(logFile) + ' ' + status))
+        samples.setdefault(sample, []).append(FilteredTnuc(events, maximumDeviations))
+    samples = {sample:numpy.concatenate(runs) for sample, runs in samples.items()}
+
+    key = ContentHash('rates', samples, model, meltingTemperature)
+    fits = cache.Cached('rates', key, lambda: nucleationFit.FitSurvivalCurves(samples, model, meltingTemperature), report)
+
+    data = nucleationFit.InductionTimeData(fits, concentrations, temperatures, coolingRate)
+
+    key = ContentHash('surface', data, list(surface), pyeq3.__version__)
+    equation = cache.Cached('surface', key, lambda: FitSurface(data, *surface), report)
+
+    key = ContentHash('contour', key, dpi)
+    image = cache.Cached('contour', key, lambda: RenderContour(equation, dpi), report)
+
+    import IndividualReports
+    os.makedirs(outputDirectory, exist_ok=True)
+    with open(os.path.join(outputDirectory, 'map3d.txt'), 'w') as f:
+        f.write(nucleationFit.InductionTimeText(data))
+    with open(os.path.join(outputDirectory, 'rates.txt'), 'w') as f:
+        for sample, fit in fits.items():
+            f.write(sample + ': ' + fit.GetDisplayName() + '\n\n' + nucleationFit.ReportText(fit) + '\n\n')
+    with open(os.path.join(outputDirectory, 'surface.txt'), 'w') as f:
+        f.write(equation.GetDisplayName() + '\n\n' + IndividualReports.CoefficientAndFitStatisticsText(equation))
+    with open(os.path.join(outputDirectory, 'contour.png'), 'wb') as f:
+        f.write(image)
+    return equation
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='From a directory of INDe isochoric logs to the time stability map, caching each stage by the content of its inputs.')
+    parser.add_argument('logDirectory', help='directory of CSV logs with Time (s), Strain and T (C) columns')
+    parser.add_argument('outputDirectory', help='directory for map3d.txt, rates.txt, surface.txt and contour.png')
+    parser.add_argument('--cooling-rate', type=float, required=True, help='cooling rate of the runs in C per minute')
+    parser.add_argument('--manifest', help='CSV file with file, sample and concentration columns, several files may be runs of one sample')
+    parser.add_argument('--pattern', default='*.csv', help='log file name pattern without a manifest, each log is a sample (default: %(default)s)')
+    parser.add_argument('--concentration', nargs=2, action='append', default=[], metavar=('SAMPLE', 'CONCENTRATION'),
+                        help='concentration of a sample without a manifest, may be repeated')
+    parser.add_argument('--order', type=int, default=nucleation.defaultOrder, help='samples either side of an event, as argrelextrema order (default: %(default)s)')
+    parser.add_argument('--max-deviations', type=float, default=liveTail.defaultMaximumDeviations, help='outlier filter in standard deviations from the mean Tnuc (default: %(default)s)')
+    parser.add_argument('--model', default='Poisson', choices=list(nucleationFit.models), help='nucleation rate model (default: %(default)s)')
+    parser.add_argument('--melting-temperature', type=float, default=0.0, help='melting temperature in C (default: %(default)s)')
+    parser.add_argument('--temperatures', nargs=3, type=float, default=[-15.0, -4.0, 0.5], metavar=('START', 'STOP', 'STEP'),
+                        help='temperatures (C) of the map data (default: -15 -4 0.5)')
+    parser.add_argument('--surface', nargs=3, default=['Polynomial', 'Full Quadratic', 'SSQABS'], metavar=('MODULE', 'EQUATION', 'TARGET'),
+                        help='3D pyeq3 equation fitted to the map data (default: Polynomial "Full Quadratic" SSQABS)')
+    parser.add_argument('--dpi', type=int, default=300, help='contour map resolution (default: %(default)s)')
+    parser.add_argument('--cache', default=defaultCacheDirectory, help='stage cache directory (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    start, stop, step = args.temperatures
+    try:
+        RunPipeline(args.logDirectory, args.outputDirectory, args.cooling_rate,
+                    {sample:float(concentration) for sample, concentration in args.concentration},
+                    args.manifest, args.pattern, args.order, nucleation.defaultChunkSize, args.max_deviations,
+                    args.model, args.melting_temperature, numpy.arange(start, stop + step / 2.0, step),
+                    tuple(args.surface), args.dpi, args.cache)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import os, sys, csv, argparse
+import concurrent.futures
+import numpy
+
+
+# Survival (unfrozen fraction) curves of nucleation temperatures, as the
+# isochoric notebooks compute per sample with sorted() and a loop,
+#   ordered_Tnuc = sorted(df_adj['Tnuc'])
+#   chi = [(i+1)/len(ordered_Tnuc) for i in range(len(ordered_Tnuc))]
+# here for any number of named samples at once, with bootstrap confidence
+# bands of the ordered Tnuc at each unfrozen fraction.
+
+
+# bootstrap resamples are drawn and sorted this many at a time, and each
+# batch is merged into the lowest and highest resampled values at each
+# rank, the only ones the quantiles of the bands need.  Memory use is
+# about batch size plus (1 - confidence) x resamples, times sample size values
+defaultBatchSize = 1000
+
+
+# samples is a dictionary of name and Tnuc values, NaN values are ignored.
+# Returns a dictionary of name and (ordered Tnuc, unfrozen fraction) arrays
+def SurvivalCurves(samples):
+    names = list(samples)
+    values = [numpy.asarray(samples[name], dtype=float).ravel() for name in names]
+    width = max([len(v) for v in values] + [0])
+
+    # all samples are sorted together as rows of a NaN padded matrix,
+    # NaN is sorted last so each row's values come first
+    matrix = numpy.full((len(names), width), numpy.nan)
+    for row, v in enumerate(values):
+        matrix[row, :len(v)] = v
+    matrix.sort(axis=1)
+    counts = numpy.count_nonzero(~numpy.isnan(matrix), axis=1)
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        fractions = numpy.arange(1, width + 1) / counts[:, None]
+
+    return {name:(matrix[row, :counts[row]], fractions[row, :counts[row]]) for row, name in enumerate(names)}
+
+
+def SurvivalCurve(nucleationTemperatures):
+    return SurvivalCurves({None:nucleationTemperatures})[None]
+
+
+# the sorted Tnuc of resampleCount bootstrap resamples of ordered, as
+# rows, drawn together as one matrix
+def SortedResamples(ordered, resampleCount, seedSequence):
+    rng = numpy.random.default_rng(seedSequence)
+    resamples = ordered[rng.integers(0, len(ordered), (resampleCount, len(ordered)))]
+    resamples.sort(axis=1)
+    return resamples
+
+
+# the sorted resample batches in order, with at most two batches per
+# worker drawn but not yet merged
+def ResampleBatches(executor, workerCount, ordered, batchSizes, batchSeeds):
+    if executor is None:
+        for size, batchSeed in zip(batchSizes, batchSeeds):
+            yield SortedResamples(ordered, size, batchSeed)
+        return
+
+    pending = []
+    for size, batchSeed in zip(batchSizes, batchSeeds):
+        pending.append(executor.submit(SortedResamples, ordered, size, batchSeed))
+        if len(pending) >= 2 * workerCount:
+            yield pending.pop(0).result()
+    for future in pending:
+        yield future.result()
+
+
+# the count lowest values of each column, in any order
+def LowestRows(values, count):
+    if len(values) > count:
+        values = numpy.partition(values, count - 1, axis=0)[:count]
+    return values
+
+
+# the count highest values of each column, in any order
+def HighestRows(values, count):
+    if len(values) > count:
+        values = numpy.partition(values, len(values) - count, axis=0)[len(values) - count:]
+    return values
+
+
+# the quantile of each column from its sorted values at ranks firstRank
+# onwards, interpolated between ranks as numpy.quantile() does by default
+def QuantileFromRanks(sortedValues, firstRank, totalCount, quantile):
+    position = (totalCount - 1) * quantile - firstRank
+    below = int(numpy.floor(position))
+    above = min(below + 1, len(sortedValues) - 1)
+    return sortedValues[below] + (position - below) * (sortedValues[above] - sortedValues[below])
+
+
+# bootstrap confidence bands of each survival curve, a dictionary of name
+# and (lower, upper) Tnuc arrays at the same unfrozen fractions as
+# SurvivalCurves().  The resamples of each sample are drawn in batches,
+# each batch in one vectorized draw and sort, and the batches can be
+# shared between worker processes.  The result depends on the seed and
+# batch size, not on the number of workers
+def BootstrapBands(samples, resampleCount=1000, confidence=0.95, seed=None, batchSize=defaultBatchSize, workerCount=1):
+    curves = SurvivalCurves(samples)
+    quantiles = [(1.0 - confidence) / 2.0, (1.0 + confidence) / 2.0]
+    seedSequences = numpy.random.SeedSequence(seed).spawn(len(curves))
+
+    # resampled values kept at each rank, below the lower quantile and above the upper one
+    lowestCount = min(int(numpy.floor((resampleCount - 1) * quantiles[0])) + 2, resampleCount)
+    highestCount = min(resampleCount - int(numpy.floor((resampleCount - 1) * quantiles[1])), resampleCount)
+
+    executor = None
+    if workerCount is None or workerCount > 1:
+        workerCount = workerCount or os.cpu_count() or 1
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workerCount)
+    try:
+        bands = {}
+        for (name, (ordered, fractions)), seedSequence in zip(curves.items(), seedSequences):
+            if len(ordered) == 0:
+                bands[name] = (ordered, ordered)
+                continue
+
+            batchSizes = [min(batchSize, resampleCount - i) for i in range(0, resampleCount, batchSize)]
+            batchSeeds = seedSequence.spawn(len(batchSizes))
+            lowest = numpy.empty((0, len(ordered)))
+            highest = numpy.empty((0, len(ordered)))
+            for resamples in ResampleBatches(executor, workerCount, ordered, batchSizes, batchSeeds):
+                lowest = LowestRows(numpy.concatenate([lowest, resamples]), lowestCount)
+                highest = HighestRows(numpy.concatenate([highest, resamples]), highestCount)
+
+            lowest.sort(axis=0)
+            highest.sort(axis=0)
+            lower = QuantileFromRanks(lowest, 0, resampleCount, quantiles[0])
+            upper = QuantileFromRanks(highest, resampleCount - highestCount, resampleCount, quantiles[1])
+            bands[name] = (lower, upper)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return bands
+
+
+# Tnuc values of a CSV file, the Tnuc column if there is one or else the last column
+def ReadNucleationTemperatures(fileName):
+    import pandas
+    frame = pandas.read_csv(fileName)
+    column = 'Tnuc' if 'Tnuc' in frame.columns else frame.columns[-1]
+    return frame[column].to_numpy(dtype=float)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Survival curves and bootstrap confidence bands of nucleation temperatures, one or more samples.')
+    parser.add_argument('sampleFiles', nargs='*', help='CSV files of nucleation temperatures, e.g. liveTail _filtered.csv files')
+    parser.add_argument('--store', help='cycle store directory, every sample in it is added without its outlier cycles')
+    parser.add_argument('--resamples', type=int, default=1000, help='bootstrap resamples per sample, 0 for no bands (default: %(default)s)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='confidence level of the bands (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=None, help='random seed, for repeatable bands')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes for the bootstrap (default: %(default)s)')
+    parser.add_argument('--output', default='-', help='output CSV file (default: standard output)')
+    args = parser.parse_args(argv)
+
+    if not args.sampleFiles and not args.store:
+        parser.error('give sample files or --store')
+
+    samples = {os.path.splitext(os.path.basename(fileName))[0]:ReadNucleationTemperatures(fileName) for fileName in args.sampleFiles}
+    if args.store:
+        import cycleStore
+        samples.update(cycleStore.CycleStore(args.store).NucleationTemperatures())
+    curves = SurvivalCurves(samples)
+    bands = {}
+    if args.resamples > 0:
+        bands = BootstrapBands(samples, args.resamples, args.confidence, args.seed, workerCount=args.workers)
+
+    outputFile = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    try:
+        writer = csv.writer(outputFile)
+        writer.writerow(['Sample', 'Tnuc', 'UnfrozenFraction', 'Lower', 'Upper'])
+        for name, (ordered, fractions) in curves.items():
+            lower, upper = bands.get(name, ([''] * len(ordered), [''] * len(ordered)))
+            writer.writerows(zip([name] * len(ordered), ordered, fractions, lower, upper))
+    finally:
+        if outputFile is not sys.stdout:
+            outputFile.close()
+
+
+if __name__ == "__main__":
+    main()
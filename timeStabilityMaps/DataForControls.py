@@ -1,5 +1,5 @@
-import collections, inspect
-import pyeq3
+import os, collections, inspect, json, hashlib, tempfile
+import importlib.metadata, importlib.util
 
 exampleText_2D = """\
 
@@ -58,51 +58,106 @@ excludedModuleNames_3D = [
     'UserDefinedFunction',
 ]
 
-eq_od2D = collections.OrderedDict()
-for submodule in inspect.getmembers(pyeq3.Models_2D):
-    if inspect.ismodule(submodule[1]):
-        if submodule[0] in excludedModuleNames_2D:
-            continue
-        eq_od2D[submodule[0]] = collections.OrderedDict()
-        for equationClass in inspect.getmembers(submodule[1]):
-            if inspect.isclass(equationClass[1]):
-                for extendedVersionName in ['Default', 'Offset']:
-                    
-                    # if the equation *already* has an offset,do not add an offset version here
-                    if (-1 != extendedVersionName.find('Offset')) and (equationClass[1].autoGenerateOffsetForm == False):
-                        continue
-                        
-                    # if the equation requires special user input, exclude here
-                    if equationClass[1].userSelectablePolynomialFlag or \
-                       equationClass[1].userCustomizablePolynomialFlag or \
-                       equationClass[1].userSelectableRationalFlag:
-                        continue
-
-                    equation = equationClass[1]('SSQABS', extendedVersionName)
-                    equationName = equation.GetDisplayName()                    
-                    eq_od2D[submodule[0]][equationName] = [equationClass[0], extendedVersionName]
-
-
-eq_od3D = collections.OrderedDict()
-for submodule in inspect.getmembers(pyeq3.Models_3D):
-    if inspect.ismodule(submodule[1]):
-        if submodule[0] in excludedModuleNames_3D:
-            continue
-        eq_od3D[submodule[0]] = collections.OrderedDict()
-        for equationClass in inspect.getmembers(submodule[1]):
-            if inspect.isclass(equationClass[1]):
-                for extendedVersionName in ['Default', 'Offset']:
-                    
-                    # if the equation *already* has an offset,do not add an offset version here
-                    if (-1 != extendedVersionName.find('Offset')) and (equationClass[1].autoGenerateOffsetForm == False):
-                        continue
-                        
-                    # if the equation requires special user input, exclude here
-                    if equationClass[1].userSelectablePolynomialFlag or \
-                       equationClass[1].userCustomizablePolynomialFlag or \
-                       equationClass[1].userSelectableRationalFlag:
-                        continue
-
-                    equation = equationClass[1]('SSQABS', extendedVersionName)
-                    equationName = equation.GetDisplayName()                    
-                    eq_od3D[submodule[0]][equationName] = [equationClass[0], extendedVersionName]
+# The equation catalogues eq_od2D and eq_od3D are built on first
+# access rather than at import time.  Building them means importing
+# pyeq3 and instantiating every equation class, so the result is also
+# cached on disk per pyeq3 version and later runs only read the cache.
+# The cache file name also holds cacheFormatVersion and a hash of the
+# excluded module lists, so editing those lists starts a new cache;
+# increase cacheFormatVersion when changing how the catalogues are built
+cacheFormatVersion = 1
+
+def GetPyeq3Version():
+    # read from the package metadata, which avoids importing pyeq3
+    try:
+        return importlib.metadata.version('pyeq3')
+    except importlib.metadata.PackageNotFoundError:
+        spec = importlib.util.find_spec('pyeq3')
+        if spec is None or spec.origin is None:
+            return 'unknown'
+        return 'unknown-' + str(int(os.path.getmtime(spec.origin)))
+
+
+def GetCatalogueSettingsHash():
+    settings = json.dumps([cacheFormatVersion, excludedModuleNames_2D, excludedModuleNames_3D])
+    return hashlib.sha256(settings.encode()).hexdigest()[:12]
+
+
+def GetCacheDirectory():
+    cacheDirectory = os.environ.get('TIMESTABILITYMAPS_CACHE')
+    if not cacheDirectory:
+        cacheRoot = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        cacheDirectory = os.path.join(cacheRoot, 'timeStabilityMaps')
+    os.makedirs(cacheDirectory, exist_ok=True)
+    return cacheDirectory
+
+
+# return the cached JSON data for cacheName, building and
+# caching it with buildFunction if not yet cached
+def LoadOrBuildCache(cacheName, buildFunction):
+    fileName = os.path.join(GetCacheDirectory(), cacheName + '-' + GetPyeq3Version() + '-' + GetCatalogueSettingsHash() + '.json')
+    try:
+        with open(fileName, 'r') as cacheFile:
+            return json.load(cacheFile, object_pairs_hook=collections.OrderedDict)
+    except (OSError, ValueError):
+        pass
+
+    data = buildFunction()
+
+    # write to a temporary file and rename, so that concurrent
+    # processes never read a partially written cache file
+    try:
+        fd, tempName = tempfile.mkstemp(dir=os.path.dirname(fileName), suffix='.tmp')
+        with os.fdopen(fd, 'w') as cacheFile:
+            json.dump(data, cacheFile, separators=(',', ':'))
+        os.replace(tempName, fileName)
+    except OSError:
+        pass # an unwritable cache only costs time
+    return data
+
+
+def BuildEquationCatalogue(dimensionality):
+    import pyeq3
+
+    if dimensionality == 2:
+        models = pyeq3.Models_2D
+        excludedModuleNames = excludedModuleNames_2D
+    else:
+        models = pyeq3.Models_3D
+        excludedModuleNames = excludedModuleNames_3D
+
+    catalogue = collections.OrderedDict()
+    for submodule in inspect.getmembers(models):
+        if inspect.ismodule(submodule[1]):
+            if submodule[0] in excludedModuleNames:
+                continue
+            catalogue[submodule[0]] = collections.OrderedDict()
+            for equationClass in inspect.getmembers(submodule[1]):
+                if inspect.isclass(equationClass[1]):
+                    for extendedVersionName in ['Default', 'Offset']:
+
+                        # if the equation *already* has an offset,do not add an offset version here
+                        if (-1 != extendedVersionName.find('Offset')) and (equationClass[1].autoGenerateOffsetForm == False):
+                            continue
+
+                        # if the equation requires special user input, exclude here
+                        if equationClass[1].userSelectablePolynomialFlag or \
+                           equationClass[1].userCustomizablePolynomialFlag or \
+                           equationClass[1].userSelectableRationalFlag:
+                            continue
+
+                        equation = equationClass[1]('SSQABS', extendedVersionName)
+                        equationName = equation.GetDisplayName()
+                        catalogue[submodule[0]][equationName] = [equationClass[0], extendedVersionName]
+    return catalogue
+
+
+def __getattr__(name):
+    if name == 'eq_od2D':
+        value = LoadOrBuildCache('eq_od2D', lambda: BuildEquationCatalogue(2))
+    elif name == 'eq_od3D':
+        value = LoadOrBuildCache('eq_od3D', lambda: BuildEquationCatalogue(3))
+    else:
+        raise AttributeError('module ' + repr(__name__) + ' has no attribute ' + repr(name))
+    globals()[name] = value # later lookups do not reach __getattr__
+    return value
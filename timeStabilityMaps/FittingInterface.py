@@ -1,5 +1,4 @@
-import os, sys, queue, pickle, time, inspect
-import pyeq3
+import os, sys, queue, pickle, hashlib, time, inspect, threading, importlib
 
 import matplotlib # ensure this dependency imports for later use in fitting results
 
@@ -12,12 +11,37 @@ import DataForControls as dfc
 import FittingThread
 
 
+# Write the fitted equation to a pickle file named by the hash of its
+# contents, so archived fits never overwrite each other.  The file can
+# be re-opened later with "python FittingResultsViewer.py fileName"
+def ArchiveEquation(equation, archiveDirectory):
+    pickledEquation = pickle.dumps(equation)
+    fileName = os.path.join(archiveDirectory, 'equation_' + hashlib.sha256(pickledEquation).hexdigest()[:16] + '.pickle')
+    if not os.path.exists(fileName):
+        os.makedirs(archiveDirectory, exist_ok=True)
+        with open(fileName, 'wb') as pickledEquationFile:
+            pickledEquationFile.write(pickledEquation)
+    return fileName
+
+
+# the archive directory of tkinterFit.py, set by the TIMESTABILITYMAPS_ARCHIVE
+# environment variable, otherwise per user in the user's data directory
+def GetArchiveDirectory():
+    archiveDirectory = os.environ.get('TIMESTABILITYMAPS_ARCHIVE')
+    if not archiveDirectory:
+        dataRoot = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+        archiveDirectory = os.path.join(dataRoot, 'timeStabilityMaps', 'archive')
+    return archiveDirectory
+
+
 class InterfaceFrame(tk.Frame):
     
-    def __init__(self, parent):
+    # if archiveDirectory is given every fitted equation is archived there
+    def __init__(self, parent, archiveDirectory=None):
         tk.Frame.__init__(self, parent)
         
         self.queue = queue.Queue()
+        self.archiveDirectory = archiveDirectory
 
         self.equationSelect_2D = tk.IntVar()
         self.equationSelect_3D = tk.IntVar()
@@ -158,6 +182,10 @@ class InterfaceFrame(tk.Frame):
         # now bind our custom ""status_update"" event to the handler function
         self.bind('<<status_update>>', self.StatusUpdateHandler)
 
+        # pyeq3 is slow to import and only needed when fitting, so import
+        # it in the background while the user looks at the window
+        threading.Thread(target=importlib.import_module, args=('pyeq3',), daemon=True).start()
+
 
     def moduleSelectChanged_2D(self, event):
         self.cb_Equations2D['values'] = sorted(list(dfc.eq_od2D[event.widget.get()].keys()))
@@ -170,6 +198,7 @@ class InterfaceFrame(tk.Frame):
 
 
     def OnFit_2D(self):
+        import pyeq3
         textData = self.text_2D.get("1.0", tk.END)
         moduleSelection = self.cb_Modules2D.get()
         equationSelection = self.cb_Equations2D.get()
@@ -221,6 +250,7 @@ class InterfaceFrame(tk.Frame):
 
 
     def OnFit_3D(self):
+        import pyeq3
         textData = self.text_3D.get("1.0", tk.END)
         moduleSelection = self.cb_Modules3D.get()
         equationSelection = self.cb_Equations3D.get()
@@ -280,15 +310,11 @@ class InterfaceFrame(tk.Frame):
         if type(data) == type(''): # text is used for status box display to user
             self.statusBox.text.insert(tk.END, data + '\n')
         else: # the queue data is now the fitted equation.
-            # write the fitted equation to a pickle file.  This
-            # allows the possibility of archiving the fitted equations
-            pickledEquationFile = open("pickledEquationFile", "wb")
-            pickle.dump(data, pickledEquationFile)
-            pickledEquationFile.close()
-    
-            # view fitting results
-            p = os.popen(sys.executable + ' FittingResultsViewer.py')
-            p.close()
+            if self.archiveDirectory:
+                try:
+                    ArchiveEquation(data, self.archiveDirectory)
+                except OSError as e: # the fit is still shown
+                    tk_mbox.showwarning('Archive Error', 'The fit could not be archived in ' + self.archiveDirectory + ':\n' + str(e))
 
             # re-enable fitting buttons
             self.buttonFit_2D.config(state=tk.NORMAL)
@@ -296,7 +322,29 @@ class InterfaceFrame(tk.Frame):
         
             # destroy the now-unused status box
             self.statusBox.destroy()
-            
+
+            # view fitting results
+            self.ShowResults(data)
+
+
+    # the results are viewed in a new window of this process, with
+    # the fitted equation passed directly rather than through a file
+    def ShowResults(self, equation):
+        import FittingResultsViewer
+
+        resultsWindow = tk.Toplevel(self)
+        resultsWindow.title("tkinterFit - Fitting Results Viewer")
+        resultsFrame = FittingResultsViewer.ResultsFrame(resultsWindow, equation)
+        resultsFrame.pack()
+
+        # in tkinter the results window must be manually centered
+        resultsWindow.update_idletasks()
+        width = resultsWindow.winfo_width()
+        height = resultsWindow.winfo_height()
+        x = (resultsWindow.winfo_screenwidth() // 2) - (width // 2) # integer division
+        y = (resultsWindow.winfo_screenheight() // 2) - (height // 2) # integer division
+        resultsWindow.geometry('{}x{}+{}+{}'.format(width, height, x, y))
+
 
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-import pickle
+import sys, pickle
 import pyeq3
 
 import tkinter as tk
@@ -11,156 +11,88 @@ import IndividualReports
 import AdditionalInfo
 
 
+# source code report languages and their tab titles
+sourceCodeLanguages = [['CPP', 'C++'],
+                       ['CSHARP', 'CSHARP'],
+                       ['VBA', 'VBA'],
+                       ['PYTHON', 'PYTHON'],
+                       ['JAVA', 'JAVA'],
+                       ['JAVASCRIPT', 'JAVASCRIPT'],
+                       ['JULIA', 'JULIA'],
+                       ['SCILAB', 'SCILAB'],
+                       ['MATLAB', 'MATLAB'],
+                       ['FORTRAN90', 'FORTRAN90'],
+                       ]
+
+
 class ResultsFrame(tk.Frame):
     
-    def __init__(self, parent, pickledEquationFileName):
+    # equation is either the fitted equation itself or
+    # the name of a file containing the pickled equation
+    def __init__(self, parent, equation):
         tk.Frame.__init__(self, parent)
         
-        self.graphReportsListForPDF = []
-        self.textReportsListForPDF = []
-        self.sourceCodeReportsListForPDF = []
+        # Reports are not created until their tab is first selected, or
+        # until a PDF file is created.  Each report tab is an empty frame
+        # until then, and created reports are kept for later re-use
+        self.reportFunctions = {} # tab frame name -> function creating the report
+        self.renderedReports = {} # tab frame name -> report
+        
+        # [tab frame, title] for each report, in PDF order
+        self.graphReportTabs = []
+        self.textReportTabs = []
+        self.sourceCodeReportTabs = []
         
-        # first, load the fitted equation
-        equationFile = open(pickledEquationFileName, 'rb')
-        self.equation = pickle.load(equationFile)
-        equationFile.close()
+        # first, load the fitted equation if given a file name
+        if type(equation) == type(''):
+            equationFile = open(equation, 'rb')
+            equation = pickle.load(equationFile)
+            equationFile.close()
+        self.equation = equation
         
         topLevelNotebook = ttk.Notebook(self)
+        topLevelNotebook.bind('<<NotebookTabChanged>>', self.OnTabChanged)
         topLevelNotebook.pack()
 
         # the "graph reports" notebook tab
         nbGraphReports = ttk.Notebook(topLevelNotebook)
+        nbGraphReports.bind('<<NotebookTabChanged>>', self.OnTabChanged)
         nbGraphReports.pack()
         topLevelNotebook.add(nbGraphReports, text='Graph Reports')
 
-        if self.equation.GetDimensionality() == 2:
-            report = IndividualReports.ModelScatterConfidenceGraph(nbGraphReports, self.equation, scatterplotOnlyFlag=False)
-            reportTitle = "Model With 95% Confidence"
-            nbGraphReports.add(report[0], text=reportTitle)
-            self.graphReportsListForPDF.append([report[1], reportTitle])
-
-            report = IndividualReports.ModelScatterConfidenceGraph(nbGraphReports, self.equation, scatterplotOnlyFlag=True)
-            reportTitle = "Scatter Plot"
-            nbGraphReports.add(report[0], text=reportTitle)
-            self.graphReportsListForPDF.append([report[1], reportTitle])
-        else:
-            report = IndividualReports.SurfacePlot(nbGraphReports, self.equation)
-            reportTitle = "Surface Plot"
-            nbGraphReports.add(report[0], text=reportTitle)
-            self.graphReportsListForPDF.append([report[1], reportTitle])
-            
-            report = IndividualReports.ContourPlot(nbGraphReports, self.equation)
-            reportTitle = "Contour Plot"
-            nbGraphReports.add(report[0], text=reportTitle)
-            self.graphReportsListForPDF.append([report[1], reportTitle])
-
-            report = IndividualReports.ScatterPlot(nbGraphReports, self.equation)
-            reportTitle = "Scatter Plot"
-            nbGraphReports.add(report[0], text=reportTitle)
-            self.graphReportsListForPDF.append([report[1], reportTitle])
-
-        report = IndividualReports.AbsoluteErrorGraph(nbGraphReports, self.equation)
-        reportTitle = "Absolute Error"
-        nbGraphReports.add(report[0], text=reportTitle)
-        self.graphReportsListForPDF.append([report[1], reportTitle])
-
-        report = IndividualReports.AbsoluteErrorHistogram(nbGraphReports, self.equation)
-        reportTitle = "Absolute Error Histogram"
-        nbGraphReports.add(report[0], text=reportTitle)
-        self.graphReportsListForPDF.append([report[1], reportTitle])
-
-        if self.equation.dataCache.DependentDataContainsZeroFlag != 1:
-            report = IndividualReports.PercentErrorGraph(nbGraphReports, self.equation)
-            reportTitle = "Percent Error"
-            nbGraphReports.add(report[0], text=reportTitle)
-            self.graphReportsListForPDF.append([report[1], reportTitle])
-
-            report = IndividualReports.PercentErrorHistogram(nbGraphReports, self.equation)
-            reportTitle = "Percent Error Histogram"
-            nbGraphReports.add(report[0], text=reportTitle)
-            self.graphReportsListForPDF.append([report[1], reportTitle])
+        for reportTitle, reportFunction in IndividualReports.GraphReportList(self.equation):
+            self.AddReportTab(nbGraphReports, reportTitle, self.graphReportTabs, reportFunction, fixedSize=True)
 
 
         # the "text reports" notebook tab
         nbTextReports = ttk.Notebook(topLevelNotebook)
+        nbTextReports.bind('<<NotebookTabChanged>>', self.OnTabChanged)
         nbTextReports.pack()
         topLevelNotebook.add(nbTextReports, text='Text Reports')
                 
-        report = IndividualReports.CoefficientAndFitStatistics(nbTextReports, self.equation)
-        reportTitle = "Coefficient And Fit Statistics"
-        nbTextReports.add(report, text=reportTitle)
-        self.textReportsListForPDF.append([report.get("1.0", tk.END), reportTitle])
+        self.AddReportTab(nbTextReports, "Coefficient And Fit Statistics", self.textReportTabs,
+                          lambda p: IndividualReports.CoefficientAndFitStatistics(p, self.equation))
         
-        report = IndividualReports.CoefficientListing(nbTextReports, self.equation)
-        reportTitle = "Coefficient Listing"
-        nbTextReports.add(report, text=reportTitle)
-        self.textReportsListForPDF.append([report.get("1.0", tk.END), reportTitle])
-
-        report = IndividualReports.DataArrayStatisticsReport(nbTextReports, 'Absolute Error Statistics', self.equation.modelAbsoluteError)
-        reportTitle = "Absolute Error Statistics"
-        nbTextReports.add(report, text=reportTitle)
-        self.textReportsListForPDF.append([report.get("1.0", tk.END), reportTitle])
+        self.AddReportTab(nbTextReports, "Coefficient Listing", self.textReportTabs,
+                          lambda p: IndividualReports.CoefficientListing(p, self.equation))
+
+        self.AddReportTab(nbTextReports, "Absolute Error Statistics", self.textReportTabs,
+                          lambda p: IndividualReports.DataArrayStatisticsReport(p, 'Absolute Error Statistics', self.equation.modelAbsoluteError))
         
         if self.equation.dataCache.DependentDataContainsZeroFlag != 1:
-            report = IndividualReports.DataArrayStatisticsReport(nbTextReports, 'Percent Error Statistics', self.equation.modelPercentError)
-            reportTitle = "Percent Error Statistics"
-            nbTextReports.add(report, text=reportTitle)
-            self.textReportsListForPDF.append([report.get("1.0", tk.END), reportTitle])
+            self.AddReportTab(nbTextReports, "Percent Error Statistics", self.textReportTabs,
+                              lambda p: IndividualReports.DataArrayStatisticsReport(p, 'Percent Error Statistics', self.equation.modelPercentError))
 
         # the "source code" notebook tab
         nbSourceCodeReports = ttk.Notebook(topLevelNotebook)
+        nbSourceCodeReports.bind('<<NotebookTabChanged>>', self.OnTabChanged)
         nbSourceCodeReports.pack()
         topLevelNotebook.add(nbSourceCodeReports, text='Source Code')
-                    
-        report = IndividualReports.SourceCodeReport(nbSourceCodeReports, self.equation, 'CPP')
-        reportTitle = "C++"
-        nbSourceCodeReports.add(report, text=reportTitle)
-        self.sourceCodeReportsListForPDF.append([report.get("1.0", tk.END), reportTitle + " Source Code"])
-    
-        report = IndividualReports.SourceCodeReport(nbSourceCodeReports, self.equation,'CSHARP')
-        reportTitle = "CSHARP"
-        nbSourceCodeReports.add(report, text=reportTitle)
-        self.sourceCodeReportsListForPDF.append([report.get("1.0", tk.END), reportTitle + " Source Code"])
-    
-        report = IndividualReports.SourceCodeReport(nbSourceCodeReports, self.equation,'VBA')
-        reportTitle = "VBA"
-        nbSourceCodeReports.add(report, text=reportTitle)
-        self.sourceCodeReportsListForPDF.append([report.get("1.0", tk.END), reportTitle + " Source Code"])
-    
-        report = IndividualReports.SourceCodeReport(nbSourceCodeReports, self.equation,'PYTHON')
-        reportTitle = "PYTHON"
-        nbSourceCodeReports.add(report, text=reportTitle)
-        self.sourceCodeReportsListForPDF.append([report.get("1.0", tk.END), reportTitle + " Source Code"])
-    
-        report = IndividualReports.SourceCodeReport(nbSourceCodeReports, self.equation,'JAVA')
-        reportTitle = "JAVA"
-        nbSourceCodeReports.add(report, text=reportTitle)
-        self.sourceCodeReportsListForPDF.append([report.get("1.0", tk.END), reportTitle + " Source Code"])
-    
-        report = IndividualReports.SourceCodeReport(nbSourceCodeReports, self.equation,'JAVASCRIPT')
-        reportTitle = "JAVASCRIPT"
-        nbSourceCodeReports.add(report, text=reportTitle)
-        self.sourceCodeReportsListForPDF.append([report.get("1.0", tk.END), reportTitle + " Source Code"])
-    
-        report = IndividualReports.SourceCodeReport(nbSourceCodeReports, self.equation,'JULIA')
-        reportTitle = "JULIA"
-        nbSourceCodeReports.add(report, text=reportTitle)
-        self.sourceCodeReportsListForPDF.append([report.get("1.0", tk.END), reportTitle + " Source Code"])
-    
-        report = IndividualReports.SourceCodeReport(nbSourceCodeReports, self.equation,'SCILAB')
-        reportTitle = "SCILAB"
-        nbSourceCodeReports.add(report, text=reportTitle)
-        self.sourceCodeReportsListForPDF.append([report.get("1.0", tk.END), reportTitle + " Source Code"])
-    
-        report = IndividualReports.SourceCodeReport(nbSourceCodeReports, self.equation,'MATLAB')
-        reportTitle = "MATLAB"
-        nbSourceCodeReports.add(report, text=reportTitle)
-        self.sourceCodeReportsListForPDF.append([report.get("1.0", tk.END), reportTitle + " Source Code"])
-    
-        report = IndividualReports.SourceCodeReport(nbSourceCodeReports, self.equation,'FORTRAN90')
-        reportTitle = "FORTRAN90"
-        nbSourceCodeReports.add(report, text=reportTitle)
-        self.sourceCodeReportsListForPDF.append([report.get("1.0", tk.END), reportTitle + " Source Code"])
+
+        for language, reportTitle in sourceCodeLanguages:
+            self.AddReportTab(nbSourceCodeReports, reportTitle, self.sourceCodeReportTabs,
+                              lambda p, language=language: IndividualReports.SourceCodeReport(p, self.equation, language),
+                              reportTitle + " Source Code")
 
         # the "additional information" notebook tab
         nbAdditionalInfo = ttk.Notebook(topLevelNotebook)
@@ -181,9 +113,8 @@ class ResultsFrame(tk.Frame):
 
         # the "list of all standard equations" notebook tab
         dim = self.equation.GetDimensionality()
-        allEquations = IndividualReports.AllEquationReport(topLevelNotebook, dim)
-        allEquations.pack()
-        topLevelNotebook.add(allEquations, text="List Of All Standard " + str(dim) + "D Equations")
+        self.AddReportTab(topLevelNotebook, "List Of All Standard " + str(dim) + "D Equations", None,
+                          lambda p: IndividualReports.AllEquationReport(p, dim))
 
         # the "Save To PDF" tab
         fsaveFrame = tk.Frame(self)
@@ -196,6 +127,57 @@ class ResultsFrame(tk.Frame):
         buttonSavePDF.pack()
         topLevelNotebook.add(fsaveFrame, text="Save To PDF File")
 
+        # the first graph is visible when the window opens
+        self.RenderSelectedTab(topLevelNotebook)
+
+
+    # add an empty tab, the report is created when first needed.  Graph
+    # tabs have the fixed size of a graph, which keeps the notebook from
+    # resizing as graphs are created, text tabs size to their text
+    def AddReportTab(self, notebook, reportTitle, reportTabList, reportFunction, pdfTitle=None, fixedSize=False):
+        if fixedSize:
+            frame = tk.Frame(notebook, width=IndividualReports.graphWidth, height=IndividualReports.graphHeight)
+            frame.pack_propagate(False)
+        else:
+            frame = tk.Frame(notebook)
+        notebook.add(frame, text=reportTitle)
+        self.reportFunctions[str(frame)] = reportFunction
+        if reportTabList is not None:
+            reportTabList.append([frame, pdfTitle or reportTitle])
+
+
+    # create the report in this tab frame if not already created
+    def RenderReport(self, frame):
+        frameName = str(frame)
+        if frameName not in self.renderedReports:
+            report = self.reportFunctions[frameName](frame)
+            if type(report) == type([]): # graph reports are [widget, figure]
+                report[0].pack(fill=tk.BOTH, expand=True)
+            else:
+                report.pack(fill=tk.BOTH, expand=True)
+            self.renderedReports[frameName] = report
+        return self.renderedReports[frameName]
+
+
+    def RenderSelectedTab(self, notebook):
+        selection = str(notebook.select())
+        if not selection:
+            return
+        if selection in self.reportFunctions:
+            self.RenderReport(notebook.nametowidget(selection))
+        else:
+            widget = notebook.nametowidget(selection)
+            if isinstance(widget, ttk.Notebook): # render the selected tab within
+                self.RenderSelectedTab(widget)
+
+
+    def OnTabChanged(self, event):
+        notebook = event.widget
+        # hidden notebooks also change tabs, when their first tab is added
+        if isinstance(notebook.master, ttk.Notebook) and str(notebook.master.select()) != str(notebook):
+            return
+        self.RenderSelectedTab(notebook)
+
 
     def createPDF(self):
         try:
@@ -212,19 +194,38 @@ class ResultsFrame(tk.Frame):
                                 )
         if fName:
             import pdfCode
+
+            # any reports not yet viewed are created now
+            graphReportsListForPDF = []
+            for frame, reportTitle in self.graphReportTabs:
+                graphReportsListForPDF.append([self.RenderReport(frame)[1], reportTitle])
+
+            textReportsListForPDF = []
+            for frame, reportTitle in self.textReportTabs:
+                textReportsListForPDF.append([self.RenderReport(frame).get("1.0", tk.END), reportTitle])
+
+            sourceCodeReportsListForPDF = []
+            for frame, reportTitle in self.sourceCodeReportTabs:
+                sourceCodeReportsListForPDF.append([self.RenderReport(frame).get("1.0", tk.END), reportTitle])
+
             pdfCode.CreatePDF(fName,
                               self.equation,
-                              self.graphReportsListForPDF,
-                              self.textReportsListForPDF,
-                              self.sourceCodeReportsListForPDF
+                              graphReportsListForPDF,
+                              textReportsListForPDF,
+                              sourceCodeReportsListForPDF
                               )
             tk_mbox.showinfo("Success", "\nSuccessfully created PDF file.")
 
 
 
 if __name__ == "__main__":
+    # an archived equation file name may be given on the command line
+    if len(sys.argv) > 1:
+        pickledEquationFileName = sys.argv[1]
+    else:
+        pickledEquationFileName = 'pickledEquationFile'
     root = tk.Tk()
-    interface = ResultsFrame(root, 'pickledEquationFile')
+    interface = ResultsFrame(root, pickledEquationFileName)
     interface.pack()
     root.title("Example tkinterFit -  Fitting Results Viewer")
     
@@ -1,6 +1,37 @@
-import os, sys, time, threading
+import os, sys, threading
 
-import pyeq3
+import fitCache
+
+
+# The fitting steps themselves, with no GUI dependency.  The optional
+# status function is called with a text string before each step, the
+# GUI uses it to update the status box and batch code may omit it.
+# A fit already in the fit cache is restored rather than fitted again,
+# useCache=False always fits
+def FitEquation(equation, statusFunction=None, useCache=True):
+    cache = fitCache.DefaultCache() if useCache else None
+    if cache is not None:
+        if statusFunction:
+            statusFunction('Looking for a cached fit...')
+        key = fitCache.FitKey(equation)
+        if cache.Restore(equation, key):
+            return equation
+
+    if statusFunction:
+        statusFunction('Fitting data...')
+    equation.Solve()
+
+    if statusFunction:
+        statusFunction('Calculating model errors...')
+    equation.CalculateModelErrors(equation.solvedCoefficients, equation.dataCache.allDataCacheDictionary)
+
+    if statusFunction:
+        statusFunction('Calculating coefficient and fit statistics...')
+    equation.CalculateCoefficientAndFitStatistics()
+
+    if cache is not None:
+        cache.Store(equation, key)
+    return equation
 
 
 class FittingThread(threading.Thread):
@@ -13,31 +44,16 @@ class FittingThread(threading.Thread):
         self.start()
 
 
-    def run(self):
-
-        statusString = 'Fitting data...'
-        self.notify_window.queue.put(statusString)
-        self.notify_window.event_generate('<<status_update>>')
-        time.sleep(0.5) # allow users a moment to see the update
-        self.equation.Solve()
-    
-        statusString = 'Calculating model errors...'
-        self.notify_window.queue.put(statusString)
-        self.notify_window.event_generate('<<status_update>>')
-        time.sleep(0.5) # allow users a moment to see the update
-        self.equation.CalculateModelErrors(self.equation.solvedCoefficients, self.equation.dataCache.allDataCacheDictionary)
-    
-        statusString = 'Calculating coefficient and fit statistics...'
+    def StatusUpdate(self, statusString):
         self.notify_window.queue.put(statusString)
         self.notify_window.event_generate('<<status_update>>')
-        time.sleep(0.5) # allow users a moment to see the update
-        self.equation.CalculateCoefficientAndFitStatistics()
 
-        statusString = 'Fitting complete, creating graphs and reports...'
-        self.notify_window.queue.put(statusString)
-        self.notify_window.event_generate('<<status_update>>')
-        time.sleep(0.5) # allow users a moment to see the update
-        
+
+    def run(self):
+        FitEquation(self.equation, self.StatusUpdate)
+
+        self.StatusUpdate('Fitting complete, creating graphs and reports...')
+
         # the fitted equation is now the queue's event data, rather than
         # a status update string.  The event handler checks the data type
         self.notify_window.queue.put(self.equation)
@@ -1,20 +1,30 @@
-import pickle, inspect, re
+import pickle, inspect, re, threading, weakref, hashlib
 import pyeq3
 import numpy, scipy
 
 import matplotlib
-matplotlib.use('TkAgg')
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import matplotlib.figure
 
 from mpl_toolkits.mplot3d import  Axes3D
 from matplotlib import cm # to colormap 3D surfaces from blue to red
-import matplotlib.pyplot as plt
 
-import tkinter as tk
-from tkinter import ttk as ttk
-from tkinter import messagebox as tk_mbox
-import tkinter.scrolledtext as tk_stxt
-import XYscrolledtext as xy_stxt
+# Tk is only needed for the GUI reports.  Headless code such as
+# isochoric/pipeline.py makes graph reports with parent None, drawn on the
+# Agg canvas, and text reports as text, so it runs without a Tk install
+try:
+    import tkinter as tk
+    from tkinter import ttk as ttk
+    from tkinter import messagebox as tk_mbox
+    import tkinter.scrolledtext as tk_stxt
+    import XYscrolledtext as xy_stxt
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    matplotlib.use('TkAgg')
+except ImportError:
+    tk = None
+    FigureCanvasTkAgg = None
+
+import DataForControls as dfc
 
 
 textboxWidth = 60 # units are characters
@@ -26,6 +36,179 @@ graphHeight = 600 # units are pixels
 # 3D contour plot lines
 numberOfContourLines = 10
 
+# number of model grid points along each axis for 3D plots
+surfaceGridResolution = 20
+contourGridResolution = 20
+
+# Time stability map contour levels, the natural log of the
+# Second, Minute, Hour, Day, Week, Month and Year in minutes
+contourLevels = numpy.log([1/60, 1, 60, 1440, 10080, 40320, 525600])
+
+# The contour plot grid starts at contourGridResolution and is refined
+# only in cells crossed by a contour level, see AdaptiveModelGrid().
+# The budget is the maximum number of model evaluations, and cells stop
+# refining once the model differs from interpolation by < tolerance
+contourRefinementFlag = True
+contourEvaluationBudget = 100000
+contourTolerance = 1.0E-3
+contourMaximumRefinements = 5
+
+
+# Data caches for model predictions, per equation and per grid of
+# independent data.  Building a pyeq3 data cache is the costly part
+# of a prediction, and several reports evaluate the same grid
+predictionCacheLock = threading.Lock()
+predictionCaches = weakref.WeakKeyDictionary() # equation -> {grid key: cache dictionary}
+
+
+def GridKey(independentData):
+    return (independentData.shape, hashlib.sha1(independentData.tobytes()).hexdigest())
+
+
+# Evaluate the fitted equation at X, or for 3D equations at (X, Y),
+# where X and Y are NumPy arrays of any shape.  The predictions have
+# the same shape as X.  The equation's own data cache is not modified,
+# so reports may call this from several threads at once
+def Predict(equation, X, Y=None, memoizeFlag=True):
+    X = numpy.asarray(X, dtype=float)
+    if Y is None: # 2D equations do not use the second row
+        Y = X
+    else:
+        Y = numpy.asarray(Y, dtype=float)
+    independentData = numpy.array([X.ravel(), Y.ravel()])
+
+    cacheDictionary = None
+    if memoizeFlag:
+        key = GridKey(independentData)
+        with predictionCacheLock:
+            cacheDictionary = predictionCaches.get(equation, {}).get(key)
+
+    if cacheDictionary is None:
+        cache = pyeq3.dataCache()
+        cache.allDataCacheDictionary['IndependentData'] = independentData
+        cache.FindOrCreateAllDataCache(equation)
+        cacheDictionary = cache.allDataCacheDictionary
+        if memoizeFlag:
+            with predictionCacheLock:
+                predictionCaches.setdefault(equation, {})[key] = cacheDictionary
+
+    predictions = equation.CalculateModelPredictions(equation.solvedCoefficients, cacheDictionary)
+    return numpy.reshape(predictions, X.shape)
+
+
+def DataRanges(equation):
+    x_data = equation.dataCache.allDataCacheDictionary['IndependentData'][0]
+    y_data = equation.dataCache.allDataCacheDictionary['IndependentData'][1]
+    return [min(x_data), max(x_data)], [min(y_data), max(y_data)]
+
+
+# the model evaluated on an evenly spaced grid spanning the 3D data
+def ModelGrid(equation, resolution):
+    x_data = equation.dataCache.allDataCacheDictionary['IndependentData'][0]
+    y_data = equation.dataCache.allDataCacheDictionary['IndependentData'][1]
+
+    xModel = numpy.linspace(min(x_data), max(x_data), resolution)
+    yModel = numpy.linspace(min(y_data), max(y_data), resolution)
+    X, Y = numpy.meshgrid(xModel, yModel)
+    return X, Y, Predict(equation, X, Y)
+
+
+# True for each grid cell whose corner values straddle one of the levels
+def CellsCrossingLevels(Z, levels):
+    corners = numpy.array([Z[:-1, :-1], Z[:-1, 1:], Z[1:, :-1], Z[1:, 1:]])
+    cellMin = corners.min(axis=0)[..., numpy.newaxis]
+    cellMax = corners.max(axis=0)[..., numpy.newaxis]
+    return numpy.any((cellMin < levels) & (cellMax >= levels), axis=-1)
+
+
+# Evaluate the model on a grid that is refined only where it matters
+# for contour lines.  Starting from an evenly spaced grid, each pass
+# doubles the grid density.  Points in cells crossed by a contour level
+# are evaluated with the model, all other new points are bilinearly
+# interpolated.  A cell stops refining when no level crosses it, or
+# when the model differs from interpolation there by less than the
+# tolerance.  Refinement also stops before a pass would exceed the
+# evaluation budget.  Returns X, Y, Z and the number of evaluations
+def AdaptiveModelGrid(equation, levels, initialResolution, evaluationBudget, tolerance, maximumRefinements):
+    xRange, yRange = DataRanges(equation)
+    levels = numpy.asarray(levels)
+
+    xModel = numpy.linspace(xRange[0], xRange[1], initialResolution)
+    yModel = numpy.linspace(yRange[0], yRange[1], initialResolution)
+    X, Y = numpy.meshgrid(xModel, yModel)
+    Z = Predict(equation, X, Y)
+    evaluationCount = Z.size
+
+    activeCells = CellsCrossingLevels(Z, levels)
+    for refinement in range(maximumRefinements):
+        if not activeCells.any():
+            break
+        rows, columns = Z.shape
+
+        # bilinear interpolation onto a grid of double density
+        fineZ = numpy.empty((2 * rows - 1, 2 * columns - 1))
+        fineZ[::2, ::2] = Z
+        fineZ[::2, 1::2] = 0.5 * (Z[:, :-1] + Z[:, 1:])
+        fineZ[1::2, ::2] = 0.5 * (Z[:-1, :] + Z[1:, :])
+        fineZ[1::2, 1::2] = 0.25 * (Z[:-1, :-1] + Z[:-1, 1:] + Z[1:, :-1] + Z[1:, 1:])
+
+        # the new points of the active cells are evaluated exactly
+        cellRows, cellColumns = numpy.nonzero(activeCells)
+        evaluateFlags = numpy.zeros(fineZ.shape, dtype=bool)
+        for rowOffset in range(3):
+            for columnOffset in range(3):
+                evaluateFlags[2 * cellRows + rowOffset, 2 * cellColumns + columnOffset] = True
+        evaluateFlags[::2, ::2] = False # already evaluated
+
+        newEvaluationCount = numpy.count_nonzero(evaluateFlags)
+        if evaluationCount + newEvaluationCount > evaluationBudget:
+            break
+
+        xModel = numpy.linspace(xRange[0], xRange[1], 2 * columns - 1)
+        yModel = numpy.linspace(yRange[0], yRange[1], 2 * rows - 1)
+        X, Y = numpy.meshgrid(xModel, yModel)
+
+        # grid points refined here are not used again, so no memoization
+        exact = Predict(equation, X[evaluateFlags], Y[evaluateFlags], memoizeFlag=False)
+        interpolationError = numpy.zeros(fineZ.shape)
+        interpolationError[evaluateFlags] = numpy.abs(exact - fineZ[evaluateFlags])
+        fineZ[evaluateFlags] = exact
+        evaluationCount += newEvaluationCount
+
+        # child cells of active cells remain active while a level crosses
+        # them and interpolation is not yet good enough at their corners
+        childCells = numpy.zeros((2 * rows - 2, 2 * columns - 2), dtype=bool)
+        for rowOffset in range(2):
+            for columnOffset in range(2):
+                childCells[2 * cellRows + rowOffset, 2 * cellColumns + columnOffset] = True
+        cellError = numpy.maximum.reduce([interpolationError[:-1, :-1], interpolationError[:-1, 1:],
+                                          interpolationError[1:, :-1], interpolationError[1:, 1:]])
+        activeCells = childCells & CellsCrossingLevels(fineZ, levels) & (cellError > tolerance)
+        Z = fineZ
+
+    return X, Y, Z, evaluationCount
+
+
+# graph reports draw on a matplotlib Figure rather than a pyplot figure
+# so they can also be made without any Tk window, parent is then None
+def NewFigure(parent):
+    f = matplotlib.figure.Figure(figsize=(graphWidth/100.0, graphHeight/100.0), dpi=100)
+    if parent is None:
+        canvas = FigureCanvasAgg(f)
+    else:
+        canvas = FigureCanvasTkAgg(f, master=parent)
+    return f, canvas
+
+
+# a figure made without a Tk window is not drawn here, as it
+# will be rasterized later when it is saved
+def GraphReport(canvas, f):
+    if FigureCanvasTkAgg is not None and isinstance(canvas, FigureCanvasTkAgg):
+        canvas.draw()
+        return [canvas.get_tk_widget(), f]
+    return [None, f]
+
+
 # this is used in several reports
 def DataArrayStatisticsReport(parent, titleString, tempdata):
     scrolledText = tk_stxt.ScrolledText(parent, width=textboxWidth, height=textboxHeight, wrap=tk.NONE)
@@ -88,59 +271,60 @@ def DataArrayStatisticsReport(parent, titleString, tempdata):
     return scrolledText
     
 
-def CoefficientAndFitStatistics(parent, equation):
-    scrolledText = tk_stxt.ScrolledText(parent, width=80, height=25, wrap=tk.NONE)
+# the text of the coefficient and fit statistics report, also used for PDF reports
+def CoefficientAndFitStatisticsText(equation):
+    lines = []
     if equation.upperCoefficientBounds or equation.lowerCoefficientBounds:
-        scrolledText.insert(tk.END, 'This model has coefficient bounds. Parameter statistics may\n')
-        scrolledText.insert(tk.END, 'not be valid for parameter values at or near the bounds.\n')
-        scrolledText.insert(tk.END, '\n')
+        lines.append('This model has coefficient bounds. Parameter statistics may\n')
+        lines.append('not be valid for parameter values at or near the bounds.\n')
+        lines.append('\n')
     
-    scrolledText.insert(tk.END, 'Degress of freedom error ' + str(equation.df_e) + '\n')
-    scrolledText.insert(tk.END, 'Degress of freedom regression ' + str(equation.df_r) + '\n')
+    lines.append('Degress of freedom error ' + str(equation.df_e) + '\n')
+    lines.append('Degress of freedom regression ' + str(equation.df_r) + '\n')
     
     if equation.rmse == None:
-        scrolledText.insert(tk.END, 'Root Mean Squared Error (RMSE): n/a\n')
+        lines.append('Root Mean Squared Error (RMSE): n/a\n')
     else:
-        scrolledText.insert(tk.END, 'Root Mean Squared Error (RMSE): ' + str(equation.rmse) + '\n')
+        lines.append('Root Mean Squared Error (RMSE): ' + str(equation.rmse) + '\n')
     
     if equation.r2 == None:
-        scrolledText.insert(tk.END, 'R-squared: n/a\n')
+        lines.append('R-squared: n/a\n')
     else:
-        scrolledText.insert(tk.END, 'R-squared: ' + str(equation.r2) + '\n')
+        lines.append('R-squared: ' + str(equation.r2) + '\n')
     
     if equation.r2adj == None:
-        scrolledText.insert(tk.END, 'R-squared adjusted: n/a\n')
+        lines.append('R-squared adjusted: n/a\n')
     else:
-        scrolledText.insert(tk.END, 'R-squared adjusted: ' + str(equation.r2adj) + '\n')
+        lines.append('R-squared adjusted: ' + str(equation.r2adj) + '\n')
     
     if equation.Fstat == None:
-        scrolledText.insert(tk.END, 'Model F-statistic: n/a\n')
+        lines.append('Model F-statistic: n/a\n')
     else:
-        scrolledText.insert(tk.END, 'Model F-statistic: ' + str(equation.Fstat) + '\n')
+        lines.append('Model F-statistic: ' + str(equation.Fstat) + '\n')
     
     if equation.Fpv == None:
-        scrolledText.insert(tk.END, 'Model F-statistic p-value: n/a\n')
+        lines.append('Model F-statistic p-value: n/a\n')
     else:
-        scrolledText.insert(tk.END, 'Model F-statistic p-value: ' + str(equation.Fpv) + '\n')
+        lines.append('Model F-statistic p-value: ' + str(equation.Fpv) + '\n')
     
     if equation.ll == None:
-        scrolledText.insert(tk.END, 'Model log-likelihood: n/a\n')
+        lines.append('Model log-likelihood: n/a\n')
     else:
-        scrolledText.insert(tk.END, 'Model log-likelihood: ' + str(equation.ll) + '\n')
+        lines.append('Model log-likelihood: ' + str(equation.ll) + '\n')
     
     if equation.aic == None:
-        scrolledText.insert(tk.END, 'Model AIC: n/a\n')
+        lines.append('Model AIC: n/a\n')
     else:
-        scrolledText.insert(tk.END, 'Model AIC: ' + str(equation.aic) + '\n')
+        lines.append('Model AIC: ' + str(equation.aic) + '\n')
     
     if equation.bic == None:
-        scrolledText.insert(tk.END, 'Model BIC: n/a\n')
+        lines.append('Model BIC: n/a\n')
     else:
-        scrolledText.insert(tk.END, 'Model BIC: ' + str(equation.bic) + '\n')
+        lines.append('Model BIC: ' + str(equation.bic) + '\n')
     
     
-    scrolledText.insert(tk.END, '\n')
-    scrolledText.insert(tk.END, "Individual Parameter Statistics:\n")
+    lines.append('\n')
+    lines.append("Individual Parameter Statistics:\n")
     for i in range(len(equation.solvedCoefficients)):
         if type(equation.tstat_beta) == type(None):
             tstat = 'n/a'
@@ -153,24 +337,37 @@ def CoefficientAndFitStatistics(parent, equation):
             pstat = '%-.5E' %  ( equation.pstat_beta[i])
     
         if type(equation.sd_beta) != type(None):
-            scrolledText.insert(tk.END, "Coefficient %s = %-.16E, std error: %-.5E\n" % (equation.GetCoefficientDesignators()[i], equation.solvedCoefficients[i], equation.sd_beta[i]))
+            lines.append("Coefficient %s = %-.16E, std error: %-.5E\n" % (equation.GetCoefficientDesignators()[i], equation.solvedCoefficients[i], equation.sd_beta[i]))
         else:
-            scrolledText.insert(tk.END, "Coefficient %s = %-.16E, std error: n/a\n" % (equation.GetCoefficientDesignators()[i], equation.solvedCoefficients[i]))
-        scrolledText.insert(tk.END, "          t-stat: %s, p-stat: %s, 95 percent confidence intervals: [%-.5E, %-.5E]\n" % (tstat,  pstat, equation.ci[i][0], equation.ci[i][1]))
+            lines.append("Coefficient %s = %-.16E, std error: n/a\n" % (equation.GetCoefficientDesignators()[i], equation.solvedCoefficients[i]))
+        lines.append("          t-stat: %s, p-stat: %s, 95 percent confidence intervals: [%-.5E, %-.5E]\n" % (tstat,  pstat, equation.ci[i][0], equation.ci[i][1]))
             
-    scrolledText.insert(tk.END, '\n')
-    scrolledText.insert(tk.END, "Coefficient Covariance Matrix:\n")
+    lines.append('\n')
+    lines.append("Coefficient Covariance Matrix:\n")
     for i in  equation.cov_beta:
-        scrolledText.insert(tk.END, str(i) + '\n')
+        lines.append(str(i) + '\n')
         
+    return ''.join(lines)
+
+
+def CoefficientAndFitStatistics(parent, equation):
+    scrolledText = tk_stxt.ScrolledText(parent, width=80, height=25, wrap=tk.NONE)
+    scrolledText.insert(tk.END, CoefficientAndFitStatisticsText(equation))
+
     return scrolledText
 
 
-def CoefficientListing(parent, equation):
-    scrolledText = tk_stxt.ScrolledText(parent, width=textboxWidth, height=textboxHeight, wrap=tk.NONE)
+def CoefficientListingText(equation):
     cd = equation.GetCoefficientDesignators()
+    lines = []
     for i in range(len(equation.solvedCoefficients)):
-        scrolledText.insert(tk.END, "%s = %-.16E\n" % (cd[i], equation.solvedCoefficients[i]))
+        lines.append("%s = %-.16E\n" % (cd[i], equation.solvedCoefficients[i]))
+    return ''.join(lines)
+
+
+def CoefficientListing(parent, equation):
+    scrolledText = tk_stxt.ScrolledText(parent, width=textboxWidth, height=textboxHeight, wrap=tk.NONE)
+    scrolledText.insert(tk.END, CoefficientListingText(equation))
 
     return scrolledText
 
@@ -184,8 +381,7 @@ def SourceCodeReport(parent, equation, lanuageNameString):
 
 
 def AbsoluteErrorGraph(parent, equation):
-    f = plt.figure(figsize=(graphWidth/100.0, graphHeight/100.0), dpi=100)
-    canvas = FigureCanvasTkAgg(f, master=parent)
+    f, canvas = NewFigure(parent)
     axes = f.add_subplot(111)
     dep_data = equation.dataCache.allDataCacheDictionary['DependentData']
     abs_error = equation.modelAbsoluteError
@@ -200,15 +396,11 @@ def AbsoluteErrorGraph(parent, equation):
         
     axes.set_ylabel(" Absolute Error") # Y axis label is always absolute error
 
-    canvas.draw()
-    plt.close('all') # clean up after using pyplot or else thaere can be memory and process problems
-    
-    return [canvas.get_tk_widget(), f]
+    return GraphReport(canvas, f)
 
 
 def PercentErrorGraph(parent, equation):
-    f = plt.figure(figsize=(graphWidth/100.0, graphHeight/100.0), dpi=100)
-    canvas = FigureCanvasTkAgg(f, master=parent)
+    f, canvas = NewFigure(parent)
     axes = f.add_subplot(111)
     dep_data = equation.dataCache.allDataCacheDictionary['DependentData']
     per_error = equation.modelPercentError
@@ -223,14 +415,11 @@ def PercentErrorGraph(parent, equation):
         
     axes.set_ylabel(" Percent Error") # Y axis label is always percent error
 
-    canvas.draw()
-    plt.close('all') # clean up after using pyplot or else thaere can be memory and process problems
-    return [canvas.get_tk_widget(), f]
+    return GraphReport(canvas, f)
 
 
 def AbsoluteErrorHistogram(parent, equation):
-    f = plt.figure(figsize=(graphWidth/100.0, graphHeight/100.0), dpi=100)
-    canvas = FigureCanvasTkAgg(f, master=parent)
+    f, canvas = NewFigure(parent)
     axes = f.add_subplot(111)
     abs_error = equation.modelAbsoluteError
     bincount = len(abs_error)//2 # integer division
@@ -249,14 +438,11 @@ def AbsoluteErrorHistogram(parent, equation):
     axes.set_xlabel('Absolute Error') # X axis data label
     axes.set_ylabel(" Frequency") # Y axis label is frequency
 
-    canvas.draw()
-    plt.close('all') # clean up after using pyplot or else thaere can be memory and process problems
-    return [canvas.get_tk_widget(), f]
+    return GraphReport(canvas, f)
 
 
 def PercentErrorHistogram(parent, equation):
-    f = plt.figure(figsize=(graphWidth/100.0, graphHeight/100.0), dpi=100)
-    canvas = FigureCanvasTkAgg(f, master=parent)
+    f, canvas = NewFigure(parent)
     axes = f.add_subplot(111)
     per_error = equation.modelPercentError
     bincount = len(per_error)//2 # integer division
@@ -275,14 +461,11 @@ def PercentErrorHistogram(parent, equation):
     axes.set_xlabel('Percent Error') # X axis data label
     axes.set_ylabel(" Frequency") # Y axis label is frequency
 
-    canvas.draw()
-    plt.close('all') # clean up after using pyplot or else thaere can be memory and process problems
-    return [canvas.get_tk_widget(), f]
+    return GraphReport(canvas, f)
 
 
 def ModelScatterConfidenceGraph(parent, equation, scatterplotOnlyFlag):
-    f = plt.figure(figsize=(graphWidth/100.0, graphHeight/100.0), dpi=100)
-    canvas = FigureCanvasTkAgg(f, master=parent)
+    f, canvas = NewFigure(parent)
     axes = f.add_subplot(111)
     y_data = equation.dataCache.allDataCacheDictionary['DependentData']
     x_data = equation.dataCache.allDataCacheDictionary['IndependentData'][0]
@@ -293,13 +476,7 @@ def ModelScatterConfidenceGraph(parent, equation, scatterplotOnlyFlag):
     if not scatterplotOnlyFlag:
         # create data for the fitted equation plot
         xModel = numpy.linspace(min(x_data), max(x_data))
-
-        tempcache = equation.dataCache # store the data cache
-        equation.dataCache = pyeq3.dataCache()
-        equation.dataCache.allDataCacheDictionary['IndependentData'] = numpy.array([xModel, xModel])
-        equation.dataCache.FindOrCreateAllDataCache(equation)
-        yModel = equation.CalculateModelPredictions(equation.solvedCoefficients, equation.dataCache.allDataCacheDictionary)
-        equation.dataCache = tempcache # restore the original data cache
+        yModel = Predict(equation, xModel)
 
         # now the model as a line plot
         axes.plot(xModel, yModel)
@@ -336,32 +513,19 @@ def ModelScatterConfidenceGraph(parent, equation, scatterplotOnlyFlag):
     axes.set_xlabel('X Data') # X axis data label
     axes.set_ylabel('Y Data') # Y axis data label
 
-    canvas.draw()
-    plt.close('all') # clean up after using pyplot or else thaere can be memory and process problems
-    return [canvas.get_tk_widget(), f]
+    return GraphReport(canvas, f)
 
 
 def SurfacePlot(parent, equation):
-    f = plt.figure(figsize=(graphWidth/100.0, graphHeight/100.0), dpi=100)
-    canvas = FigureCanvasTkAgg(f, master=parent)
-    
-    matplotlib.pyplot.grid(True)
-    axes = Axes3D(f)
+    f, canvas = NewFigure(parent)
+    axes = f.add_subplot(111, projection='3d')
+    axes.grid(True)
     x_data = equation.dataCache.allDataCacheDictionary['IndependentData'][0]
     y_data = equation.dataCache.allDataCacheDictionary['IndependentData'][1]
     z_data = equation.dataCache.allDataCacheDictionary['DependentData']
 
-            
-    xModel = numpy.linspace(min(x_data), max(x_data), 20)
-    yModel = numpy.linspace(min(y_data), max(y_data), 20)
-    X, Y = numpy.meshgrid(xModel, yModel)
 
-    tempcache = equation.dataCache # store the data cache
-    equation.dataCache = pyeq3.dataCache()
-    equation.dataCache.allDataCacheDictionary['IndependentData'] = numpy.array([X, Y])
-    equation.dataCache.FindOrCreateAllDataCache(equation)
-    Z = equation.CalculateModelPredictions(equation.solvedCoefficients, equation.dataCache.allDataCacheDictionary)
-    equation.dataCache = tempcache# restore the original data cache
+    X, Y, Z = ModelGrid(equation, surfaceGridResolution)
 
     axes.plot_surface(X, Y, Z, rstride=1, cstride=1, cmap=cm.coolwarm, linewidth=1, antialiased=True, alpha=0.75)
 
@@ -372,14 +536,11 @@ def SurfacePlot(parent, equation):
     axes.set_ylabel('Y Data') # Y axis data label
     axes.set_zlabel('Z Data') # Z axis data label
 
-    canvas.draw()
-    plt.close('all') # clean up after using pyplot or else thaere can be memory and process problems
-    return [canvas.get_tk_widget(), f]
+    return GraphReport(canvas, f)
 
 
 def ContourPlot(parent, equation):
-    f = plt.figure(figsize=(graphWidth/100.0, graphHeight/100.0), dpi=100)
-    canvas = FigureCanvasTkAgg(f, master=parent)
+    f, canvas = NewFigure(parent)
     axes = f.add_subplot(111)
 
     x_data = equation.dataCache.allDataCacheDictionary['IndependentData'][0]
@@ -390,16 +551,11 @@ def ContourPlot(parent, equation):
     z_data[z_data > numpy.log(525600)] = numpy.log(525600)
     z_data[z_data < numpy.log(1/60)] = numpy.log(1/60)
 
-    xModel = numpy.linspace(min(x_data), max(x_data), 20)
-    yModel = numpy.linspace(min(y_data), max(y_data), 20)
-    X, Y = numpy.meshgrid(xModel, yModel)
-        
-    tempcache = equation.dataCache # store the data cache
-    equation.dataCache = pyeq3.dataCache()
-    equation.dataCache.allDataCacheDictionary['IndependentData'] = numpy.array([X, Y])
-    equation.dataCache.FindOrCreateAllDataCache(equation)
-    Z = equation.CalculateModelPredictions(equation.solvedCoefficients, equation.dataCache.allDataCacheDictionary)
-    equation.dataCache = tempcache # restore the original data cache
+    if contourRefinementFlag:
+        X, Y, Z, evaluationCount = AdaptiveModelGrid(equation, contourLevels, contourGridResolution,
+                                                     contourEvaluationBudget, contourTolerance, contourMaximumRefinements)
+    else:
+        X, Y, Z = ModelGrid(equation, contourGridResolution)
         
     #axes.plot(x_data, y_data, '.')
 
@@ -419,7 +575,7 @@ def ContourPlot(parent, equation):
     axes.spines["bottom"].set_linewidth(3)
 
     # Define levels in z-axis where we want lines to appear
-    levels = numpy.array(numpy.log([1/60, 1, 60, 1440, 10080, 40320, 525600]))
+    levels = contourLevels
 
     # Generate a color mapping of the levels we've specified
     cmap = matplotlib.cm.RdBu_r  # define the colormap
@@ -435,7 +591,7 @@ def ContourPlot(parent, equation):
     #norm = matplotlib.colors.BoundaryNorm(bounds, cmap.N)
 
 
-    cpf = matplotlib.pyplot.contourf(X, Y, Z, len(levels), cmap='RdBu_r')
+    cpf = axes.contourf(X, Y, Z, len(levels), cmap='RdBu_r')
 
    #cb = matplotlib.colorbar.ColorbarBase(X,Y,Z, cmap=cmap, norm=norm,
    #                               spacing='proportional', ticks=bounds, boundaries=bounds, format='%1i')
@@ -443,7 +599,7 @@ def ContourPlot(parent, equation):
     # Set all level lines to black
     line_colors = ['black' for l in cpf.levels]
 
-    CS = matplotlib.pyplot.contour(X, Y, Z, len(levels), colors='k', levels=levels)
+    CS = axes.contour(X, Y, Z, len(levels), colors='k', levels=levels)
 
 
     fmt = {}
@@ -452,20 +608,16 @@ def ContourPlot(parent, equation):
         fmt[l] = s
 
 
-    matplotlib.pyplot.clabel(CS, inline=1, fontsize=12, colors=line_colors, fmt=fmt) # labels for contours
-    plt.rcParams["figure.figsize"] = (10,10)
-    plt.savefig('contour.tif', dpi=300)
-    canvas.draw()
-    plt.close('all') # clean up after using pyplot or else thaere can be memory and process problems
-    return [canvas.get_tk_widget(), f]
+    axes.clabel(CS, inline=1, fontsize=12, colors=line_colors, fmt=fmt) # labels for contours
+    if parent is not None: # the GUI also saves a high resolution copy
+        f.savefig('contour.tif', dpi=300)
+    return GraphReport(canvas, f)
 
 
 def ScatterPlot(parent, equation):
-    f = plt.figure(figsize=(graphWidth/100.0, graphHeight/100.0), dpi=100)
-    canvas = FigureCanvasTkAgg(f, master=parent)
-    
-    matplotlib.pyplot.grid(True)
-    axes = Axes3D(f)
+    f, canvas = NewFigure(parent)
+    axes = f.add_subplot(111, projection='3d')
+    axes.grid(True)
     x_data = equation.dataCache.allDataCacheDictionary['IndependentData'][0]
     y_data = equation.dataCache.allDataCacheDictionary['IndependentData'][1]
     z_data = equation.dataCache.allDataCacheDictionary['DependentData']
@@ -477,23 +629,76 @@ def ScatterPlot(parent, equation):
     axes.set_ylabel('Y Data')
     axes.set_zlabel('Z Data')
 
-    canvas.draw()
-    plt.close('all') # clean up after using pyplot or else thaere can be memory and process problems
-    return [canvas.get_tk_widget(), f]
+    return GraphReport(canvas, f)
 
 
-def AllEquationReport(parent, dim):
-    xyscrolledText = xy_stxt.XYScrolledText(parent, width=textboxWidth, height=textboxHeight, wrap=tk.NONE)
-    xyscrolledText.tag_configure("sup", offset=5) # superscript is +5 pixels
-    xyscrolledText.tag_configure("sub", offset=-5) # subscript is -5 pixels
-    xyscrolledText.tag_configure("bold", font='-weight bold')
-    xyscrolledText.tag_configure("italic", font='-slant italic')
-    
+# [title, report function] for each graph report of the equation, the
+# functions take the parent widget, or None for a figure without Tk
+def GraphReportList(equation):
+    graphReports = []
+    if equation.GetDimensionality() == 2:
+        graphReports.append(["Model With 95% Confidence", lambda p: ModelScatterConfidenceGraph(p, equation, scatterplotOnlyFlag=False)])
+        graphReports.append(["Scatter Plot", lambda p: ModelScatterConfidenceGraph(p, equation, scatterplotOnlyFlag=True)])
+    else:
+        graphReports.append(["Surface Plot", lambda p: SurfacePlot(p, equation)])
+        graphReports.append(["Contour Plot", lambda p: ContourPlot(p, equation)])
+        graphReports.append(["Scatter Plot", lambda p: ScatterPlot(p, equation)])
+
+    graphReports.append(["Absolute Error", lambda p: AbsoluteErrorGraph(p, equation)])
+    graphReports.append(["Absolute Error Histogram", lambda p: AbsoluteErrorHistogram(p, equation)])
+
+    if equation.dataCache.DependentDataContainsZeroFlag != 1:
+        graphReports.append(["Percent Error", lambda p: PercentErrorGraph(p, equation)])
+        graphReports.append(["Percent Error Histogram", lambda p: PercentErrorHistogram(p, equation)])
+
+    return graphReports
+
+
+# split pyeq3's display HTML into [text, tag] segments, where tag
+# is 'sup', 'sub' or '' for text outside of any HTML tags
+def EquationDisplaySegments(html):
+    # html <br> tags become new line characters
+    html = html.replace('<br>', '\n')
+
+    # display pyeq3's html superscript and subscript tags
+    # tkinter has no native HTML widget, and pyeq3's html os
+    # simple and has no *nested* HTML tags - no recursion needed
+    segments = []
+    findIter = re.finditer(r'<su.>|</su.>', html)
+    currentIndex = 0
+    endingIndex = len(html)
+    itemCount = 0
+    for item in findIter:
+        span = item.span()
+        if not itemCount % 2: # text is *not* within HTML tags
+            segments.append([html[currentIndex:span[0]], ''])
+            currentIndex = span[1] # beginning tag
+        else: # text *is* within html tags
+            if html[span[1]-2] == 'b': # subscript tag
+                tag = 'sub'
+            else: # html superscript tag
+                tag = 'sup'
+            segments.append([html[currentIndex:span[1]-6], tag])
+            currentIndex = span[1] # ending tag
+        itemCount += 1
+
+    # any ending text, or if no tags were found
+    if currentIndex < endingIndex:
+        segments.append([html[currentIndex:endingIndex], ''])
+
+    return segments
+
+
+# [module name, equation name, display segments] for every standard
+# equation.  This instantiates every equation class, so the result is
+# cached on disk per pyeq3 version by AllEquationReport()
+def AllEquationListing(dim):
     if dim == 2:
         module = pyeq3.Models_2D
     else:
         module = pyeq3.Models_3D
-     
+
+    listing = []
     for submodule in inspect.getmembers(module):
         if inspect.ismodule(submodule[1]):
             for equationClass in inspect.getmembers(submodule[1]):
@@ -509,47 +714,30 @@ def AllEquationReport(parent, dim):
 
                         equationName = equation.GetDisplayName()
                         moduleName = str(dim) + 'D ' + submodule[0]
-                        
-                        xyscrolledText.insert(tk.END, moduleName, 'bold')
-                        xyscrolledText.insert(tk.END, '   ')
-                        xyscrolledText.insert(tk.END, equationName, 'italic')
-                        xyscrolledText.insert(tk.END, '   ')
+                        listing.append([moduleName, equationName, EquationDisplaySegments(equation.GetDisplayHTML())])
+
+    return listing
+
+
+def AllEquationReport(parent, dim):
+    xyscrolledText = xy_stxt.XYScrolledText(parent, width=textboxWidth, height=textboxHeight, wrap=tk.NONE)
+    xyscrolledText.tag_configure("sup", offset=5) # superscript is +5 pixels
+    xyscrolledText.tag_configure("sub", offset=-5) # subscript is -5 pixels
+    xyscrolledText.tag_configure("bold", font='-weight bold')
+    xyscrolledText.tag_configure("italic", font='-slant italic')
+
+    listing = dfc.LoadOrBuildCache('allEquations' + str(dim) + 'D', lambda: AllEquationListing(dim))
+
+    # the text widget accepts any number of text, tag pairs in a single
+    # insert, which is much faster than one insert per text fragment
+    insertArguments = []
+    for moduleName, equationName, segments in listing:
+        insertArguments += [moduleName, 'bold', '   ', '', equationName, 'italic', '   ', '']
+        for segment in segments:
+            insertArguments += segment
+        insertArguments += ['\n', '']
+    xyscrolledText.insert(tk.END, *insertArguments)
 
-                        html = equation.GetDisplayHTML()
-                        
-                        # html <br> tags become new line characters
-                        html = html.replace('<br>', '\n')
-                        
-                        # display pyeq3's html superscript and subscript tags
-                        # tkinter has no native HTML widget, and pyeq3's html os
-                        # simple and has no *nested* HTML tags - no recursion needed
-                        findIter = re.finditer(r'<su.>|</su.>', html)
-                        currentIndex = 0
-                        endingIndex = len(html)
-                        itemCount = 0
-                        for item in findIter:
-                            span = item.span()
-                            if not itemCount % 2: # text is *not* within HTML tags
-                                t = html[currentIndex:span[0]]
-                                xyscrolledText.insert(tk.END, t)
-                                currentIndex = span[1] # beginning tag
-                            else: # text *is* within html tags
-                                if html[span[1]-2] == 'b': # subscript tag
-                                    tag = 'sub'
-                                else: # html superscript tag
-                                    tag = 'sup'
-                                t = html[currentIndex:span[1]-6]
-                                xyscrolledText.insert(tk.END, t, tag)
-                                currentIndex = span[1] # ending tag
-                            itemCount += 1
-
-                        # any ending text, or if no tags were found
-                        if currentIndex < endingIndex:
-                            t = html[currentIndex:endingIndex]
-                            xyscrolledText.insert(tk.END, t)
-                            
-                        xyscrolledText.insert(tk.END, '\n')
-                        
     return xyscrolledText
 
 
@@ -0,0 +1,192 @@
+import os, sys, glob, json, time, argparse
+
+# allow both "python batch.py" from this directory and
+# "python -m timeStabilityMaps.batch" from the directory above
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy
+import pyeq3
+
+import DataForControls as dfc
+import FittingThread
+import dataLoader
+
+
+# the short fitting target names, extracted from the GUI's fitting target strings
+fittingTargetCodes = [t.split('(')[1].split(')')[0] for t in dfc.fittingTargetList]
+
+# fit statistics copied from the fitted equation into each result record
+statisticNames = ['nobs', 'df_e', 'df_r', 'rmse', 'r2', 'r2adj', 'Fstat', 'Fpv', 'll', 'aic', 'bic']
+
+
+# data is text, or a numeric array from dataLoader.ReadDataArray()
+def DataDimensionality(data):
+    # the first line with at least two leading numbers decides, as
+    # pyeq3's text convertor ignores any lines it cannot convert.  In an
+    # array a missing or non-numeric value is NaN
+    if not isinstance(data, str):
+        for row in data:
+            if len(row) >= 2 and not (numpy.isnan(row[0]) or numpy.isnan(row[1])):
+                return 3 if len(row) >= 3 and not numpy.isnan(row[2]) else 2
+        raise ValueError('No 2D or 3D numeric data found')
+
+    for line in data.splitlines():
+        numberCount = 0
+        for token in line.split()[:3]:
+            try:
+                float(token)
+            except ValueError:
+                break
+            numberCount += 1
+        if numberCount >= 2:
+            return numberCount
+    raise ValueError('No 2D or 3D numeric data found')
+
+
+# text, CSV, Parquet or NumPy .npy files are read directly into an
+# array, which is much faster than pyeq3's text conversion for large files
+def ReadDataFile(fileName):
+    return dataLoader.ReadDataArray(fileName)
+
+
+def CreateEquation(dimensionality, moduleName, equationName, fittingTarget):
+    if fittingTarget not in fittingTargetCodes:
+        raise ValueError('Unknown fitting target ' + repr(fittingTarget) + ', use one of ' + ', '.join(fittingTargetCodes))
+
+    if dimensionality == 2:
+        catalogue = dfc.eq_od2D
+        models = pyeq3.Models_2D
+    else:
+        catalogue = dfc.eq_od3D
+        models = pyeq3.Models_3D
+
+    try:
+        item = catalogue[moduleName][equationName]
+    except KeyError:
+        raise ValueError('No ' + str(dimensionality) + 'D equation ' + repr(equationName) + ' in module ' + repr(moduleName))
+
+    equationClass = getattr(getattr(models, moduleName), item[0])
+    return equationClass(fittingTarget, item[1])
+
+
+# create the equation and load the text or array data into its data
+# cache, with the same checks that the GUI makes before fitting
+def PrepareEquation(data, dimensionality, moduleName, equationName, fittingTarget):
+    equation = CreateEquation(dimensionality, moduleName, equationName, fittingTarget)
+
+    # convert to numeric data checking for log of negative numbers, etc.
+    if isinstance(data, str):
+        try:
+            pyeq3.dataConvertorService().ConvertAndSortColumnarASCII(data, equation, False)
+        except:
+            raise ValueError(equation.reasonWhyDataRejected)
+    else:
+        dataLoader.LoadDataArray(data, equation)
+
+    # check for number of coefficients > number of data points to be fitted
+    coeffCount = len(equation.GetCoefficientDesignators())
+    dataCount = len(equation.dataCache.allDataCacheDictionary['DependentData'])
+    if coeffCount > dataCount:
+        raise ValueError("This equation requires a minimum of " + str(coeffCount) + " data points, you have supplied " + repr(dataCount) + ".")
+
+    return equation
+
+
+def JsonValue(value):
+    if value is None:
+        return None
+    return float(value)
+
+
+def EquationResults(equation):
+    results = {}
+    results['displayName'] = equation.GetDisplayName()
+    results['coefficientDesignators'] = list(equation.GetCoefficientDesignators())
+    results['solvedCoefficients'] = [float(c) for c in equation.solvedCoefficients]
+    results['fittingTargetValue'] = JsonValue(equation.CalculateAllDataFittingTarget(equation.solvedCoefficients))
+    for name in statisticNames:
+        results[name] = JsonValue(getattr(equation, name, None))
+    return results
+
+
+# fit one equation to text or array data, errors are reported in
+# the returned record rather than raised so a batch can continue.
+# Fits in the fit cache are restored unless useCache is False
+def FitData(data, dimensionality, moduleName, equationName, fittingTarget, useCache=True):
+    result = {'dimensionality':dimensionality,
+              'module':moduleName,
+              'equation':equationName,
+              'fittingTarget':fittingTarget,
+              }
+    startTime = time.perf_counter()
+    try:
+        equation = PrepareEquation(data, dimensionality, moduleName, equationName, fittingTarget)
+        FittingThread.FitEquation(equation, useCache=useCache)
+        result.update(EquationResults(equation))
+        result['status'] = 'ok'
+    except Exception as e:
+        result['status'] = 'error'
+        result['message'] = str(e)
+    result['seconds'] = time.perf_counter() - startTime
+    return result
+
+
+# fitList is a list of (module, equation, fitting target) items,
+# each item is fitted to every data file of matching dimensionality
+def RunBatch(dataFileNames, fitList, outputFile, useCache=True):
+    resultCount = 0
+    for dataFileName in dataFileNames:
+        try:
+            data = ReadDataFile(dataFileName)
+            dimensionality = DataDimensionality(data)
+        except ValueError as e:
+            result = {'dataFile':dataFileName, 'status':'error', 'message':str(e)}
+            outputFile.write(json.dumps(result) + '\n')
+            resultCount += 1
+            continue
+
+        if dimensionality == 2:
+            catalogue, otherCatalogue = dfc.eq_od2D, dfc.eq_od3D
+        else:
+            catalogue, otherCatalogue = dfc.eq_od3D, dfc.eq_od2D
+        for moduleName, equationName, fittingTarget in fitList:
+            if equationName not in catalogue.get(moduleName, {}) and equationName in otherCatalogue.get(moduleName, {}):
+                continue # this fit is for the other dimensionality
+            result = FitData(data, dimensionality, moduleName, equationName, fittingTarget, useCache)
+            result['dataFile'] = dataFileName
+            outputFile.write(json.dumps(result) + '\n')
+            outputFile.flush() # partial results survive an interrupted batch
+            resultCount += 1
+    return resultCount
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fit 2D and 3D data files without the GUI, writing one JSON result per line.')
+    parser.add_argument('dataDirectory', help='directory of columnar data files, text, CSV, Parquet or NumPy .npy')
+    parser.add_argument('--pattern', default='*', help='file name pattern within the data directory (default: all files)')
+    parser.add_argument('--fits', help='JSON file containing a list of [module, equation, fitting target] items')
+    parser.add_argument('--fit', nargs=3, action='append', default=[], metavar=('MODULE', 'EQUATION', 'TARGET'),
+                        help='a single fit, may be repeated')
+    parser.add_argument('--output', default='-', help='output JSON lines file (default: standard output)')
+    parser.add_argument('--no-cache', action='store_true', help='always fit, without restoring fits from the fit cache')
+    args = parser.parse_args(argv)
+
+    fitList = [tuple(fit) for fit in args.fit]
+    if args.fits:
+        with open(args.fits, 'r') as fitsFile:
+            fitList += [tuple(fit) for fit in json.load(fitsFile)]
+    if not fitList:
+        parser.error('no fits given, use --fits and/or --fit')
+
+    dataFileNames = sorted(f for f in glob.glob(os.path.join(args.dataDirectory, args.pattern)) if os.path.isfile(f))
+
+    if args.output == '-':
+        resultCount = RunBatch(dataFileNames, fitList, sys.stdout, not args.no_cache)
+    else:
+        with open(args.output, 'w') as outputFile:
+            resultCount = RunBatch(dataFileNames, fitList, outputFile, not args.no_cache)
+    print(str(resultCount) + ' fits written', file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
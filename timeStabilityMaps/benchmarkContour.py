@@ -0,0 +1,60 @@
+# Contour grid benchmark: uniform versus adaptive model evaluation.
+#
+# Fits the example 3D data, then evaluates the fitted surface for the
+# time stability map contour levels on a uniform grid and with
+# IndividualReports.AdaptiveModelGrid().  The error column is the largest
+# difference from the exact model in grid cells crossed by a level,
+# which is where the contour lines are drawn.
+#
+# usage: python benchmarkContour.py [uniform resolution]
+
+import sys, time
+import numpy
+
+import DataForControls as dfc
+import FittingThread
+import IndividualReports
+import batch
+
+
+def ContourCellError(equation, X, Y, Z, levels):
+    exact = IndividualReports.Predict(equation, X, Y, memoizeFlag=False)
+    crossing = IndividualReports.CellsCrossingLevels(exact, levels)
+    error = numpy.abs(Z - exact)
+    cellError = numpy.maximum.reduce([error[:-1, :-1], error[:-1, 1:], error[1:, :-1], error[1:, 1:]])
+    if not crossing.any():
+        return 0.0
+    return cellError[crossing].max()
+
+
+def main():
+    uniformResolution = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    equation = batch.PrepareEquation(dfc.exampleText_3D, 3, 'Polynomial', 'Full Cubic', 'SSQABS')
+    FittingThread.FitEquation(equation)
+    levels = IndividualReports.contourLevels
+    xRange, yRange = IndividualReports.DataRanges(equation)
+
+    print('%-30s %12s %12s %10s %12s' % ('grid', 'resolution', 'evaluations', 'seconds', 'max error'))
+
+    startTime = time.perf_counter()
+    X, Y = numpy.meshgrid(numpy.linspace(xRange[0], xRange[1], uniformResolution),
+                          numpy.linspace(yRange[0], yRange[1], uniformResolution))
+    Z = IndividualReports.Predict(equation, X, Y, memoizeFlag=False)
+    seconds = time.perf_counter() - startTime
+    print('%-30s %12s %12d %10.4f %12s' % ('uniform', str(uniformResolution), Z.size, seconds, '0'))
+
+    for tolerance in [1.0E-2, 1.0E-3, 1.0E-5]:
+        startTime = time.perf_counter()
+        X, Y, Z, evaluationCount = IndividualReports.AdaptiveModelGrid(equation, levels,
+                                                                       IndividualReports.contourGridResolution,
+                                                                       IndividualReports.contourEvaluationBudget,
+                                                                       tolerance,
+                                                                       IndividualReports.contourMaximumRefinements)
+        seconds = time.perf_counter() - startTime
+        error = ContourCellError(equation, X, Y, Z, levels)
+        print('%-30s %12s %12d %10.4f %12.3E' % ('adaptive, tolerance %.0E' % tolerance, str(Z.shape[0]), evaluationCount, seconds, error))
+
+
+if __name__ == "__main__":
+    main()
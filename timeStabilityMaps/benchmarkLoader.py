@@ -0,0 +1,78 @@
+# Data loading benchmark: pyeq3 text conversion versus dataLoader.
+#
+# Writes random 3D data of each size as whitespace text, CSV, NumPy .npy
+# and (if pyarrow is installed) Parquet files, then times reading each
+# file into an equation's data cache.  The pyeq3 row reads the text file
+# and converts it with ConvertAndSortColumnarASCII() as batch.py used to,
+# the other rows use dataLoader.ReadDataArray() and LoadDataArray().
+# The "same data" column checks the data cache matches the pyeq3 one.
+#
+# usage: python benchmarkLoader.py [largest row count]
+
+import sys, os, time, tempfile
+import numpy
+import pyeq3
+
+import batch
+import dataLoader
+
+
+def NewEquation():
+    return batch.CreateEquation(3, 'Polynomial', 'Linear', 'SSQABS')
+
+
+def SameDataCache(equation, referenceEquation):
+    for name in ['DependentData', 'IndependentData']:
+        if not numpy.array_equal(equation.dataCache.allDataCacheDictionary[name],
+                                 referenceEquation.dataCache.allDataCacheDictionary[name]):
+            return False
+    return True
+
+
+def WriteFiles(directory, rowCount):
+    data = numpy.random.default_rng(rowCount).uniform(-10.0, 10.0, (rowCount, 3))
+    fileNames = {}
+
+    fileNames['text'] = os.path.join(directory, 'data.txt')
+    numpy.savetxt(fileNames['text'], data, fmt='%.17g', header='X Y Z', comments='')
+    fileNames['csv'] = os.path.join(directory, 'data.csv')
+    numpy.savetxt(fileNames['csv'], data, fmt='%.17g', delimiter=',', header='X,Y,Z', comments='')
+    fileNames['npy'] = os.path.join(directory, 'data.npy')
+    numpy.save(fileNames['npy'], data)
+    try:
+        import pyarrow, pyarrow.parquet
+        fileNames['parquet'] = os.path.join(directory, 'data.parquet')
+        pyarrow.parquet.write_table(pyarrow.table({'X': data[:, 0], 'Y': data[:, 1], 'Z': data[:, 2]}), fileNames['parquet'])
+    except ImportError:
+        pass
+    return fileNames
+
+
+def main():
+    largestRowCount = int(float(sys.argv[1])) if len(sys.argv) > 1 else 1000000
+    rowCounts = [rowCount for rowCount in [1000, 100000, 1000000] if rowCount < largestRowCount] + [largestRowCount]
+
+    print('%-10s %-10s %10s %10s %10s' % ('rows', 'loader', 'seconds', 'speedup', 'same data'))
+
+    for rowCount in rowCounts:
+        with tempfile.TemporaryDirectory() as directory:
+            fileNames = WriteFiles(directory, rowCount)
+
+            startTime = time.perf_counter()
+            referenceEquation = NewEquation()
+            with open(fileNames['text'], 'r') as f:
+                text = f.read()
+            pyeq3.dataConvertorService().ConvertAndSortColumnarASCII(text, referenceEquation, False)
+            referenceSeconds = time.perf_counter() - startTime
+            print('%-10d %-10s %10.4f %10s %10s' % (rowCount, 'pyeq3', referenceSeconds, '1.0', ''))
+
+            for fileType, fileName in fileNames.items():
+                startTime = time.perf_counter()
+                equation = NewEquation()
+                dataLoader.LoadDataArray(dataLoader.ReadDataArray(fileName), equation)
+                seconds = time.perf_counter() - startTime
+                print('%-10d %-10s %10.4f %10.1f %10s' % (rowCount, fileType, seconds, referenceSeconds / seconds, SameDataCache(equation, referenceEquation)))
+
+
+if __name__ == "__main__":
+    main()
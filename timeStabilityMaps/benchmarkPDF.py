@@ -0,0 +1,74 @@
+# PDF export benchmark for a 3D fit.
+#
+# Fits the example 3D data, makes the same graph, text and source code
+# reports as the results viewer without any Tk window, then times
+# pdfCode.CreatePDF() rasterizing the graphs one after another in this
+# process, as it used to, and with the rasterization worker pool.  The
+# first pool export includes starting the worker processes.
+#
+# usage: python benchmarkPDF.py [repeat count] [worker count]
+
+import os, sys, time, tempfile, statistics, logging
+
+import DataForControls as dfc
+import FittingThread
+import FittingResultsViewer
+import IndividualReports
+import batch
+import pdfCode
+
+import pyeq3
+
+
+def GraphReports(equation):
+    return [[reportFunction(None)[1], title] for title, reportFunction in IndividualReports.GraphReportList(equation)]
+
+
+def SourceCodeReports(equation):
+    reports = []
+    for language, reportTitle in FittingResultsViewer.sourceCodeLanguages:
+        code = getattr(pyeq3.outputSourceCodeService(), 'GetOutputSourceCode' + language)(equation)
+        reports.append([code, reportTitle + " Source Code"])
+    return reports
+
+
+def TimeCreatePDF(fileName, equation, graphList, textList, sourceCodeList):
+    startTime = time.perf_counter()
+    pdfCode.CreatePDF(fileName, equation, graphList, textList, sourceCodeList)
+    return time.perf_counter() - startTime
+
+
+def main():
+    repeatCount = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    workerCount = int(sys.argv[2]) if len(sys.argv) > 2 else pdfCode.rasterizationWorkerCount
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR) # the contour plot asks for Arial
+
+    equation = batch.PrepareEquation(dfc.exampleText_3D, 3, 'Polynomial', 'Full Cubic', 'SSQABS')
+    FittingThread.FitEquation(equation)
+
+    graphList = GraphReports(equation)
+    textList = [[IndividualReports.CoefficientAndFitStatisticsText(equation), 'Coefficient And Fit Statistics'],
+                [IndividualReports.CoefficientListingText(equation), 'Coefficient Listing']]
+    sourceCodeList = SourceCodeReports(equation)
+
+    fileName = os.path.join(tempfile.mkdtemp(), 'report.pdf')
+
+    print('%d graphs, %d text and source code reports, %d rasterization workers' % (len(graphList), len(textList) + len(sourceCodeList), workerCount))
+    print('%-45s %10s %10s' % ('export', 'median s', 'min s'))
+
+    pdfCode.rasterizationWorkerCount = 0
+    times = [TimeCreatePDF(fileName, equation, graphList, textList, sourceCodeList) for i in range(repeatCount)]
+    print('%-45s %10.3f %10.3f' % ('sequential rasterization (before)', statistics.median(times), min(times)))
+
+    pdfCode.rasterizationWorkerCount = workerCount
+    firstTime = TimeCreatePDF(fileName, equation, graphList, textList, sourceCodeList)
+    print('%-45s %10.3f %10.3f' % ('worker pool, first export', firstTime, firstTime))
+    times = [TimeCreatePDF(fileName, equation, graphList, textList, sourceCodeList) for i in range(repeatCount)]
+    print('%-45s %10.3f %10.3f' % ('worker pool (after)', statistics.median(times), min(times)))
+
+    os.remove(fileName)
+    os.rmdir(os.path.dirname(fileName))
+
+
+if __name__ == "__main__":
+    main()
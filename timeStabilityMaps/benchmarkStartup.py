@@ -0,0 +1,50 @@
+# Startup benchmark for the lazy, cached equation catalogue.
+#
+# Each measurement runs in a fresh interpreter.  The "cold cache" rows
+# build the catalogues from pyeq3 exactly as importing DataForControls
+# used to do, and so are the "before" numbers; the "warm cache" rows
+# are the normal case once the cache exists.
+#
+# usage: python benchmarkStartup.py [repeat count]
+
+import os, sys, time, tempfile, shutil, subprocess, statistics
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+catalogueAccess = 'import DataForControls as dfc; dfc.eq_od2D; dfc.eq_od3D'
+
+measurements = [
+    ['import DataForControls', 'import DataForControls', False],
+    ['DataForControls + catalogues, cold cache (before)', catalogueAccess, False],
+    ['DataForControls + catalogues, warm cache (after)', catalogueAccess, True],
+    ['import FittingInterface, cold cache (before)', 'import FittingInterface, DataForControls as dfc; dfc.eq_od2D; dfc.eq_od3D; import pyeq3', False],
+    ['import FittingInterface, warm cache (after)', 'import FittingInterface, DataForControls as dfc; dfc.eq_od2D; dfc.eq_od3D', True],
+]
+
+
+def TimeStatement(statement, cacheDirectory):
+    environment = dict(os.environ, TIMESTABILITYMAPS_CACHE=cacheDirectory)
+    startTime = time.perf_counter()
+    subprocess.run([sys.executable, '-c', statement], cwd=here, env=environment, check=True)
+    return time.perf_counter() - startTime
+
+
+def main():
+    repeatCount = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print('%-55s %10s %10s' % ('measurement', 'median s', 'min s'))
+    for title, statement, warmFlag in measurements:
+        times = []
+        for i in range(repeatCount):
+            cacheDirectory = tempfile.mkdtemp()
+            try:
+                if warmFlag:
+                    TimeStatement(catalogueAccess, cacheDirectory) # fill the cache
+                times.append(TimeStatement(statement, cacheDirectory))
+            finally:
+                shutil.rmtree(cacheDirectory)
+        print('%-55s %10.3f %10.3f' % (title, statistics.median(times), min(times)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import os, sys, pickle, argparse
+import xml.sax.saxutils
+
+# allow both "python campaignReport.py" from this directory and
+# "python -m timeStabilityMaps.campaignReport" from the directory above
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import reportlab.platypus
+import reportlab.lib.colors
+import reportlab.lib.styles
+
+import IndividualReports
+import pdfCode
+
+
+# columns of the summary table, the equation attribute and column heading.
+# These are fields of the coefficient and fit statistics report
+summaryStatistics = [['rmse', 'RMSE'],
+                     ['r2', 'R-squared'],
+                     ['aic', 'AIC'],
+                     ['bic', 'BIC']]
+
+summaryColumnWidths = [25, 100, 143, 50, 50, 50, 50] # units are points, 468 fits letter page margins
+
+
+# each item is a fitted equation or the file name of an archived
+# (pickled) equation, as written by FittingInterface.ArchiveEquation()
+def LoadEquation(item):
+    if isinstance(item, str):
+        with open(item, 'rb') as pickledEquationFile:
+            return pickle.load(pickledEquationFile)
+    return item
+
+
+def DefaultTitle(item, index):
+    if isinstance(item, str):
+        return os.path.splitext(os.path.basename(item))[0]
+    return 'Fit ' + str(index + 1)
+
+
+def SummaryValue(equation, name):
+    value = getattr(equation, name, None)
+    if value is None:
+        return 'n/a'
+    return '%-.5E' % (value)
+
+
+# equations are loaded one at a time, only the table rows are kept
+def SummaryTableElements(equationItems, titleList, styles):
+    cellStyle = reportlab.lib.styles.ParagraphStyle(name='SummaryCell', parent=styles['BodyText'], fontSize=7, leading=8)
+
+    rows = [['', 'Title', 'Equation'] + [heading for name, heading in summaryStatistics]]
+    for index, item in enumerate(equationItems):
+        equation = LoadEquation(item)
+        row = [str(index + 1),
+               reportlab.platypus.Paragraph(xml.sax.saxutils.escape(titleList[index]), cellStyle),
+               reportlab.platypus.Paragraph(xml.sax.saxutils.escape(equation.GetDisplayName()), cellStyle)]
+        for name, heading in summaryStatistics:
+            row.append(SummaryValue(equation, name))
+        rows.append(row)
+
+    tableStyle = [('FONTSIZE', (0,0), (-1,-1), 7),
+                  ('VALIGN', (0,0), (-1,-1), 'TOP'),
+                  ('LINEBELOW', (0,0), (-1,0), 0.5, reportlab.lib.colors.black)]
+
+    yield reportlab.platypus.Paragraph('Summary', styles['Heading2'])
+    yield reportlab.platypus.Table(rows, colWidths=summaryColumnWidths, repeatRows=1, style=tableStyle) # splits across pages
+    yield reportlab.platypus.PageBreak()
+
+
+# the fit statistics and graph pages of one equation, its figures
+# are made and rasterized only when these pages are reached
+def FitReportElements(number, title, equation, styles):
+    yield reportlab.platypus.Paragraph(str(number) + '. ' + xml.sax.saxutils.escape(title), styles['Heading2'])
+    yield reportlab.platypus.Paragraph(xml.sax.saxutils.escape(equation.GetDisplayName()), styles['BodyText'])
+    yield reportlab.platypus.XPreformatted('<br/>', styles['CenteredBodyText'])
+
+    textList = [[IndividualReports.CoefficientAndFitStatisticsText(equation), 'Coefficient And Fit Statistics']]
+    yield from pdfCode.TextReportElements(textList, styles)
+
+    graphList = [[reportFunction(None)[1], reportTitle] for reportTitle, reportFunction in IndividualReports.GraphReportList(equation)]
+    yield from pdfCode.GraphReportElements(graphList, styles)
+
+
+# one PDF for a fitting campaign, a title page and summary table of all
+# fits followed by the pages of each fit.  The pages are streamed to the
+# document, so memory use does not grow with the number of fits
+def CreateCampaignPDF(inFileAndPathName, equationItems, titleList=None):
+    if titleList is None:
+        titleList = [DefaultTitle(item, index) for index, item in enumerate(equationItems)]
+
+    styles = pdfCode.ReportStyles()
+
+    def PageElements():
+        yield from pdfCode.TitlePageElements('Fitting campaign of ' + str(len(equationItems)) + ' fitted equations', styles)
+        yield from SummaryTableElements(equationItems, titleList, styles)
+        for index, item in enumerate(equationItems):
+            yield from FitReportElements(index + 1, titleList[index], LoadEquation(item), styles)
+
+    pdfCode.BuildPDF(inFileAndPathName, PageElements())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Create one PDF report for many archived fitted equations.')
+    parser.add_argument('outputFile', help='PDF file to create')
+    parser.add_argument('equationFiles', nargs='+', help='archived equation pickle files, in report order')
+    parser.add_argument('--title', action='append', help='title of each fit in the same order, e.g. the sample or concentration (default: file name)')
+    args = parser.parse_args(argv)
+
+    if args.title and len(args.title) != len(args.equationFiles):
+        parser.error('give one --title for each equation file')
+
+    CreateCampaignPDF(args.outputFile, args.equationFiles, args.title)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import os
+import numpy
+
+
+# Columnar data files are read straight into a float array, one column
+# per variable, and loaded into an equation's data cache with the same
+# checks and sorting as pyeq3's dataConvertorService().ConvertAndSortColumnarASCII(),
+# but vectorized and without converting the data to and from text.
+#
+# NumPy .npy files are memory-mapped and Parquet files are read with
+# pyarrow.  Text and CSV files are read with pandas if it is installed,
+# otherwise with numpy.genfromtxt().  In text, lines that do not convert
+# to numbers, such as column headings, become rows of NaN, which are
+# discarded when the data is loaded into the equation.
+
+
+# x, y, z and weight columns of text files
+maximumColumnCount = 4
+
+
+def ReadDataArray(fileName):
+    extension = os.path.splitext(fileName)[1].lower()
+    if extension == '.npy':
+        data = numpy.load(fileName, mmap_mode='r') # memory-mapped, not read into memory
+    elif extension in ['.parquet', '.pq']:
+        data = ReadParquet(fileName)
+    elif extension == '.csv':
+        data = ReadText(fileName, ',')
+    else:
+        data = ReadText(fileName, None) # whitespace delimited, as in the GUI
+
+    if data.ndim != 2:
+        raise ValueError('Expected columns of data in ' + fileName + ', found an array of shape ' + str(data.shape))
+    return data
+
+
+def ReadParquet(fileName):
+    try:
+        import pyarrow.parquet
+        import pyarrow.types
+    except ImportError:
+        raise ImportError("Could not import pyarrow, which is needed to read Parquet files.  Please install using the command 'pip3 install pyarrow'")
+
+    table = pyarrow.parquet.read_table(fileName, memory_map=True)
+    columns = []
+    for column in table.columns:
+        if pyarrow.types.is_integer(column.type) or pyarrow.types.is_floating(column.type):
+            columns.append(column.to_numpy().astype(float, copy=False))
+    if not columns:
+        return numpy.empty((0, 0))
+    return numpy.column_stack(columns)
+
+
+# the number of lines before the first line starting with a number,
+# such as column headings.  These lines would be discarded when the data
+# is loaded, skipping them lets the rest of the file be read as numbers
+def LeadingTextLineCount(fileName, delimiter):
+    lineCount = 0
+    with open(fileName, 'r') as f:
+        for line in f:
+            tokens = line.replace(delimiter or ' ', ' ').split()
+            if tokens:
+                try:
+                    float(tokens[0])
+                    return lineCount
+                except ValueError:
+                    pass
+            lineCount += 1
+    return lineCount
+
+
+def ReadText(fileName, delimiter):
+    try:
+        import pandas
+    except ImportError:
+        pandas = None
+
+    if pandas is not None:
+        # as with pyeq3's text conversion, the leading values of each
+        # line are used and any further values on the line are ignored
+        columns = range(maximumColumnCount)
+        skipRows = LeadingTextLineCount(fileName, delimiter)
+        try:
+            try:
+                frame = pandas.read_csv(fileName, sep=delimiter or r'\s+', header=None, skipinitialspace=True, skiprows=skipRows,
+                                        names=columns, usecols=columns, float_precision='round_trip')
+            except pandas.errors.ParserError: # usecols fails if no line has all of the columns
+                frame = pandas.read_csv(fileName, sep=delimiter or r'\s+', header=None, skipinitialspace=True, skiprows=skipRows,
+                                        names=columns, float_precision='round_trip')
+        except pandas.errors.EmptyDataError:
+            return numpy.empty((0, 0))
+        # float_precision='round_trip' gives the same values as float(),
+        # pandas.to_numeric() does not so it only finds the numbers in
+        # columns that also hold text such as column headings
+        data = numpy.full(frame.shape, numpy.nan)
+        for index, column in enumerate(frame.columns):
+            values = frame[column]
+            if pandas.api.types.is_numeric_dtype(values):
+                data[:, index] = values.to_numpy(dtype=float)
+            else:
+                numbers = pandas.to_numeric(values, errors='coerce').notna().to_numpy()
+                data[numbers, index] = values[numbers].to_numpy(dtype=str).astype(float)
+        return data[:, ~numpy.all(numpy.isnan(data), axis=0)]
+
+    # without pandas, lines with more values than the first line are skipped
+    data = numpy.genfromtxt(fileName, delimiter=delimiter, invalid_raise=False, ndmin=2)
+    return data[:, ~numpy.all(numpy.isnan(data), axis=0)]
+
+
+# load the first columns of the array into the equation's data cache,
+# x and z for 2D equations, x, y and z for 3D equations, and weights in
+# the following column if useWeightsFlag is set.  Raises ValueError if
+# the equation rejects the data, for example the log of negative numbers
+def LoadDataArray(data, equation, useWeightsFlag=False):
+    dimensionality = equation.GetDimensionality()
+    if dimensionality not in [2, 3]:
+        raise ValueError('Only 2D and 3D equations are supported')
+
+    columnCount = dimensionality + 1 if useWeightsFlag else dimensionality
+    if data.shape[1] < columnCount:
+        raise ValueError('This equation requires ' + str(columnCount) + ' data columns, you have supplied ' + str(data.shape[1]) + '.')
+
+    # rows are discarded where pyeq3 would discard a line of text
+    values = numpy.asarray(data[:, :dimensionality], dtype=float)
+    keep = numpy.all(numpy.isfinite(values) & (numpy.abs(values) <= 1.0E300), axis=1)
+    if useWeightsFlag:
+        weights = numpy.asarray(data[:, dimensionality], dtype=float)
+        keep &= ~numpy.isnan(weights)
+        weights = weights[keep]
+    values = values[keep]
+
+    dataCache = equation.dataCache
+    independentData1 = values[:, 0]
+    dependentData = values[:, -1]
+
+    dataCache.independentData1ContainsZeroFlag = bool(numpy.any(independentData1 == 0.0))
+    dataCache.independentData1ContainsPositiveFlag = bool(numpy.any(independentData1 > 0.0))
+    dataCache.independentData1ContainsNegativeFlag = bool(numpy.any(independentData1 < 0.0))
+    if dimensionality == 3:
+        independentData2 = values[:, 1]
+        dataCache.independentData2ContainsZeroFlag = bool(numpy.any(independentData2 == 0.0))
+        dataCache.independentData2ContainsPositiveFlag = bool(numpy.any(independentData2 > 0.0))
+        dataCache.independentData2ContainsNegativeFlag = bool(numpy.any(independentData2 < 0.0))
+    else:
+        dataCache.independentData2ContainsZeroFlag = False
+        dataCache.independentData2ContainsPositiveFlag = False
+        dataCache.independentData2ContainsNegativeFlag = False
+
+    # used in calculation of relative error to prevent divide-by-zero exceptions
+    dataCache.DependentDataContainsZeroFlag = bool(numpy.any(dependentData == 0.0))
+
+    if equation.ShouldDataBeRejected(equation) is True:
+        raise ValueError(equation.reasonWhyDataRejected)
+
+    # all data sorted by the dependent variable, as pyeq3 does
+    indices = numpy.argsort(dependentData)
+    dataCache.allDataCacheDictionary['DependentData'] = dependentData[indices]
+    if dimensionality == 2:
+        # the second unused row is for a bug in scipy.odr, as in pyeq3
+        dataCache.allDataCacheDictionary['IndependentData'] = numpy.array([independentData1[indices], numpy.ones(len(indices))])
+    else:
+        dataCache.allDataCacheDictionary['IndependentData'] = numpy.array([independentData1[indices], independentData2[indices]])
+
+    if useWeightsFlag:
+        dataCache.allDataCacheDictionary['Weights'] = weights[indices]
+    else:
+        dataCache.allDataCacheDictionary['Weights'] = []
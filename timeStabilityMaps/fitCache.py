@@ -0,0 +1,150 @@
+import os, pickle, hashlib, tempfile
+import numpy
+
+import DataForControls as dfc
+
+
+# Fitted coefficients and fit statistics cached on disk by the content of
+# the fit's inputs, so fitting the same data with the same equation and
+# fitting target again, as when a data set is re-opened to change the
+# graphs, restores the fit instead of running the solver again.
+#
+# The key is a hash of the data arrays, the equation's module, class and
+# extended version, its user settings (polynomial orders, flags, fixed and
+# estimated coefficients and coefficient bounds), the fitting target and
+# the pyeq3 version.  Each entry is one small file under
+# ~/.cache/timeStabilityMaps/fits, or $TIMESTABILITYMAPS_CACHE/fits, and
+# the least recently used entries are removed when the entries' total
+# size passes the size limit.
+
+
+defaultSizeLimit = 64 * 1024 * 1024 # bytes
+
+# set by Solve(), CalculateCoefficientAndFitStatistics() and the model
+# error calculation, the model errors are recalculated from the solved
+# coefficients rather than stored as they are as large as the data
+fitAttributeNames = ['solvedCoefficients', 'nobs', 'ncoef', 'df_e', 'df_r', 'sumOfSquaredErrors', 'rmse', 'r2', 'r2adj',
+                     'Fstat', 'Fpv', 'll', 'aic', 'bic', 'cov_beta', 'sd_beta', 'tstat_beta', 'pstat_beta', 'ci']
+
+# equation settings which change the fit, besides its class and fitting target
+settingAttributeNames = ['xPolynomialOrder', 'yPolynomialOrder', 'polyfunctional2DFlags', 'polyfunctional3DFlags',
+                         'rationalNumeratorFlags', 'rationalDenominatorFlags', 'fixedCoefficients', 'estimatedCoefficients',
+                         'upperCoefficientBounds', 'lowerCoefficientBounds']
+
+entrySuffix = '.pickle'
+
+
+def FitKey(equation):
+    digest = hashlib.sha256()
+
+    def Add(value):
+        if isinstance(value, numpy.ndarray):
+            digest.update(('array' + str(value.dtype) + str(value.shape)).encode())
+            digest.update(numpy.ascontiguousarray(value).tobytes())
+        else:
+            digest.update((type(value).__name__ + repr(value)).encode())
+        digest.update(b';')
+
+    Add(dfc.GetPyeq3Version())
+    Add(type(equation).__module__)
+    Add(type(equation).__name__)
+    Add(type(equation.extendedVersionHandler).__name__)
+    Add(equation.fittingTarget)
+    for name in settingAttributeNames:
+        value = getattr(equation, name, None)
+        Add(numpy.asarray(value) if isinstance(value, numpy.ndarray) else value)
+    dataCache = equation.dataCache.allDataCacheDictionary
+    for name in ['IndependentData', 'DependentData', 'Weights']:
+        Add(numpy.asarray(dataCache[name], dtype=float))
+    return digest.hexdigest()
+
+
+class FitCache:
+    def __init__(self, directory=None, sizeLimit=defaultSizeLimit):
+        if directory is None:
+            directory = os.path.join(dfc.GetCacheDirectory(), 'fits')
+        self.directory = directory
+        self.sizeLimit = sizeLimit
+
+
+    def FileName(self, key):
+        return os.path.join(self.directory, key + entrySuffix)
+
+
+    # restores a cached fit into the equation, whose data cache is
+    # already loaded, key is FitKey() of the equation before fitting as
+    # fitting may change its settings.  Returns False if the fit is not cached
+    def Restore(self, equation, key):
+        fileName = self.FileName(key)
+        try:
+            with open(fileName, 'rb') as f:
+                attributes = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return False
+
+        try:
+            os.utime(fileName) # most recently used
+        except OSError:
+            pass
+
+        for name, value in attributes.items():
+            setattr(equation, name, value)
+        equation.dataCache.FindOrCreateAllDataCache(equation) # the equation's terms, as Solve() would
+        equation.CalculateModelErrors(equation.solvedCoefficients, equation.dataCache.allDataCacheDictionary)
+        return True
+
+
+    # stores the fit of an equation that has been fitted and had its
+    # statistics calculated.  An unwritable cache only costs time
+    def Store(self, equation, key):
+        attributes = {name:getattr(equation, name) for name in fitAttributeNames if hasattr(equation, name)}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temporaryFileName = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(attributes, f)
+            os.replace(temporaryFileName, self.FileName(key))
+            self.Evict()
+        except OSError:
+            pass
+
+
+    # removes the least recently used entries until the total size is within the size limit
+    def Evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(entrySuffix):
+                try:
+                    status = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue # removed by another process
+                entries.append((status.st_mtime, status.st_size, name))
+
+        totalSize = sum(size for accessTime, size, name in entries)
+        for accessTime, size, name in sorted(entries):
+            if totalSize <= self.sizeLimit:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            totalSize -= size
+
+
+    def Clear(self):
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(entrySuffix):
+                    os.remove(os.path.join(self.directory, name))
+
+
+# the cache used by FittingThread.FitEquation(), replace it with a
+# FitCache for another directory or size limit
+defaultCache = None
+
+
+def DefaultCache():
+    global defaultCache
+    if defaultCache is None:
+        defaultCache = FitCache()
+    return defaultCache
@@ -1,45 +1,138 @@
-import time, os, glob
+import time, os, io
+import concurrent.futures
 import reportlab
 import reportlab.platypus
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
 import reportlab.lib.pagesizes
+import reportlab.pdfbase.pdfmetrics
 
 
-# from http://code.activestate.com/recipes/576832-improved-reportlab-recipe-for-page-x-of-y/
-class NumberedCanvas(canvas.Canvas):
-    def __init__(self, *args, **kwargs):
-        canvas.Canvas.__init__(self, *args, **kwargs)
-        self._saved_page_states = []
+# space left for the page count, which is not known when each footer is drawn
+pageCountWidth = reportlab.pdfbase.pdfmetrics.stringWidth('000', "Helvetica", 7)
+
 
+# "Page x of y" footers, after the recipe at
+# http://code.activestate.com/recipes/576832-improved-reportlab-recipe-for-page-x-of-y/
+# which kept a copy of every page's state until the page count was known.
+# Here each page's footer refers to a "pageCount" form that is drawn once
+# when the document is saved, so memory use does not grow with page count
+class NumberedCanvas(canvas.Canvas):
     def showPage(self):
-        self._saved_page_states.append(dict(self.__dict__))
-        self._startPage()
+        self.draw_page_number()
+        canvas.Canvas.showPage(self)
 
     def save(self):
-        """add page info to each page (page x of y)"""
-        num_pages = len(self._saved_page_states)
-        for state in self._saved_page_states:
-            self.__dict__.update(state)
-            self.draw_page_number(num_pages)
-            canvas.Canvas.showPage(self)
+        """draw the page count form used by every page, then save"""
+        if self._code: # a final page not yet shown
+            self.showPage()
+        self.beginForm('pageCount')
+        self.setFont("Helvetica", 7)
+        self.drawString(200*mm - pageCountWidth, 20*mm, str(self._pageNumber - 1))
+        self.endForm()
         canvas.Canvas.save(self)
 
-    def draw_page_number(self, page_count):
+    def draw_page_number(self):
         self.setFont("Helvetica", 7)
-        self.drawRightString(200*mm, 20*mm, "Page %d of %d" % (self._pageNumber, page_count))
+        self.drawRightString(200*mm - pageCountWidth, 20*mm, "Page %d of " % (self._pageNumber))
+        self.doForm('pageCount')
         self.drawCentredString(25*mm, 20*mm, 'https://bitbucket.org/zunzuncode/tkInterFit')
 
 
+# graphs are rasterized to PNG images in memory by a pool of this many
+# worker processes, kept for later reports.  0 or 1 rasterizes them in
+# this process, which is also the fallback if the pool cannot be used
+rasterizationWorkerCount = min(os.cpu_count() or 1, 8)
+rasterizationPool = None
+
+# text and source code report lines are wrapped at this many characters
+reportLineWidth = 100
+
+
+def RasterizeFigure(figure):
+    imageBuffer = io.BytesIO()
+    figure.savefig(imageBuffer, format='png')
+    return imageBuffer.getvalue()
+
+
+# returns the PNG image bytes of each figure, in order
+def RasterizeFigures(figureList):
+    global rasterizationPool
+    if rasterizationWorkerCount > 1 and len(figureList) > 1:
+        try:
+            if rasterizationPool is None:
+                rasterizationPool = concurrent.futures.ProcessPoolExecutor(max_workers=rasterizationWorkerCount)
+            return list(rasterizationPool.map(RasterizeFigure, figureList))
+        except Exception: # unpicklable figure or broken pool
+            rasterizationPool = None
+    return [RasterizeFigure(figure) for figure in figureList]
+
+
+# with supFlag HTML superscripts <sup>2</sup> become ^2, then
+# tabs become four spaces, a line starting with an HTML tag keeps only
+# the text after the last '>' and lines longer than reportLineWidth are
+# wrapped.  The lines are collected in a list and joined once, so the
+# time taken is linear in the length of the text
+def RebuildReportText(text, supFlag=False):
+    if supFlag:
+        text = text.replace('<sup>', '^')
+        text = text.replace('<SUP>', '^')
+        text = text.replace('</sup>', '')
+        text = text.replace('</SUP>', '')
+
+    text = text.replace('\t', '    ') # convert tabs to four spaces
+    text = text.replace('\r\n', '\n')
+
+    rebuiltLines = []
+    for line in text.split('\n'):
+        if line[:1] == '<':
+            splitLine = line.split('>')
+            if len(splitLine) > 1:
+                line = splitLine[-1]
+            else:
+                line = ''
 
-def CreatePDF(inFileAndPathName, inEquation, inGraphList, inTextList, inSourceCodeList):
-    pageElements = []
+        if len(line) > reportLineWidth:
+            rebuiltLines.extend(line[i:i + reportLineWidth] for i in range(0, len(line), reportLineWidth))
+        else:
+            rebuiltLines.append(line)
+
+    return '\n'.join(rebuiltLines) + '\n'
 
+
+def ReportStyles():
     styles = reportlab.lib.styles.getSampleStyleSheet()
 
     styles.add(reportlab.lib.styles.ParagraphStyle(name='CenteredBodyText', parent=styles['BodyText'], alignment=reportlab.lib.enums.TA_CENTER))
     styles.add(reportlab.lib.styles.ParagraphStyle(name='SmallCode', parent=styles['Code'], fontSize=6, alignment=reportlab.lib.enums.TA_LEFT)) # 'Code' and wordwrap=CJK causes problems
+    return styles
+
+
+# A list that fills itself from an iterator of page elements as reportlab
+# takes elements from the front of it, so that a document's elements are
+# made as they are needed rather than all held in memory at once.  A few
+# elements are kept ahead for reportlab's "keep with next" handling
+class ElementStream(list):
+    def __init__(self, elementIterator, lookahead=10):
+        list.__init__(self)
+        self.elementIterator = iter(elementIterator)
+        self.lookahead = lookahead
+
+    def __len__(self):
+        while list.__len__(self) < self.lookahead:
+            try:
+                self.append(next(self.elementIterator))
+            except StopIteration:
+                break
+        return list.__len__(self)
+
+
+def BuildPDF(inFileAndPathName, elementIterator):
+    doc = reportlab.platypus.SimpleDocTemplate(inFileAndPathName, pagesize=reportlab.lib.pagesizes.letter)
+    doc.build(ElementStream(elementIterator), canvasmaker=NumberedCanvas)
+
 
+def TitlePageElements(titleString, styles):
     myTableStyle = [('ALIGN', (1,1), (-1,-1), 'CENTER'),
                     ('VALIGN', (1,1), (-1,-1), 'MIDDLE')]
 
@@ -47,100 +140,54 @@ def CreatePDF(inFileAndPathName, inEquation, inGraphList, inTextList, inSourceCo
 
     table = reportlab.platypus.Table([tableRow], style=myTableStyle)
 
-    pageElements.append(table)
+    yield table
 
-    pageElements.append(reportlab.platypus.XPreformatted('<br/><br/><br/><br/>', styles['CenteredBodyText']))
+    yield reportlab.platypus.XPreformatted('<br/><br/><br/><br/>', styles['CenteredBodyText'])
 
-    pageElements.append(reportlab.platypus.Paragraph(inEquation.GetDisplayName(), styles['CenteredBodyText']))
-    pageElements.append(reportlab.platypus.XPreformatted('<br/><br/>', styles['CenteredBodyText']))
+    yield reportlab.platypus.Paragraph(titleString, styles['CenteredBodyText'])
+    yield reportlab.platypus.XPreformatted('<br/><br/>', styles['CenteredBodyText'])
 
-    pageElements.append(reportlab.platypus.XPreformatted('<br/><br/>', styles['CenteredBodyText']))
-    pageElements.append(reportlab.platypus.Paragraph("Created " + time.asctime(time.localtime()), styles['CenteredBodyText']))
+    yield reportlab.platypus.XPreformatted('<br/><br/>', styles['CenteredBodyText'])
+    yield reportlab.platypus.Paragraph("Created " + time.asctime(time.localtime()), styles['CenteredBodyText'])
 
-    pageElements.append(reportlab.platypus.PageBreak())
+    yield reportlab.platypus.PageBreak()
 
-    # make a page for each report output, with report name as page header
-    filenamePrefix = 'temp_'
-    index = 1
-    for report in inGraphList:
-        pageElements.append(reportlab.platypus.XPreformatted('<br/><br/>', styles['CenteredBodyText']))
+
+# a page for each graph, the figures are rasterized together
+def GraphReportElements(inGraphList, styles):
+    imageList = RasterizeFigures([report[0] for report in inGraphList])
+    for image in imageList:
+        yield reportlab.platypus.XPreformatted('<br/><br/>', styles['CenteredBodyText'])
         
-        # I could not get io.BytesIO and ImageReader to work, using files instead
-        # each image file name must be unique for reportlab's use - delete when done
-        fname = filenamePrefix + str(index) + '.png'
-        report[0].savefig(fname, format='png')
-        im = reportlab.platypus.Image(fname)
+        # images are kept in memory, there are no temporary files
+        im = reportlab.platypus.Image(io.BytesIO(image))
         im._restrictSize(600, 600) # if image is too large for one page
         im.hAlign = 'CENTER'
-        pageElements.append(im)
-        
-        index += 1
+        yield im
 
-        pageElements.append(reportlab.platypus.PageBreak())
-    
-    for report in inTextList + inSourceCodeList:
-        pageElements.append(reportlab.platypus.Preformatted(report[1], styles['SmallCode']))
-        pageElements.append(reportlab.platypus.XPreformatted('<br/><br/><br/>', styles['CenteredBodyText']))
+        yield reportlab.platypus.PageBreak()
 
-        replacedText = report[0]
-        
-        if -1 != report[1].find('Coefficients'):
-            reportText = reportText.replace('<sup>', '^')
-            reportText = reportText.replace('<SUP>', '^')
 
-        replacedText = replacedText.replace('\t', '    ') # convert tabs to four spaces
-        replacedText = replacedText.replace('\r\n', '\n')
+# a page or more for each text report, with report name as page header
+def TextReportElements(inTextList, styles):
+    for report in inTextList:
+        yield reportlab.platypus.Preformatted(report[1], styles['SmallCode'])
+        yield reportlab.platypus.XPreformatted('<br/><br/><br/>', styles['CenteredBodyText'])
 
-        rebuiltText = ''
-        for line in replacedText.split('\n'):
-            if line == '':
-                rebuiltText += '\n'
-            else:
-                if line[0] == '<':
-                    splitLine = line.split('>')
-                    if len(splitLine) > 1:
-                        newLine = splitLine[len(splitLine)-1]
-                    else:
-                        newLine = ''
-                else:
-                    newLine = line
-
-                # crude line wrapping
-                if len(newLine) > 500:
-                    rebuiltText += newLine[:100] + '\n'
-                    rebuiltText += newLine[100:200] + '\n'
-                    rebuiltText += newLine[200:300] + '\n'
-                    rebuiltText += newLine[300:400] + '\n'
-                    rebuiltText += newLine[400:500] + '\n'
-                    rebuiltText += newLine[500:] + '\n'
-                elif len(newLine) > 400:
-                    rebuiltText += newLine[:100] + '\n'
-                    rebuiltText += newLine[100:200] + '\n'
-                    rebuiltText += newLine[200:300] + '\n'
-                    rebuiltText += newLine[300:400] + '\n'
-                    rebuiltText += newLine[400:] + '\n'
-                elif len(newLine) > 300:
-                    rebuiltText += newLine[:100] + '\n'
-                    rebuiltText += newLine[100:200] + '\n'
-                    rebuiltText += newLine[200:300] + '\n'
-                    rebuiltText += newLine[300:] + '\n'
-                elif len(newLine) > 200:
-                    rebuiltText += newLine[:100] + '\n'
-                    rebuiltText += newLine[100:200] + '\n'
-                    rebuiltText += newLine[200:] + '\n'
-                elif len(newLine) > 100:
-                    rebuiltText += newLine[:100] + '\n'
-                    rebuiltText += newLine[100:] + '\n'
-                else:
-                    rebuiltText += newLine + '\n'
-                    
-        pageElements.append(reportlab.platypus.Preformatted(rebuiltText, styles['SmallCode']))
-
-        pageElements.append(reportlab.platypus.PageBreak())
-        
-    doc = reportlab.platypus.SimpleDocTemplate(inFileAndPathName, pagesize=reportlab.lib.pagesizes.letter)
-    doc.build(pageElements, canvasmaker=NumberedCanvas)
+        # the coefficient reports, 'Coefficient And Fit Statistics' and
+        # 'Coefficient Listing', may have HTML superscripts
+        rebuiltText = RebuildReportText(report[0], -1 != report[1].find('Coefficient'))
+        yield reportlab.platypus.Preformatted(rebuiltText, styles['SmallCode'])
+
+        yield reportlab.platypus.PageBreak()
+
+
+def CreatePDF(inFileAndPathName, inEquation, inGraphList, inTextList, inSourceCodeList):
+    styles = ReportStyles()
+
+    def PageElements():
+        yield from TitlePageElements(inEquation.GetDisplayName(), styles)
+        yield from GraphReportElements(inGraphList, styles)
+        yield from TextReportElements(inTextList + inSourceCodeList, styles)
 
-    # Done, now delete the temporary image files
-    for fname in glob.glob(filenamePrefix + "*.png"):
-        os.remove(fname)
+    BuildPDF(inFileAndPathName, PageElements())
@@ -0,0 +1,134 @@
+import os, sys, csv, math, signal, argparse
+import concurrent.futures
+
+# allow both "python ranking.py" from this directory and
+# "python -m timeStabilityMaps.ranking" from the directory above
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import DataForControls as dfc
+import batch
+
+
+# columns of the ranked table, in order
+tableColumns = ['rank', 'module', 'equation', 'fittingTarget', 'fittingTargetValue',
+                'rmse', 'r2', 'aic', 'bic', 'seconds', 'status', 'message']
+
+# each worker process receives the data once, not once per equation
+workerData = None
+workerDimensionality = None
+workerUseCache = True
+
+
+def InitializeWorker(data, dimensionality, useCache=True):
+    global workerData, workerDimensionality, workerUseCache
+    workerData = data
+    workerDimensionality = dimensionality
+    workerUseCache = useCache
+
+
+# not an Exception subclass, pyeq3 traps Exception in its fitting target code
+class FitTimeoutError(BaseException):
+    pass
+
+
+def RaiseFitTimeout(signum, frame):
+    raise FitTimeoutError()
+
+
+# runs in a worker process.  SIGALRM interrupts a fit that runs past
+# the timeout so the worker is free for the next equation, repeating
+# in case the first alarm lands in a bare "except:".  Platforms
+# without SIGALRM fit without a time limit
+def FitInWorker(moduleName, equationName, fittingTarget, timeout):
+    useAlarm = timeout and hasattr(signal, 'SIGALRM')
+    if useAlarm:
+        signal.signal(signal.SIGALRM, RaiseFitTimeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout, 0.1)
+    try:
+        try:
+            result = batch.FitData(workerData, workerDimensionality, moduleName, equationName, fittingTarget, workerUseCache)
+        finally:
+            if useAlarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except FitTimeoutError:
+        result = {'dimensionality':workerDimensionality,
+                  'module':moduleName,
+                  'equation':equationName,
+                  'fittingTarget':fittingTarget,
+                  'status':'timeout',
+                  'message':'Fit did not complete within ' + str(timeout) + ' seconds',
+                  'seconds':timeout,
+                  }
+    return result
+
+
+def EligibleEquations(dimensionality, moduleNames=None):
+    catalogue = dfc.eq_od2D if dimensionality == 2 else dfc.eq_od3D
+    eligible = []
+    for moduleName in catalogue:
+        if moduleNames and moduleName not in moduleNames:
+            continue
+        for equationName in catalogue[moduleName]:
+            eligible.append((moduleName, equationName))
+    return eligible
+
+
+def RankKey(result):
+    # successful fits first, lowest fitting target value first
+    value = result.get('fittingTargetValue')
+    if result['status'] != 'ok' or value is None or math.isnan(value):
+        return (1, math.inf)
+    return (0, value)
+
+
+# fit every eligible equation to the data with one process per
+# core, returning the results ranked by the fitting target value
+def RankEquations(data, fittingTarget, moduleNames=None, timeout=None, workerCount=None, useCache=True):
+    dimensionality = batch.DataDimensionality(data)
+    equations = EligibleEquations(dimensionality, moduleNames)
+
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workerCount,
+                                                initializer=InitializeWorker,
+                                                initargs=(data, dimensionality, useCache)) as executor:
+        futures = [executor.submit(FitInWorker, moduleName, equationName, fittingTarget, timeout)
+                   for moduleName, equationName in equations]
+        for future in concurrent.futures.as_completed(futures):
+            results.append(future.result())
+
+    results.sort(key=RankKey)
+    for index, result in enumerate(results):
+        result['rank'] = index + 1
+    return results
+
+
+def WriteRankingTable(results, outputFile):
+    writer = csv.DictWriter(outputFile, fieldnames=tableColumns, extrasaction='ignore')
+    writer.writeheader()
+    for result in results:
+        writer.writerow(result)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fit every eligible equation to one data file in parallel and rank them by the fitting target.')
+    parser.add_argument('dataFile', help='columnar 2D or 3D data file, text, CSV, Parquet or NumPy .npy')
+    parser.add_argument('--target', default='SSQABS', choices=batch.fittingTargetCodes, help='fitting target used for fitting and ranking')
+    parser.add_argument('--module', action='append', help='only fit equations from this module, may be repeated')
+    parser.add_argument('--timeout', type=float, default=None, help='per-equation time limit in seconds')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: one per core)')
+    parser.add_argument('--output', default='-', help='output CSV file of the ranked table (default: standard output)')
+    parser.add_argument('--no-cache', action='store_true', help='always fit, without restoring fits from the fit cache')
+    args = parser.parse_args(argv)
+
+    data = batch.ReadDataFile(args.dataFile)
+    results = RankEquations(data, args.target, args.module, args.timeout, args.workers, not args.no_cache)
+
+    if args.output == '-':
+        WriteRankingTable(results, sys.stdout)
+    else:
+        with open(args.output, 'w', newline='') as outputFile:
+            WriteRankingTable(results, outputFile)
+
+
+if __name__ == "__main__":
+    main()
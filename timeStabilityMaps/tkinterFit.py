@@ -1,10 +1,16 @@
+import sys
 import tkinter as tk
 import FittingInterface
 
+# every fit is archived for campaignReport.py and FittingResultsViewer.py,
+# in the directory given as "python tkinterFit.py archiveDirectory", else
+# in FittingInterface.GetArchiveDirectory()
+archiveDirectory = sys.argv[1] if len(sys.argv) > 1 else FittingInterface.GetArchiveDirectory()
+
 # Note that you can embed the application into
 # your own tkinter programs as shown here
 root = tk.Tk()
-interface = FittingInterface.InterfaceFrame(root)
+interface = FittingInterface.InterfaceFrame(root, archiveDirectory)
 interface.pack()
 root.title("tkinterFit - Curve And Surface Fitting Interface")
 
@@ -1,21 +1,41 @@
+import os
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
-from sklearn.manifold import TSNE
+import embedding
 
-df = pd.read_csv("./data/db-composition_classes.csv",)
-df = df.dropna()
+# Embedding backend, 'barnes-hut' (sklearn t-SNE), 'fft' (openTSNE), 'umap'
+# or 'pca', after reducing the columns to pre_reduction principal components
+# (see embedding.py).  The fitted map is saved to map_file, with refit = False
+# the saved map is used again.  Set new_compositions to a CSV file to place
+# its compositions on the map without fitting it again
+backend = 'barnes-hut'
+pre_reduction = 50
+map_file = 'composition-map.pickle'
+refit = True
+new_compositions = None
+
+df, variables = embedding.ReadCompositions("./data/db-composition_classes.csv")
 print(df.head())
 print("Shape of the Dataset: {}".format(df.shape))
 
 # 2 is the default number of components in TSNE
-model = TSNE(learning_rate=100, random_state=42)
-transformed = model.fit_transform(df.drop("Outcome", axis=1))
+if refit or not os.path.exists(map_file):
+    model = embedding.Embedding(backend, pre_reduction, learningRate=100, seed=42)
+    transformed = model.Fit(variables)
+    embedding.SaveEmbedding(model, map_file)
+else:
+    model = embedding.LoadEmbedding(map_file)
+    transformed = model.coordinates
 
 # visualizing the first 2 columns of TSNE reduced dataset
 xs = transformed[:, 0]
 ys = transformed[:, 1]
 plt.scatter(xs, ys, alpha=0.5)
+if new_compositions:
+    new_df, new_variables = embedding.ReadCompositions(new_compositions)
+    placed = model.Transform(new_variables)
+    plt.scatter(placed[:, 0], placed[:, 1], c='red', marker='x')
 plt.show()
 
 # new dataset with TSNE Dataset and Output column of the original dataset
@@ -25,4 +45,4 @@ print(tsne_df.head())
 # Visualizing the columns of TSNE Model with the Outcome column mapping
 grid = sns.FacetGrid(tsne_df, hue="Outcome")
 grid.map(plt.scatter, "TSNE1", "TSNE2", alpha=0.5).add_legend()
-plt.show()
\ No newline at end of file
+plt.show()